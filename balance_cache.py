@@ -0,0 +1,125 @@
+"""Cache de resultados de /balance por seleção de jogadores.
+
+Vários participantes costumam sortear a mesma seleção ao mesmo tempo. O cache
+guarda o contexto já calculado (LRU com TTL) sob uma chave canônica da
+seleção e une pedidos idênticos a um único job em andamento (single-flight).
+Vale dentro de cada processo; quem se une a um job marca o resultado como
+compartilhado no job_store (`on_join`), visível a todos os workers.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+def roster_key(players, num_teams: int, **params) -> str:
+    """Hash canônico de (nome, nota, intensidade) dos jogadores, `num_teams` e `params`.
+
+    A ordem dos jogadores não importa; `params` distingue pedidos que geram
+    resultados diferentes para a mesma seleção (motor, prazo, nº do sorteio).
+    """
+    roster = sorted((p.name, int(p.overall_rating), p.intensity.name) for p in players)
+    payload = json.dumps([roster, num_teams, sorted(params.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class BalanceCache:
+    def __init__(self, max_entries: int = 64, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[float, frozenset, dict]]' = OrderedDict()
+        # chave -> [job_id, jogadores, obsoleto]; jobs afetados por invalidação não entram no cache
+        self._inflight: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'joined': 0, 'invalidated': 0, 'evicted': 0, 'expired': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup_or_reserve(self, key: str, job_id: str, names: Iterable[str],
+                          on_join: Optional[Callable[[str], object]] = None) -> Tuple[str, Optional[object]]:
+        """Consulta a chave e, se não houver resultado nem job em andamento, reserva `job_id`.
+
+        Retorna ('hit', contexto), ('joined', job_id do job em andamento) ou
+        ('miss', None); no último caso o chamador deve executar o job e chamar
+        `complete` (ou `release`, se não conseguir enfileirá-lo). Na união,
+        `on_join(job_id)` roda ainda sob a trava, antes de o job poder concluir
+        (`complete` vem antes de o job virar 'done').
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return 'hit', entry[2]
+                del self._entries[key]
+                self._stats['expired'] += 1
+            running = self._inflight.get(key)
+            if running is not None:
+                self._stats['joined'] += 1
+                if on_join is not None:
+                    on_join(running[0])
+                return 'joined', running[0]
+            self._stats['misses'] += 1
+            self._inflight[key] = [job_id, frozenset(names), False]
+            return 'miss', None
+
+    def release(self, key: str, job_id: str) -> None:
+        """Libera a reserva de `job_id` sem guardar resultado."""
+        with self._lock:
+            running = self._inflight.get(key)
+            if running is not None and running[0] == job_id:
+                del self._inflight[key]
+
+    def complete(self, key: str, job_id: str, ctx: Optional[dict]) -> None:
+        """Encerra a reserva e guarda `ctx`, salvo se algum jogador mudou durante o job."""
+        with self._lock:
+            running = self._inflight.get(key)
+            if running is None or running[0] != job_id:
+                return
+            del self._inflight[key]
+            if ctx is None or running[2]:
+                return
+            self._entries[key] = (time.monotonic(), running[1], ctx)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def invalidate(self, names: Iterable[str]) -> int:
+        """Descarta resultados que envolvem algum dos jogadores; retorna quantos."""
+        names = set(names)
+        with self._lock:
+            for running in self._inflight.values():
+                if running[1] & names:
+                    running[2] = True
+            stale = [key for key, entry in self._entries.items() if entry[1] & names]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidated'] += len(stale)
+            return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses'] + self._stats['joined']
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'inflight': len(self._inflight),
+                'max_entries': self.max_entries,
+                'hit_rate': round((self._stats['hits'] + self._stats['joined']) / lookups, 3) if lookups else 0.0,
+            }
+
+
+def create_balance_cache() -> BalanceCache:
+    """Tamanho por BALANCE_CACHE_SIZE (0 desativa) e validade por BALANCE_CACHE_TTL (segundos)."""
+    return BalanceCache(
+        max_entries=int(os.environ.get('BALANCE_CACHE_SIZE', 64)),
+        ttl_seconds=float(os.environ.get('BALANCE_CACHE_TTL', 600)),
+    )
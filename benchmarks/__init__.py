@@ -0,0 +1,11 @@
+"""Benchmarks do balanceamento com elencos sintéticos.
+
+Uso:
+    python -m benchmarks                      # matriz padrão, motor sampling
+    python -m benchmarks --quick --engine local
+    python -m benchmarks --out novo.json --compare base.json
+
+Cada caso (jogadores, times, distribuição de notas, fração de alta
+intensidade) gera um elenco com semente fixa e roda `repeats` vezes; o JSON
+de saída serve de base para comparar execuções futuras (ver compare).
+"""
@@ -0,0 +1,66 @@
+import argparse
+import json
+import sys
+
+from team_balancer import ENGINES
+
+from benchmarks.compare import SLOWDOWN_LIMIT, check_comparable, compare, format_rows
+from benchmarks.run import TARGETS, cases, run_suite
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks do balanceamento')
+    parser.add_argument('--engine', choices=ENGINES, default='sampling')
+    parser.add_argument('--target', choices=sorted(TARGETS), default='distribute',
+                        help="'distribute' mede distribute_players; 'context' mede _build_balance_context")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--deadline-ms', type=float, default=2000, help='prazo por execução (0 = sem prazo)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quick', action='store_true', help='só os casos pequenos')
+    parser.add_argument('--only', help='roda só os casos cuja chave contém este texto (ex.: 40x5)')
+    parser.add_argument('--out', help='grava o resultado em JSON')
+    parser.add_argument('--compare', help='JSON de uma execução anterior')
+    parser.add_argument('--slowdown', type=float, default=SLOWDOWN_LIMIT)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        # Recusa antes de rodar: comparar motores ou alvos diferentes não diz nada
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        try:
+            check_comparable({'engine': args.engine, 'target': args.target}, baseline)
+        except ValueError as exc:
+            print(f"Comparação recusada: {exc}", file=sys.stderr)
+            return 2
+
+    selected = cases(args.quick)
+    if args.only:
+        selected = [c for c in selected if args.only in f"{c['players']}x{c['teams']}/{c['ratings']}/{c['high_share']}"]
+
+    def show(result):
+        lat = result['latency_ms']
+        print(
+            f"{result['key']:<24} p50 {lat['p50']:>9.2f}ms p99 {lat['p99']:>9.2f}ms "
+            f"tentativas {result['attempts_mean']!s:>8} dif {result['spread_mean']!s:>6} "
+            f"falhas {result['failure_rate']:.2f}",
+            flush=True,
+        )
+
+    report = run_suite(
+        selected, args.engine, args.target, args.repeats, args.deadline_ms or None, args.seed, on_case=show,
+    )
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if baseline is not None:
+        rows = compare(report, baseline, args.slowdown)
+        print()
+        print(format_rows(rows))
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
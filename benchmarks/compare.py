@@ -0,0 +1,58 @@
+"""Comparação de um resultado com uma execução anterior."""
+from typing import Dict, List
+
+# p50 mais lento que isso (razão) ou taxa de falha maior conta como regressão
+SLOWDOWN_LIMIT = 1.25
+# Abaixo disso a diferença de latência é ruído de medição
+MIN_LATENCY_MS = 1.0
+
+
+# Padrões de execuções gravadas sem o campo em `meta`
+META_DEFAULTS = {'engine': 'sampling', 'target': 'distribute'}
+
+
+def check_comparable(meta: Dict, baseline: Dict) -> None:
+    """ValueError se `baseline` mediu outro motor ou outro alvo que `meta`."""
+    for field, default in META_DEFAULTS.items():
+        ours = meta.get(field, default)
+        theirs = baseline.get('meta', {}).get(field, default)
+        if ours != theirs:
+            raise ValueError(f"A execução anterior usou {field} '{theirs}', esta usa '{ours}'")
+
+
+def compare(current: Dict, baseline: Dict, slowdown_limit: float = SLOWDOWN_LIMIT) -> List[Dict]:
+    """Uma linha por caso presente nas duas execuções, com `regression` marcada.
+
+    Levanta ValueError se as execuções mediram motores ou alvos diferentes.
+    """
+    check_comparable(current.get('meta', {}), baseline)
+    previous = {case['key']: case for case in baseline.get('cases', [])}
+    rows = []
+    for case in current.get('cases', []):
+        old = previous.get(case['key'])
+        if old is None:
+            continue
+        new_p50, old_p50 = case['latency_ms']['p50'], old['latency_ms']['p50']
+        ratio = new_p50 / old_p50 if old_p50 else None
+        slower = ratio is not None and ratio > slowdown_limit and new_p50 - old_p50 >= MIN_LATENCY_MS
+        rows.append({
+            'key': case['key'],
+            'p50_ms': (old_p50, new_p50),
+            'ratio': round(ratio, 2) if ratio is not None else None,
+            'failure_rate': (old['failure_rate'], case['failure_rate']),
+            'spread_mean': (old['spread_mean'], case['spread_mean']),
+            'regression': slower or case['failure_rate'] > old['failure_rate'],
+        })
+    return rows
+
+
+def format_rows(rows: List[Dict]) -> str:
+    lines = [f"{'caso':<24} {'p50 antes':>10} {'p50 agora':>10} {'razão':>6} {'falhas':>11}"]
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}" if row['ratio'] is not None else '-'
+        failures = f"{row['failure_rate'][0]:.2f}->{row['failure_rate'][1]:.2f}"
+        mark = '  REGRESSÃO' if row['regression'] else ''
+        lines.append(
+            f"{row['key']:<24} {row['p50_ms'][0]:>10.2f} {row['p50_ms'][1]:>10.2f} {ratio:>6} {failures:>11}{mark}"
+        )
+    return '\n'.join(lines)
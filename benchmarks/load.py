@@ -0,0 +1,465 @@
+"""Teste de carga do fluxo /balance → /balance_status → /balance_result.
+
+Uso:
+    python -m benchmarks.load                           # app neste processo, elenco sintético
+    python -m benchmarks.load --users 8 --duration 30 --mix balance=2,read=3,edit=1
+    python -m benchmarks.load --gunicorn 2              # sobe um gunicorn local com 2 workers
+    python -m benchmarks.load --url http://127.0.0.1:8080 --server-pid 1234
+
+Cada usuário virtual (uma thread) sorteia ações conforme a mistura:
+  balance  envia o formulário, consulta /balance_status até o job terminar e
+           pega /balance_result (o fluxo inteiro é medido como 'fluxo balance');
+  read     GET / (página com o elenco);
+  edit     /update_player num jogador sorteado (nova nota).
+No fim: vazão, p50/p95/p99 por endpoint, códigos de resposta, threads e pico
+de RSS (deste processo, ou do servidor e seus workers com --server-pid).
+
+Neste processo e com --gunicorn o app usa um players.json temporário com
+elenco sintético; com --gunicorn e mais de um worker, os jobs ficam num
+SQLite temporário (JOB_STORE=sqlite) para o status e o resultado valerem em
+qualquer worker. Com --url as edições mudam o elenco do servidor: aponte
+para uma cópia dos dados.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MIX = {'balance': 2, 'read': 3, 'edit': 1}
+ROSTER_SIZE = 40
+POLL_INTERVAL = 0.25  # mesmo ritmo do progresso publicado pelo job
+FLOW_TIMEOUT = 60.0
+STATS_INTERVAL = 0.1
+
+_JOB_ID = re.compile(r'const jobId = "([^"]+)"')
+_PLAYER_ID = re.compile(r'data-id="(\d+)"')
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'balance=2,read=3,edit=1' -> pesos por ação."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"ação desconhecida na mistura: {name!r}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('mistura sem nenhuma ação com peso')
+    return mix
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    # Mesma regra de benchmarks.run.percentile, sem importar o balanceador
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class InProcessClient:
+    """Cliente de teste do Flask, um por thread, sobre o app importado aqui."""
+
+    def __init__(self, app):
+        self._app = app
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, form=None, payload=None) -> Tuple[int, str]:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        response = client.open(path, method=method, data=form, json=payload)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HttpClient:
+    """Cliente HTTP (urllib) para um servidor já rodando."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, form=None, payload=None) -> Tuple[int, str]:
+        data, headers = None, {}
+        if form is not None:
+            data = urllib.parse.urlencode(form, doseq=True).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode('utf-8', 'replace')
+
+
+class Recorder:
+    """Latências (ms) e códigos de resposta por endpoint, compartilhados entre as threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+
+    def call(self, client, name: str, method: str, path: str, **kwargs) -> Tuple[int, str]:
+        start = time.perf_counter()
+        try:
+            status, body = client.request(method, path, **kwargs)
+        except Exception as exc:
+            status, body = 0, ''
+            with self._lock:
+                self.errors[f"{name}: {type(exc).__name__}"] += 1
+        self.record(name, (time.perf_counter() - start) * 1000.0, status)
+        return status, body
+
+    def record(self, name: str, elapsed_ms: float, status) -> None:
+        with self._lock:
+            self.latencies[name].append(elapsed_ms)
+            self.statuses[name][str(status)] += 1
+
+
+class ProcessStats:
+    """Amostra threads e RSS (/proc) de um processo e de todos os seus filhos."""
+
+    def __init__(self, pid: Optional[int] = None):
+        self.pid = pid or os.getpid()
+        self.peak_threads = 0
+        self.peak_rss_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='load-stats', daemon=True)
+
+    def _tree(self) -> List[int]:
+        pids, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            try:
+                for task in os.listdir(f'/proc/{pid}/task'):
+                    with open(f'/proc/{pid}/task/{task}/children') as f:
+                        pending.extend(int(c) for c in f.read().split())
+            except OSError:
+                continue
+        return pids
+
+    def sample(self) -> Tuple[int, int]:
+        threads = rss = 0
+        for pid in self._tree():
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('Threads:'):
+                            threads += int(line.split()[1])
+                        elif line.startswith('VmRSS:'):
+                            rss += int(line.split()[1])
+            except OSError:
+                continue
+        if self.pid == os.getpid() and not threads:
+            # Sem /proc: só as threads Python deste processo
+            threads = threading.active_count()
+        self.peak_threads = max(self.peak_threads, threads)
+        self.peak_rss_kb = max(self.peak_rss_kb, rss)
+        return threads, rss
+
+    def _loop(self) -> None:
+        while not self._stop.wait(STATS_INTERVAL):
+            self.sample()
+
+    def start(self) -> None:
+        self.sample()
+        self._thread.start()
+
+    def stop(self) -> Dict:
+        self._stop.set()
+        self._thread.join()
+        threads, rss = self.sample()
+        if self.pid == os.getpid():
+            # ru_maxrss (KB no Linux) pega picos entre as amostras
+            self.peak_rss_kb = max(self.peak_rss_kb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        return {
+            'threads_end': threads,
+            'threads_peak': self.peak_threads,
+            'rss_end_mb': round(rss / 1024.0, 1),
+            'rss_peak_mb': round(self.peak_rss_kb / 1024.0, 1),
+        }
+
+
+class LoadTest:
+    def __init__(self, client, player_ids: List[int], mix: Dict[str, float], users: int, duration: float,
+                 seed: int = 0, poll_interval: float = POLL_INTERVAL, teams=(2, 4), selected=(12, 24),
+                 engine: str = 'sampling', deadline_ms: Optional[int] = None):
+        self.client = client
+        self.player_ids = player_ids
+        self.mix = mix
+        self.users = users
+        self.duration = duration
+        self.seed = seed
+        self.poll_interval = poll_interval
+        self.teams = teams
+        self.selected = selected
+        self.engine = engine
+        self.deadline_ms = deadline_ms
+        self.recorder = Recorder()
+        self.actions: Counter = Counter()
+        self._deadline = 0.0
+
+    def _balance(self, rng: random.Random) -> None:
+        rec = self.recorder
+        size = min(len(self.player_ids), rng.randint(*self.selected))
+        num_teams = rng.randint(*self.teams)
+        form = {
+            'player_ids': [str(i) for i in rng.sample(self.player_ids, size)],
+            'num_teams': str(num_teams),
+            'engine': self.engine,
+        }
+        if self.deadline_ms:
+            form['deadline_ms'] = str(self.deadline_ms)
+        start = time.perf_counter()
+        status, body = rec.call(self.client, 'POST /balance', 'POST', '/balance', form=form)
+        match = _JOB_ID.search(body) if status == 200 else None
+        if match is None:
+            # Resultado do cache (já renderizado), fila cheia (503) ou erro
+            outcome = 'cache' if status == 200 else str(status)
+            rec.record('fluxo balance', (time.perf_counter() - start) * 1000.0, outcome)
+            return
+        job_id = match.group(1)
+        outcome = 'timeout'
+        while time.perf_counter() - start < FLOW_TIMEOUT:
+            status, body = rec.call(self.client, 'GET /balance_status', 'GET', f'/balance_status/{job_id}')
+            state = json.loads(body).get('status') if status == 200 else None
+            if state == 'done':
+                status, _ = rec.call(self.client, 'GET /balance_result', 'GET', f'/balance_result/{job_id}')
+                outcome = 'done' if status == 200 else str(status)
+                break
+            if state not in ('queued', 'running'):
+                outcome = state or str(status)
+                break
+            time.sleep(self.poll_interval)
+        rec.record('fluxo balance', (time.perf_counter() - start) * 1000.0, outcome)
+
+    def _read(self, rng: random.Random) -> None:
+        self.recorder.call(self.client, 'GET /', 'GET', '/')
+
+    def _edit(self, rng: random.Random) -> None:
+        payload = {
+            'id': rng.choice(self.player_ids),
+            'rating': rng.randint(1, 7),
+            'mensalista': rng.random() < 0.4,
+        }
+        self.recorder.call(self.client, 'POST /update_player', 'POST', '/update_player', payload=payload)
+
+    def _user(self, index: int) -> None:
+        rng = random.Random(self.seed * 1000 + index)
+        names = list(self.mix)
+        weights = [self.mix[n] for n in names]
+        handlers = {'balance': self._balance, 'read': self._read, 'edit': self._edit}
+        while time.perf_counter() < self._deadline:
+            action = rng.choices(names, weights=weights)[0]
+            handlers[action](rng)
+            with self.recorder._lock:
+                self.actions[action] += 1
+
+    def run(self) -> Dict:
+        start = time.perf_counter()
+        self._deadline = start + self.duration
+        threads = [
+            threading.Thread(target=self._user, args=(i,), name=f'load-user-{i}', daemon=True)
+            for i in range(self.users)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        rec = self.recorder
+        endpoints = {}
+        for name in sorted(rec.latencies):
+            values = rec.latencies[name]
+            endpoints[name] = {
+                'count': len(values),
+                'per_second': round(len(values) / elapsed, 2),
+                'latency_ms': {
+                    label: round(_percentile(values, q), 2)
+                    for label, q in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+                },
+                'statuses': dict(rec.statuses[name]),
+            }
+        requests_total = sum(len(v) for name, v in rec.latencies.items() if not name.startswith('fluxo'))
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': requests_total,
+            'requests_per_second': round(requests_total / elapsed, 2),
+            'actions': dict(self.actions),
+            'endpoints': endpoints,
+            'errors': dict(rec.errors),
+        }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _write_roster(path: str, size: int, seed: int) -> None:
+    """Grava o elenco sintético em `path` (PLAYERS_FILE já deve apontar para ele)."""
+    # Importado só aqui: team_balancer lê PLAYERS_FILE ao ser importado
+    from benchmarks.rosters import synthetic_roster, to_json
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(to_json(synthetic_roster(size, seed)), f, ensure_ascii=False)
+
+
+def _start_gunicorn(workers: int, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    if shutil.which('gunicorn') is None:
+        raise SystemExit('gunicorn não encontrado (pip install -r requirements.txt)')
+    port = _free_port()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(
+        ['gunicorn', '--workers', str(workers), '--threads', '4', '--bind', f'127.0.0.1:{port}', 'main:app'],
+        cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{port}'
+    client = HttpClient(url, timeout=2.0)
+    limit = time.monotonic() + 30
+    while time.monotonic() < limit:
+        if server.poll() is not None:
+            raise SystemExit(f'gunicorn saiu com código {server.returncode}')
+        try:
+            if client.request('GET', '/')[0] == 200:
+                return server, url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise SystemExit('gunicorn não respondeu em 30s')
+
+
+def _print_report(report: Dict) -> None:
+    print(
+        f"{report['elapsed_s']}s, {report['requests']} pedidos ({report['requests_per_second']}/s), "
+        f"ações {report['actions']}"
+    )
+    for name, row in report['endpoints'].items():
+        lat = row['latency_ms']
+        print(
+            f"  {name:<22} n {row['count']:>6} {row['per_second']:>8.2f}/s "
+            f"p50 {lat['p50']:>8.2f}ms p95 {lat['p95']:>8.2f}ms p99 {lat['p99']:>8.2f}ms  {row['statuses']}"
+        )
+    proc = report['process']
+    print(
+        f"  threads: pico {proc['threads_peak']}, fim {proc['threads_end']}; "
+        f"RSS: pico {proc['rss_peak_mb']} MB, fim {proc['rss_end_mb']} MB"
+    )
+    if report['errors']:
+        print(f"  erros: {report['errors']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description='Teste de carga do app')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help='servidor já rodando (ex.: http://127.0.0.1:8080)')
+    target.add_argument('--gunicorn', type=int, metavar='WORKERS', help='sobe um gunicorn local com N workers')
+    parser.add_argument('--server-pid', type=int, help='com --url: PID do servidor para threads e RSS')
+    parser.add_argument('--users', type=int, default=4, help='usuários virtuais (threads)')
+    parser.add_argument('--duration', type=float, default=20.0, help='segundos de carga')
+    parser.add_argument('--mix', default='balance=2,read=3,edit=1', help='pesos das ações')
+    parser.add_argument('--roster', type=int, default=ROSTER_SIZE, help='tamanho do elenco sintético')
+    parser.add_argument('--engine', default='sampling')
+    # Sem prazo, seleções difíceis fazem o job rodar todas as tolerâncias (minutos)
+    parser.add_argument('--deadline-ms', type=int, default=2000, help='prazo enviado em cada /balance (0 = sem prazo)')
+    parser.add_argument('--poll-ms', type=float, default=POLL_INTERVAL * 1000.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='grava o resultado em JSON')
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    workdir = None
+    server = None
+    if args.url:
+        client = HttpClient(args.url)
+        stats = ProcessStats(args.server_pid) if args.server_pid else ProcessStats()
+        mode = 'url'
+    else:
+        # Dados temporários: a carga não mexe no players.json nem no histórico de verdade
+        workdir = tempfile.mkdtemp(prefix='peladapp-load-')
+        os.environ['PLAYERS_FILE'] = os.path.join(workdir, 'players.json')
+        os.environ['MATCH_HISTORY_FILE'] = os.path.join(workdir, 'match_history.json')
+        if args.gunicorn and args.gunicorn > 1:
+            # Cada worker com job_store em memória não enxerga os jobs dos outros:
+            # as consultas de status/resultado precisam do SQLite compartilhado
+            os.environ['JOB_STORE'] = 'sqlite'
+            os.environ['JOB_STORE_PATH'] = os.path.join(workdir, 'jobs.sqlite3')
+        else:
+            os.environ.setdefault('JOB_STORE', 'memory')
+        _write_roster(os.environ['PLAYERS_FILE'], args.roster, args.seed)
+        env = dict(os.environ)
+        if args.gunicorn:
+            server, url = _start_gunicorn(args.gunicorn, env)
+            client = HttpClient(url)
+            stats = ProcessStats(server.pid)
+            mode = f'gunicorn x{args.gunicorn}'
+        else:
+            from main import app
+
+            client = InProcessClient(app)
+            stats = ProcessStats()
+            mode = 'in-process'
+    try:
+        status, body = client.request('GET', '/')
+        player_ids = [int(i) for i in _PLAYER_ID.findall(body)] if status == 200 else []
+        if not player_ids:
+            raise SystemExit(f'não foi possível ler o elenco em GET / (status {status})')
+        test = LoadTest(
+            client, player_ids, mix, args.users, args.duration, seed=args.seed,
+            poll_interval=args.poll_ms / 1000.0, engine=args.engine, deadline_ms=args.deadline_ms,
+        )
+        stats.start()
+        report = test.run()
+        report['process'] = stats.stop()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report['meta'] = {
+        'mode': mode,
+        'users': args.users,
+        'duration_s': args.duration,
+        'mix': mix,
+        'roster': len(player_ids),
+        'engine': args.engine,
+        'deadline_ms': args.deadline_ms,
+        'python': sys.version.split()[0],
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    _print_report(report)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""Elencos sintéticos no formato de players.json (notas 1 a 7, alta/baixa intensidade)."""
+import random
+from typing import Dict, List
+
+from team_balancer import Intensity, Player
+
+# Peso de cada nota 1..7: 'real' segue o players.json atual; as outras
+# concentram o elenco em jogadores fortes ou fracos
+RATING_WEIGHTS: Dict[str, List[float]] = {
+    'real': [6, 7, 10, 9, 6, 10, 2],
+    'forte': [1, 2, 3, 6, 9, 10, 6],
+    'fraco': [8, 10, 9, 5, 2, 1, 1],
+}
+HIGH_SHARES = (0.2, 0.5, 0.8)
+MENSALISTA_SHARE = 0.4
+
+
+def synthetic_roster(size: int, seed: int, ratings: str = 'real', high_share: float = 0.5) -> List[Player]:
+    """`size` jogadores com IDs 1..size; a mesma semente gera sempre o mesmo elenco."""
+    rng = random.Random(seed)
+    weights = RATING_WEIGHTS[ratings]
+    players = []
+    for i in range(size):
+        rating = rng.choices(range(1, 8), weights=weights)[0]
+        intensity = Intensity.HIGH if rng.random() < high_share else Intensity.LOW
+        players.append(Player(f"Jogador {i + 1}", rating, intensity, rng.random() < MENSALISTA_SHARE, id=i + 1))
+    return players
+
+
+def to_json(players: List[Player]) -> List[Dict]:
+    """Mesmo formato de players.json, para reproduzir um caso no app."""
+    return [
+        {'id': p.id, 'name': p.name, 'rating': int(p.overall_rating),
+         'intensity': p.intensity.name, 'mensalista': p.mensalista}
+        for p in players
+    ]
@@ -0,0 +1,132 @@
+"""Execução dos casos e resumo das medições."""
+import platform
+import random
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from team_balancer import TeamBalancer, load_numpy
+
+from benchmarks.rosters import HIGH_SHARES, RATING_WEIGHTS, synthetic_roster
+
+# (jogadores, times) da matriz padrão: do racha pequeno a 500 jogadores em 20 times
+SIZES = [(10, 2), (20, 4), (40, 5), (60, 6), (100, 10), (250, 10), (500, 20)]
+QUICK_SIZES = [(10, 2), (20, 4), (40, 5)]
+
+
+def cases(quick: bool = False) -> List[Dict]:
+    if quick:
+        return [
+            {'players': n, 'teams': t, 'ratings': 'real', 'high_share': 0.5}
+            for n, t in QUICK_SIZES
+        ]
+    return [
+        {'players': n, 'teams': t, 'ratings': ratings, 'high_share': share}
+        for n, t in SIZES
+        for ratings in RATING_WEIGHTS
+        for share in HIGH_SHARES
+    ]
+
+
+def case_key(case: Dict) -> str:
+    return f"{case['players']}x{case['teams']}/{case['ratings']}/{case['high_share']}"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentil por posição mais próxima (q entre 0 e 100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def _run_distribute(players, num_teams, engine, deadline_ms, seed):
+    balancer = TeamBalancer(players, num_teams, deadline_ms)
+    random.seed(seed)
+    start = time.perf_counter()
+    teams = balancer.distribute_players(engine)
+    elapsed = time.perf_counter() - start
+    return elapsed, balancer.attempts, balancer.tolerance_used, balancer.strength_spread(teams), balancer.timed_out
+
+
+def _run_context(players, num_teams, engine, deadline_ms, seed):
+    # Importado só aqui: main cria o app Flask, o job store e os caches
+    from main import _build_balance_context
+
+    random.seed(seed)
+    start = time.perf_counter()
+    ctx = _build_balance_context(players, num_teams, engine, deadline_ms)
+    elapsed = time.perf_counter() - start
+    strengths = [team['strength'] for team in ctx['options'][0]]
+    return elapsed, ctx['attempts'], ctx['tolerance_used'], max(strengths) - min(strengths), ctx['timed_out']
+
+
+TARGETS = {'distribute': _run_distribute, 'context': _run_context}
+
+
+def run_case(case: Dict, engine: str = 'sampling', target: str = 'distribute', repeats: int = 5,
+             deadline_ms: Optional[float] = 2000, seed: int = 0) -> Dict:
+    """Roda um caso `repeats` vezes e resume latência, tentativas, tolerância, diferença e falhas."""
+    roster_seed = seed + zlib.crc32(case_key(case).encode('utf-8'))
+    players = synthetic_roster(case['players'], roster_seed, case['ratings'], case['high_share'])
+    runner = TARGETS[target]
+    latencies, attempts, spreads = [], [], []
+    tolerances = Counter()
+    failures = Counter()
+    timeouts = 0
+    for r in range(repeats):
+        start = time.perf_counter()
+        try:
+            elapsed, tries, tolerance, spread, timed_out = runner(players, case['teams'], engine, deadline_ms, roster_seed + r)
+        except ValueError as exc:
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            failures[str(exc)] += 1
+            continue
+        latencies.append(elapsed * 1000.0)
+        if tries is not None:
+            attempts.append(tries)
+        spreads.append(spread)
+        tolerances[str(tolerance)] += 1
+        timeouts += bool(timed_out)
+    return {
+        **case,
+        'key': case_key(case),
+        'repeats': repeats,
+        'latency_ms': {
+            name: round(percentile(latencies, q), 2)
+            for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))
+        },
+        'attempts_mean': round(sum(attempts) / len(attempts), 1) if attempts else None,
+        'tolerances': dict(tolerances),
+        'spread_mean': round(sum(spreads) / len(spreads), 3) if spreads else None,
+        'spread_max': round(max(spreads), 3) if spreads else None,
+        'failure_rate': round(sum(failures.values()) / repeats, 3),
+        'failures': dict(failures),
+        'timeouts': timeouts,
+    }
+
+
+def run_suite(selected: Iterable[Dict], engine: str = 'sampling', target: str = 'distribute', repeats: int = 5,
+              deadline_ms: Optional[float] = 2000, seed: int = 0, on_case=None) -> Dict:
+    results = []
+    for case in selected:
+        result = run_case(case, engine, target, repeats, deadline_ms, seed)
+        results.append(result)
+        if on_case is not None:
+            on_case(result)
+    return {
+        'meta': {
+            'engine': engine,
+            'target': target,
+            'repeats': repeats,
+            'deadline_ms': deadline_ms,
+            'seed': seed,
+            'python': platform.python_version(),
+            'numpy': getattr(load_numpy(), '__version__', None),
+            'machine': platform.machine(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'cases': results,
+    }
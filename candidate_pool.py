@@ -0,0 +1,183 @@
+"""Geração paralela de candidatos para _build_balance_context.
+
+Um pool de processos persistente roda as rodadas de distribute_players fora do
+GIL. Cada rodada k usa a semente seed_base + 97 * k, igual ao caminho serial, e
+os resultados são consumidos na ordem de k: com ou sem pool, as mesmas
+sementes produzem os mesmos candidatos.
+
+Os processos do pool nascem por forkserver (ou spawn), nunca por fork: o
+pool é criado sob demanda numa thread de job, com outras threads rodando
+(journal, workers, limpeza), e um filho por fork poderia herdar travas
+seguras por elas (métricas, logging) e ficar parado para sempre.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from team_balancer import TeamBalancer, Player
+
+logger = logging.getLogger(__name__)
+
+SEED_STRIDE = 97
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def configured_workers() -> int:
+    """Quantidade de processos do pool (BALANCE_WORKERS); 0 ou 1 desativa o modo paralelo."""
+    try:
+        return max(0, int(os.environ.get('BALANCE_WORKERS', '0')))
+    except ValueError:
+        logger.warning("BALANCE_WORKERS inválido: %r", os.environ.get('BALANCE_WORKERS'))
+        return 0
+
+
+def _mp_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        # Importados uma vez no servidor de fork: os processos do pool já nascem com eles
+        ctx.set_forkserver_preload(['candidate_pool'])
+        return ctx
+    return multiprocessing.get_context('spawn')
+
+
+def get_pool(workers: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """Retorna o pool persistente, criando sob demanda; None se desativado ou indisponível."""
+    global _pool, _pool_workers
+    if workers is None:
+        workers = configured_workers()
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            try:
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+                _pool_workers = workers
+            except (OSError, NotImplementedError, ImportError):
+                logger.exception("Pool de processos indisponível; usando geração serial")
+                return None
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _run_seed(players, num_teams, engine, seed, deadline, lower_bound, history=None, rules=()):
+    """Executa uma rodada dentro do processo do pool.
+
+    `deadline` é um instante de time.monotonic() (o relógio é o mesmo entre
+    processos do host): a rodada que esperou na fila só usa o tempo que
+    sobrou. `rules` são regras extras como (tipo, índices em `players`).
+    Devolve ('ok', times como índices em `players`, timed_out, tentativas) ou
+    ('error', mensagem, timed_out, tentativas); índices evitam depender da
+    identidade dos objetos Player copiados entre processos.
+    """
+    budget_ms = None
+    if deadline is not None:
+        budget_ms = max(1.0, (deadline - time.monotonic()) * 1000.0)
+    balancer = TeamBalancer(players, num_teams, budget_ms)
+    balancer.spread_lower_bound = lower_bound
+    balancer.history_matrix = history
+    for kind, members in rules:
+        balancer.add_rule(kind, [players[i] for i in members])
+    random.seed(seed)
+    try:
+        dist = balancer.distribute_players(engine)
+    except ValueError as exc:
+        return 'error', str(exc), balancer.timed_out, balancer.attempts
+    index = {id(p): i for i, p in enumerate(players)}
+    return 'ok', [[index[id(p)] for p in team] for team in dist], balancer.timed_out, balancer.attempts
+
+
+def generate_candidates(
+    players: List[Player],
+    num_teams: int,
+    engine: str,
+    seed_base: int,
+    key: Callable[[List[List[Player]]], object],
+    runs: int = 30,
+    wanted: int = 6,
+    deadline: Optional[float] = None,
+    lower_bound: float = 0.0,
+    workers: Optional[int] = None,
+    on_result: Optional[Callable[[int, List[List[List[Player]]], int], None]] = None,
+    history: Optional[List[List[float]]] = None,
+    rules: Sequence[Tuple[str, List[Player]]] = (),
+) -> Optional[List[List[List[Player]]]]:
+    """Gera até `wanted` distribuições distintas (segundo `key`) em paralelo.
+
+    Cancela as rodadas pendentes assim que as `wanted` primeiras distintas (na
+    ordem das sementes) estão definidas. `deadline` é um instante de
+    time.monotonic(). `on_result(rodadas_concluidas, candidatos, tentativas)` é
+    chamado a cada rodada consumida, com as tentativas somadas até ali; `history` é a matriz de histórico do balanceador e
+    `rules`, as regras extras (ver TeamBalancer.add_rule).
+    Retorna None quando o pool não está disponível, para o
+    chamador seguir pelo caminho serial.
+    """
+    pool = get_pool(workers)
+    if pool is None:
+        return None
+
+    players = list(players)
+    position = {id(p): i for i, p in enumerate(players)}
+    index_rules = [(kind, [position[id(p)] for p in members if id(p) in position]) for kind, members in rules]
+
+    candidates: List[List[List[Player]]] = []
+    seen = set()
+    attempts = 0
+    try:
+        futures = [
+            pool.submit(
+                _run_seed, players, num_teams, engine, seed_base + SEED_STRIDE * k, deadline, lower_bound, history,
+                index_rules,
+            )
+            for k in range(runs)
+        ]
+    except (BrokenProcessPool, RuntimeError):
+        logger.exception("Falha ao enviar tarefas ao pool; usando geração serial")
+        shutdown_pool()
+        return None
+
+    try:
+        for runs_done, future in enumerate(futures, 1):
+            if candidates and deadline is not None and time.monotonic() >= deadline:
+                break
+            status, payload, timed_out, tries = future.result()
+            attempts += tries
+            if status == 'error':
+                if candidates and timed_out:
+                    break
+                raise ValueError(payload)
+            dist = [[players[i] for i in team] for team in payload]
+            dist_key = key(dist)
+            if dist_key not in seen:
+                candidates.append(dist)
+                seen.add(dist_key)
+            if on_result is not None:
+                on_result(runs_done, candidates, attempts)
+            if len(candidates) >= wanted:
+                break
+    except BrokenProcessPool:
+        logger.exception("Pool de processos quebrou; usando geração serial")
+        shutdown_pool()
+        return None
+    finally:
+        for future in futures:
+            future.cancel()
+    return candidates
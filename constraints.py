@@ -0,0 +1,181 @@
+"""Regras de composição dos times compiladas para a busca.
+
+Cada regra fala de um grupo de jogadores (índices em `players`):
+  'spread'    membros espalhados: entre floor(k/T) e ceil(k/T) por time
+              (top players, alta intensidade, goleiros);
+  'apart'     no máximo um membro por time (duplas que não jogam juntas);
+  'together'  todos no mesmo time (quem vem de carona junto).
+'spread' e 'apart' viram contadores por time com limites; grupos 'together'
+que se cruzam são unidos e viram um contador de membros por time. Durante a
+montagem, `TeamCounts.allows` diz em O(regras do jogador) se ele pode entrar
+num time, então a tentativa é podada assim que fica inviável; `valid`
+confere uma distribuição completa.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+SPREAD = 'spread'
+APART = 'apart'
+TOGETHER = 'together'
+RULE_KINDS = (SPREAD, APART, TOGETHER)
+
+
+class CompiledConstraints:
+    def __init__(self, num_players: int, num_teams: int, rules: Sequence[Tuple[str, Sequence[int]]]):
+        self.num_players = num_players
+        self.num_teams = num_teams
+        self.lower: List[int] = []
+        self.upper: List[int] = []
+        self.counters_of: List[Tuple[int, ...]] = [()] * num_players
+        counters_of: List[List[int]] = [[] for _ in range(num_players)]
+        parent = list(range(num_players))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for kind, members in rules:
+            members = sorted(set(members))
+            if kind not in RULE_KINDS:
+                raise ValueError(f"Regra desconhecida: {kind}")
+            if kind == TOGETHER:
+                for i in members[1:]:
+                    parent[find(i)] = find(members[0])
+                continue
+            if len(members) < 2:
+                continue
+            if kind == APART:
+                if len(members) > num_teams:
+                    raise ValueError(f"Regra 'apart' com {len(members)} jogadores para {num_teams} times")
+                low, high = 0, 1
+            else:
+                low = len(members) // num_teams
+                high = low + (1 if len(members) % num_teams else 0)
+            c = len(self.lower)
+            self.lower.append(low)
+            self.upper.append(high)
+            for i in members:
+                counters_of[i].append(c)
+
+        # Grupos 'together': componentes com 2 ou mais jogadores
+        roots = {}
+        for i in range(num_players):
+            roots.setdefault(find(i), []).append(i)
+        self.groups: List[List[int]] = [g for g in roots.values() if len(g) > 1]
+        self.group_of: List[int] = [-1] * num_players
+        for g, members in enumerate(self.groups):
+            for i in members:
+                self.group_of[i] = g
+            # Um grupo inteiro cai num time: não pode estourar o limite de nenhum contador
+            for c in set(c for i in members for c in counters_of[i]):
+                if sum(1 for i in members if c in counters_of[i]) > self.upper[c]:
+                    raise ValueError("Regras contraditórias: jogadores que devem ficar juntos também devem ficar separados")
+        self.counters_of = [tuple(cs) for cs in counters_of]
+
+    @property
+    def num_counters(self) -> int:
+        return len(self.lower)
+
+    def counts(self, teams: Optional[Sequence[Sequence[int]]] = None) -> 'TeamCounts':
+        state = TeamCounts(self)
+        if teams is not None:
+            for t, team in enumerate(teams):
+                for i in team:
+                    state.add(t, i)
+        return state
+
+
+class TeamCounts:
+    """Contadores por time de uma distribuição (parcial ou completa)."""
+
+    __slots__ = ('rules', 'counts', 'members', 'placed')
+
+    def __init__(self, rules: CompiledConstraints):
+        self.rules = rules
+        self.counts = [[0] * rules.num_counters for _ in range(rules.num_teams)]
+        # Membros de cada grupo 'together' por time e já distribuídos no total
+        self.members = [[0] * len(rules.groups) for _ in range(rules.num_teams)]
+        self.placed = [0] * len(rules.groups)
+
+    def allows(self, t: int, i: int) -> bool:
+        """True se o jogador `i` pode entrar no time `t` sem violar limites."""
+        counts = self.counts[t]
+        upper = self.rules.upper
+        for c in self.rules.counters_of[i]:
+            if counts[c] >= upper[c]:
+                return False
+        g = self.rules.group_of[i]
+        return g < 0 or self.members[t][g] == self.placed[g]
+
+    def add(self, t: int, i: int) -> None:
+        counts = self.counts[t]
+        for c in self.rules.counters_of[i]:
+            counts[c] += 1
+        g = self.rules.group_of[i]
+        if g >= 0:
+            self.members[t][g] += 1
+            self.placed[g] += 1
+
+    def remove(self, t: int, i: int) -> None:
+        counts = self.counts[t]
+        for c in self.rules.counters_of[i]:
+            counts[c] -= 1
+        g = self.rules.group_of[i]
+        if g >= 0:
+            self.members[t][g] -= 1
+            self.placed[g] -= 1
+
+    def allows_move(self, i: int, src: int, dst: int, j: Optional[int] = None) -> bool:
+        """True se mover `i` de `src` para `dst` (trocando com `j`, se houver) mantém os limites."""
+        rules = self.rules
+        if rules.group_of[i] >= 0 or (j is not None and rules.group_of[j] >= 0):
+            # Membro de grupo só troca de time com o grupo inteiro
+            return False
+        lower, upper = rules.lower, rules.upper
+        out_i, out_j = rules.counters_of[i], rules.counters_of[j] if j is not None else ()
+        for c in out_i:
+            if c in out_j:
+                continue
+            if self.counts[src][c] - 1 < lower[c] or self.counts[dst][c] + 1 > upper[c]:
+                return False
+        for c in out_j:
+            if c in out_i:
+                continue
+            if self.counts[dst][c] - 1 < lower[c] or self.counts[src][c] + 1 > upper[c]:
+                return False
+        return True
+
+    def moves_needed(self) -> int:
+        """Limite inferior de jogadores a mudar de time para a distribuição ficar válida."""
+        rules = self.rules
+        needed = 0
+        for c in range(rules.num_counters):
+            over = sum(max(0, counts[c] - rules.upper[c]) for counts in self.counts)
+            under = sum(max(0, rules.lower[c] - counts[c]) for counts in self.counts)
+            needed = max(needed, over, under)
+        split = 0
+        for g, group in enumerate(rules.groups):
+            split += len(group) - max(members[g] for members in self.members)
+        return max(needed, split)
+
+    def meets_lower(self) -> bool:
+        """Todos os times com o mínimo de cada contador (a montagem já garante os máximos e os grupos)."""
+        lower = self.rules.lower
+        for counts in self.counts:
+            for c, low in enumerate(lower):
+                if counts[c] < low:
+                    return False
+        return True
+
+    def valid(self) -> bool:
+        """Distribuição completa dentro de todos os limites."""
+        rules = self.rules
+        for counts in self.counts:
+            for c in range(rules.num_counters):
+                if not rules.lower[c] <= counts[c] <= rules.upper[c]:
+                    return False
+        for g, group in enumerate(rules.groups):
+            if max(members[g] for members in self.members) != len(group):
+                return False
+        return True
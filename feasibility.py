@@ -0,0 +1,284 @@
+"""Análise de viabilidade antes da busca.
+
+Rejeita seleções impossíveis sem gastar tentativas do sampler (inclusive regras
+extras que não cabem nos times) e calcula um limite inferior para a diferença
+de força, usado como alvo de parada antecipada.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from constraints import CompiledConstraints
+
+from team_balancer import TeamBalancer, Player, Intensity
+
+# Orçamento da prova exata (branch-and-bound) feita antes da busca
+EXACT_BUDGET_MS = 100
+# Nós da busca que encaixa as regras nos times (ver _rules_fit); esgotado, assume que cabem
+GROUP_FIT_NODES = 20000
+
+
+@dataclass
+class FeasibilityReport:
+    feasible: bool
+    reason: Optional[str] = None
+    spread_lower_bound: float = 0.0
+    exact: bool = False  # o limite é a menor diferença possível, provada pela busca exata
+
+
+def _team_sizes(num_players: int, num_teams: int) -> List[int]:
+    base, extra = divmod(num_players, num_teams)
+    return [base + (1 if i < extra else 0) for i in range(num_teams)]
+
+
+def _sum_range(highs: List[float], lows: List[float], size: int, high_options: List[int]):
+    """Menor e maior soma de notas para um time de `size` jogadores com uma das
+    quantidades permitidas de alta intensidade; None se nenhuma cabe."""
+    smallest = largest = None
+    for h in high_options:
+        if h > size or h > len(highs) or size - h > len(lows):
+            continue
+        low_sum = sum(highs[:h]) + sum(lows[:size - h])
+        high_sum = sum(highs[len(highs) - h:]) + sum(lows[len(lows) - (size - h):])
+        smallest = low_sum if smallest is None else min(smallest, low_sum)
+        largest = high_sum if largest is None else max(largest, high_sum)
+    if smallest is None:
+        return None
+    return smallest, largest
+
+
+def spread_lower_bound(players: List[Player], num_teams: int) -> Optional[float]:
+    """Limite inferior barato da diferença de força; None se tamanhos e
+    intensidade já tornam a distribuição impossível."""
+    n = len(players)
+    sizes = _team_sizes(n, num_teams)
+    ratings = [p.overall_rating for p in players]
+    mean = sum(ratings) / n
+
+    # Cada time recebe floor(H/T) ou ceil(H/T) jogadores de alta intensidade
+    highs = sorted(p.overall_rating for p in players if p.intensity == Intensity.HIGH)
+    lows = sorted(p.overall_rating for p in players if p.intensity == Intensity.LOW)
+    high_lo = len(highs) // num_teams
+    high_options = sorted({high_lo, high_lo + (1 if len(highs) % num_teams else 0)})
+
+    min_means = []
+    max_means = []
+    for size in set(sizes):
+        bounds = _sum_range(highs, lows, size, high_options)
+        if bounds is None:
+            return None
+        min_means.append(bounds[0] / size)
+        max_means.append(bounds[1] / size)
+    # Algum time tem média >= maior mínimo e algum tem média <= menor máximo;
+    # a média geral fica entre a menor e a maior média final
+    highest = max(max(min_means), mean)
+    lowest = min(min(max_means), mean)
+
+    # O time do melhor jogador completa o elenco, no mínimo, com os mais fracos
+    best_player = min(players, key=lambda p: (-p.overall_rating, p.name))
+    others = sorted(p.overall_rating for p in players if p is not best_player)
+    highest = max(highest, min((best_player.overall_rating + sum(others[:size - 1])) / size for size in set(sizes)))
+
+    bound = max(0.0, highest - lowest)
+    if all(float(r).is_integer() for r in ratings):
+        bound = max(bound, TeamBalancer._integral_spread_bound(sorted(sizes, reverse=True), int(sum(ratings))))
+    return bound
+
+
+def _rules_fit(compiled: CompiledConstraints, sizes: List[int]) -> bool:
+    """Existe distribuição que respeite tamanhos, grupos 'together' e os limites
+    dos contadores (top players, alta intensidade, 'spread' e 'apart')?
+
+    Ignora as notas: cada grupo ocupa um só time e os demais jogadores entram
+    pelo tipo (o conjunto de contadores de que fazem parte), então a busca
+    exaustiva é pequena. Passando de GROUP_FIT_NODES nós, assume que cabem.
+    """
+    num_counters = compiled.num_counters
+    lower, upper = compiled.lower, compiled.upper
+    loads = []
+    for members in compiled.groups:
+        load = [0] * num_counters
+        for i in members:
+            for c in compiled.counters_of[i]:
+                load[c] += 1
+        loads.append((len(members), load))
+    loads.sort(key=lambda item: -item[0])
+    # Jogadores fora de grupos, contados por tipo
+    free = {}
+    for i in range(compiled.num_players):
+        if compiled.group_of[i] < 0:
+            free[compiled.counters_of[i]] = free.get(compiled.counters_of[i], 0) + 1
+    types = list(free)
+    remaining = [free[kind] for kind in types]
+
+    seats = list(sizes)
+    counts = [[0] * num_counters for _ in sizes]
+    nodes = 0
+    failed = set()
+
+    class Exhausted(Exception):
+        pass
+
+    def visit() -> None:
+        nonlocal nodes
+        nodes += 1
+        if nodes > GROUP_FIT_NODES:
+            raise Exhausted
+
+    def fill(t: int) -> bool:
+        """Completa os times t, t+1, ... com os jogadores fora de grupos."""
+        if t == len(seats):
+            return True
+        key = (t, tuple(remaining))
+        if key in failed:
+            return False
+        team = counts[t]
+
+        def choose(j: int, left: int) -> bool:
+            visit()
+            if j == len(types):
+                return left == 0 and all(team[c] >= lower[c] for c in range(num_counters)) and fill(t + 1)
+            kind = types[j]
+            most = min(remaining[j], left, *(upper[c] - team[c] for c in kind))
+            for x in range(most, -1, -1):
+                remaining[j] -= x
+                for c in kind:
+                    team[c] += x
+                found = choose(j + 1, left - x)
+                remaining[j] += x
+                for c in kind:
+                    team[c] -= x
+                if found:
+                    return True
+            return False
+
+        if choose(0, seats[t]):
+            return True
+        failed.add(key)
+        return False
+
+    def place(k: int) -> bool:
+        if k == len(loads):
+            failed.clear()  # as falhas memorizadas valem só para esta colocação dos grupos
+            return fill(0)
+        visit()
+        size, load = loads[k]
+        tried = set()
+        for t in range(len(seats)):
+            state = (seats[t], tuple(counts[t]))
+            if state in tried or size > seats[t]:
+                continue
+            tried.add(state)
+            team = counts[t]
+            if any(team[c] + load[c] > upper[c] for c in range(num_counters)):
+                continue
+            seats[t] -= size
+            for c in range(num_counters):
+                team[c] += load[c]
+            # As vagas que sobram precisam bastar para os mínimos do time
+            if all(lower[c] - team[c] <= seats[t] for c in range(num_counters)) and place(k + 1):
+                return True
+            seats[t] += size
+            for c in range(num_counters):
+                team[c] -= load[c]
+        return False
+
+    try:
+        return place(0)
+    except Exhausted:
+        return True
+
+
+def rule_conflict(
+    players: List[Player],
+    num_teams: int,
+    rules: Sequence[Tuple[str, List[Player]]],
+) -> Optional[str]:
+    """Motivo da primeira regra extra que não cabe nos times junto com as anteriores
+    e com os limites de top players e alta intensidade; None se todas cabem."""
+    if not rules:
+        return None
+    sizes = _team_sizes(len(players), num_teams)
+    balancer = TeamBalancer(players, num_teams)
+    for kind, members in rules:
+        balancer.add_rule(kind, members)
+        described = f"Regra '{kind}' ({', '.join(p.name for p in members)})"
+        try:
+            compiled = balancer.constraints
+        except ValueError as exc:
+            return f"{described} impossível: {exc}"
+        if not _rules_fit(compiled, sizes):
+            return (
+                f"{described} impossível: não há como montar os times respeitando os tamanhos, "
+                f"os top players, a alta intensidade e as demais regras"
+            )
+    return None
+
+
+def analyze(
+    players: List[Player],
+    num_teams: int,
+    tolerance: Optional[float] = None,
+    exact_budget_ms: Optional[float] = EXACT_BUDGET_MS,
+    rules: Sequence[Tuple[str, List[Player]]] = (),
+) -> FeasibilityReport:
+    """Verifica se existe distribuição válida e calcula o limite inferior da diferença.
+
+    Primeiro aplica checagens baratas (tamanhos, intensidade, regras extras
+    contra tamanhos e limites, limites de força); depois, se houver orçamento,
+    tenta provar o valor exato com a busca branch-and-bound (sem as regras
+    extras: o valor continua sendo um limite inferior). Sem conclusão dentro
+    do prazo, assume viável.
+    """
+    if num_teams <= 0:
+        return FeasibilityReport(False, "Número de times deve ser positivo")
+    if len(players) < num_teams:
+        return FeasibilityReport(
+            False,
+            f"Selecione pelo menos um jogador por time ({len(players)} jogadores para {num_teams} times)",
+        )
+
+    conflict = rule_conflict(players, num_teams, rules)
+    if conflict:
+        return FeasibilityReport(False, conflict)
+
+    balancer = TeamBalancer(players, num_teams)
+    if tolerance is None:
+        tolerance = max(balancer.tolerances)
+
+    bound = spread_lower_bound(players, num_teams)
+    if bound is None:
+        return FeasibilityReport(
+            False,
+            "Não há como dividir os jogadores de alta intensidade respeitando os tamanhos dos times",
+        )
+    if bound > tolerance + 1e-9:
+        return FeasibilityReport(
+            False,
+            f"A diferença de força entre os times seria de pelo menos {bound:.2f}, "
+            f"acima da tolerância de {tolerance:.2f}",
+            bound,
+        )
+
+    if not exact_budget_ms:
+        return FeasibilityReport(True, None, bound)
+
+    balancer.set_time_budget(exact_budget_ms)
+    best = balancer.minimum_spread()
+    if balancer.timed_out:
+        return FeasibilityReport(True, None, bound)
+    if best is None:
+        return FeasibilityReport(
+            False,
+            "Nenhuma distribuição separa os melhores jogadores e equilibra a alta intensidade",
+            bound,
+        )
+    if best > tolerance + 1e-9:
+        return FeasibilityReport(
+            False,
+            f"A menor diferença de força possível entre os times é {best:.2f}, "
+            f"acima da tolerância de {tolerance:.2f}",
+            best,
+            exact=not rules,
+        )
+    # Com regras extras a menor diferença pode ser maior: `best` fica como limite
+    return FeasibilityReport(True, None, best, exact=not rules)
@@ -0,0 +1,408 @@
+"""Armazenamento de jobs de balanceamento.
+
+`MemoryJobStore` guarda os jobs no próprio processo; `SQLiteJobStore` usa um
+arquivo SQLite em modo WAL compartilhado por vários processos no mesmo host
+(ex.: workers do gunicorn), para que /balance_status e /balance_result
+funcionem em qualquer worker. Todas as operações são atômicas.
+
+Um job pode ser marcado como compartilhado (`share`, quando pedidos idênticos
+se unem a ele): `take_result` então entrega o resultado sem removê-lo, e ele
+fica até expirar. A marca mora no próprio armazenamento, então vale para
+qualquer worker que receber a consulta.
+
+Cada job tem um número de versão, incrementado a cada mudança de status ou de
+progresso; `wait` usa a versão para entregar só as novidades (ver
+/balance_events). O progresso também renova `updated`: jobs na fila ou rodando
+sem novidade por muito tempo são de um worker que morreu (`abandon_stale`).
+"""
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ('done', 'error')
+ABANDONED_ERROR = 'O job foi abandonado: o worker parou antes de concluir'
+WAIT_POLL_INTERVAL = 0.1  # segundos entre consultas quando não há notificação
+
+
+class JobStore:
+    """Interface comum dos backends de jobs."""
+
+    def create(self, job_id: str, queue_limit: Optional[int] = None) -> bool:
+        """Cria o job como 'queued'; False se já houver `queue_limit` jobs na fila."""
+        raise NotImplementedError
+
+    def transition(self, job_id: str, expected: Iterable[str], status: str,
+                   error: Optional[str] = None, ctx: Optional[dict] = None) -> bool:
+        """Muda o status se o atual estiver em `expected`; False se não mudou."""
+        raise NotImplementedError
+
+    def status(self, job_id: str) -> Optional[Tuple[str, Optional[str]]]:
+        """(status, erro) do job, ou None se não existir."""
+        raise NotImplementedError
+
+    def set_progress(self, job_id: str, progress: dict) -> bool:
+        """Registra o progresso de um job em execução; False se não estiver rodando."""
+        raise NotImplementedError
+
+    def snapshot(self, job_id: str) -> Optional[dict]:
+        """Status, erro, progresso e versão do job, ou None se não existir."""
+        raise NotImplementedError
+
+    def wait(self, job_id: str, version: Optional[int], timeout: float) -> Optional[dict]:
+        """Espera até a versão do job diferir de `version` ou passar `timeout`.
+
+        Retorna o snapshot atual (None se o job não existir). A implementação
+        padrão consulta o armazenamento a cada WAIT_POLL_INTERVAL.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.snapshot(job_id)
+            if job is None or job['version'] != version or time.monotonic() >= deadline:
+                return job
+            time.sleep(min(WAIT_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    def share(self, job_id: str) -> bool:
+        """Marca o resultado do job como compartilhado; False se o job não existir."""
+        raise NotImplementedError
+
+    def take_result(self, job_id: str, remove: bool = True) -> Tuple[Optional[str], Optional[dict]]:
+        """Retorna (status, contexto); se concluído e `remove`, remove o job, salvo se compartilhado."""
+        raise NotImplementedError
+
+    def count(self, status: str) -> int:
+        raise NotImplementedError
+
+    def expire(self, ttl_seconds: float, now: Optional[float] = None) -> int:
+        """Remove jobs concluídos parados há mais que `ttl_seconds`; retorna quantos."""
+        raise NotImplementedError
+
+    def abandon_stale(self, stale_seconds: float, now: Optional[float] = None) -> int:
+        """Marca como 'error' jobs na fila ou rodando sem novidade há mais que `stale_seconds`.
+
+        São jobs de um worker que morreu: deixam de ocupar a fila, quem espera
+        por eles recebe o erro e depois expiram como os demais. Retorna quantos.
+        """
+        raise NotImplementedError
+
+    def evict_contexts(self, max_contexts: int) -> int:
+        """Mantém no máximo `max_contexts` resultados, descartando os mais antigos."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        # Acorda quem espera em `wait` a cada mudança
+        self._changed = threading.Condition(self._lock)
+
+    def create(self, job_id, queue_limit=None):
+        now = time.time()
+        with self._lock:
+            if queue_limit is not None and self._count('queued') >= queue_limit:
+                return False
+            self._jobs[job_id] = {
+                'status': 'queued', 'error': None, 'ctx': None, 'progress': None, 'version': 0,
+                'keep': False, 'created': now, 'updated': now,
+            }
+            return True
+
+    def transition(self, job_id, expected, status, error=None, ctx=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] not in expected:
+                return False
+            job.update(status=status, error=error, ctx=ctx, updated=time.time(), version=job['version'] + 1)
+            self._changed.notify_all()
+            return True
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return (job['status'], job['error']) if job else None
+
+    def set_progress(self, job_id, progress):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != 'running':
+                return False
+            job.update(progress=dict(progress), updated=time.time(), version=job['version'] + 1)
+            self._changed.notify_all()
+            return True
+
+    def _snapshot(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return {
+            'status': job['status'], 'error': job['error'],
+            'progress': job['progress'], 'version': job['version'],
+        }
+
+    def snapshot(self, job_id):
+        with self._lock:
+            return self._snapshot(job_id)
+
+    def wait(self, job_id, version, timeout):
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._snapshot(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job['version'] != version or remaining <= 0:
+                    return job
+                self._changed.wait(remaining)
+
+    def share(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job['keep'] = True
+            return True
+
+    def take_result(self, job_id, remove=True):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None, None
+            if job['status'] != 'done':
+                return job['status'], None
+            if not remove or job['keep']:
+                return 'done', job['ctx']
+            self._changed.notify_all()
+            return 'done', self._jobs.pop(job_id)['ctx']
+
+    def _count(self, status):
+        return sum(1 for job in self._jobs.values() if job['status'] == status)
+
+    def count(self, status):
+        with self._lock:
+            return self._count(status)
+
+    def expire(self, ttl_seconds, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [
+                j_id for j_id, job in self._jobs.items()
+                if job['status'] in FINISHED and now - job['updated'] > ttl_seconds
+            ]
+            for j_id in expired:
+                del self._jobs[j_id]
+            if expired:
+                self._changed.notify_all()
+            return len(expired)
+
+    def abandon_stale(self, stale_seconds, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = [
+                job for job in self._jobs.values()
+                if job['status'] not in FINISHED and now - job['updated'] > stale_seconds
+            ]
+            for job in stale:
+                job.update(status='error', error=ABANDONED_ERROR, updated=now, version=job['version'] + 1)
+            if stale:
+                self._changed.notify_all()
+            return len(stale)
+
+    def evict_contexts(self, max_contexts):
+        with self._lock:
+            stored = sorted((job['updated'], j_id) for j_id, job in self._jobs.items() if job['ctx'] is not None)
+            excess = stored[:max(0, len(stored) - max_contexts)]
+            for _, j_id in excess:
+                del self._jobs[j_id]
+            if excess:
+                self._changed.notify_all()
+            return len(excess)
+
+    def stats(self):
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {
+                'stored_jobs': len(self._jobs),
+                'stored_contexts': sum(1 for job in self._jobs.values() if job['ctx'] is not None),
+                **{f'status_{k}': v for k, v in counts.items()},
+            }
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs em SQLite (WAL): seguro entre threads e processos do mesmo host.
+
+    O contexto do resultado é guardado com pickle e o progresso em JSON; cada
+    thread usa sua própria conexão e transições usam BEGIN IMMEDIATE. `wait`
+    consulta a versão periodicamente, pois a mudança pode vir de outro processo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, error TEXT, ctx BLOB,"
+                " created REAL NOT NULL, updated REAL NOT NULL,"
+                " progress TEXT, version INTEGER NOT NULL DEFAULT 0, keep INTEGER NOT NULL DEFAULT 0)"
+            )
+            # Bancos criados antes do progresso (ou da marca de compartilhado) não têm as colunas novas
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'progress' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+            if 'version' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            if 'keep' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN keep INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def create(self, job_id, queue_limit=None):
+        now = time.time()
+        with self._transaction() as conn:
+            if queue_limit is not None:
+                (queued,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+                if queued >= queue_limit:
+                    return False
+            conn.execute(
+                "INSERT INTO jobs (id, status, created, updated) VALUES (?, 'queued', ?, ?)",
+                (job_id, now, now),
+            )
+            return True
+
+    def transition(self, job_id, expected, status, error=None, ctx=None):
+        expected = tuple(expected)
+        blob = pickle.dumps(ctx, protocol=pickle.HIGHEST_PROTOCOL) if ctx is not None else None
+        placeholders = ','.join('?' * len(expected))
+        with self._transaction() as conn:
+            cur = conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, ctx = ?, updated = ?, version = version + 1 "
+                f"WHERE id = ? AND status IN ({placeholders})",
+                (status, error, blob, time.time(), job_id, *expected),
+            )
+            return cur.rowcount == 1
+
+    def status(self, job_id):
+        row = self._conn().execute("SELECT status, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_progress(self, job_id, progress):
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET progress = ?, updated = ?, version = version + 1 "
+                "WHERE id = ? AND status = 'running'",
+                (json.dumps(progress), time.time(), job_id),
+            )
+            return cur.rowcount == 1
+
+    def snapshot(self, job_id):
+        row = self._conn().execute(
+            "SELECT status, error, progress, version FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'status': row[0], 'error': row[1],
+            'progress': json.loads(row[2]) if row[2] is not None else None, 'version': row[3],
+        }
+
+    def share(self, job_id):
+        with self._transaction() as conn:
+            cur = conn.execute("UPDATE jobs SET keep = 1 WHERE id = ?", (job_id,))
+            return cur.rowcount == 1
+
+    def take_result(self, job_id, remove=True):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status, ctx, keep FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None, None
+            if row[0] != 'done':
+                return row[0], None
+            if remove and not row[2]:
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return 'done', pickle.loads(row[1]) if row[1] is not None else None
+
+    def count(self, status):
+        (total,) = self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()
+        return total
+
+    def expire(self, ttl_seconds, now=None):
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'error') AND updated < ?",
+                (now - ttl_seconds,),
+            )
+            return cur.rowcount
+
+    def abandon_stale(self, stale_seconds, now=None):
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'error', error = ?, updated = ?, version = version + 1 "
+                "WHERE status IN ('queued', 'running') AND updated < ?",
+                (ABANDONED_ERROR, now, now - stale_seconds),
+            )
+            return cur.rowcount
+
+    def evict_contexts(self, max_contexts):
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "DELETE FROM jobs WHERE id IN ("
+                " SELECT id FROM jobs WHERE ctx IS NOT NULL ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (max_contexts,),
+            )
+            return cur.rowcount
+
+    def stats(self):
+        conn = self._conn()
+        (stored,) = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()
+        (contexts,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE ctx IS NOT NULL").fetchone()
+        counts = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {
+            'stored_jobs': stored,
+            'stored_contexts': contexts,
+            **{f'status_{status}': total for status, total in counts},
+        }
+
+
+def create_job_store() -> JobStore:
+    """Escolhe o backend por JOB_STORE ('memory' ou 'sqlite') e JOB_STORE_PATH."""
+    backend = os.environ.get('JOB_STORE', 'memory').lower()
+    if backend == 'sqlite':
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.sqlite3')
+        return SQLiteJobStore(os.environ.get('JOB_STORE_PATH', default_path))
+    if backend != 'memory':
+        logger.warning("JOB_STORE desconhecido (%s); usando memória", backend)
+    return MemoryJobStore()
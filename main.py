@@ -1,73 +1,276 @@
-from flask import Flask, render_template, request, jsonify
-from team_balancer import TeamBalancer, Player, real_players, Intensity, save_players, players_lock
+import time
+
+# Início da importação do app: base da medição de cold start (ver _startup)
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, render_template, request, jsonify
+from team_balancer import (
+    TeamBalancer, Player, real_players, roster, Intensity, players_lock, ENGINES,
+    save_player, delete_saved_player, wait_players_saved, DATA_FILE,
+    refresh_players, roster_changed, roster_transaction, ensure_players_loaded,
+)
+from feasibility import analyze as analyze_feasibility, EXACT_BUDGET_MS
+from candidate_pool import generate_candidates, get_pool, configured_workers, SEED_STRIDE
+from job_store import create_job_store, FINISHED
+from balance_cache import create_balance_cache, roster_key
+from option_selection import DistributionEncoder, select_diverse
+from match_history import create_match_history
+from constraints import RULE_KINDS
+import metrics
+import json
 import os
 import uuid
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 
 
 app = Flask(__name__)
 
-# Armazena jobs de balanceamento em memória simples
-job_store = {}
-job_lock = threading.Lock()
+# Armazena jobs de balanceamento (memória ou SQLite compartilhado, ver JOB_STORE)
+job_store = create_job_store()
+# Resultados por seleção de jogadores e união de pedidos idênticos em andamento
+balance_cache = create_balance_cache()
+# Quem jogou junto nas últimas partidas; penaliza repetir as mesmas duplas
+match_history = create_match_history(os.path.dirname(DATA_FILE))
+HISTORY_WEIGHT = float(os.environ.get('HISTORY_WEIGHT', 0.5))
+
+# Execução limitada: poucos workers fixos e fila com tamanho máximo
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT', 16))
+JOB_RETRY_AFTER = 5  # segundos sugeridos ao cliente quando a fila está cheia
+# Jobs concluídos expiram após o TTL; no máximo JOB_MAX_CONTEXTS resultados ficam guardados
+JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 600))
+JOB_MAX_CONTEXTS = int(os.environ.get('JOB_MAX_CONTEXTS', 50))
+# Jobs na fila ou rodando sem novidade há mais que isso são de um worker que morreu
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 600))
+JOB_SWEEP_INTERVAL = 30
+# Progresso enviado ao job_store no máximo a cada intervalo; SSE manda keepalive sem novidades
+JOB_PROGRESS_INTERVAL = 0.25
+SSE_KEEPALIVE = 15
+# Quantidade de opções exibidas; as extras podem ter até OPTION_SPREAD_SLACK de
+# diferença de força a mais que a melhor
+DEFAULT_NUM_OPTIONS = 2
+MIN_NUM_OPTIONS = 1
+MAX_NUM_OPTIONS = 10
+OPTION_SPREAD_SLACK = 0.5
+# /rebalance: no máximo REBALANCE_MAX_MOVES jogadores trocam de time, com busca
+# limitada a REBALANCE_BUDGET_MS antes de sortear do zero
+REBALANCE_MAX_MOVES = int(os.environ.get('REBALANCE_MAX_MOVES', 3))
+REBALANCE_BUDGET_MS = float(os.environ.get('REBALANCE_BUDGET_MS', 50))
+
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='balance-job')
+# Contadores deste processo (a fila e os jobs ficam no job_store)
+job_counters = {
+    'submitted': 0, 'rejected': 0, 'done': 0, 'error': 0, 'expired': 0, 'evicted': 0, 'abandoned': 0,
+}
+counters_lock = threading.Lock()
+_sweeper_started = False
+# Trace por job (etapas e rodadas) anexado ao progresso; também por pedido com trace=1
+JOB_TRACE = os.environ.get('JOB_TRACE', '0') not in ('0', 'false', 'no')
+# /api/balance/batch: problemas por pedido, executados nos mesmos workers dos jobs
+BATCH_MAX_PROBLEMS = int(os.environ.get('BATCH_MAX_PROBLEMS', JOB_QUEUE_LIMIT))
+# Aquecimento em segundo plano ao subir (elenco, templates, pool de processos)
+WARMUP = os.environ.get('WARMUP', '1') not in ('0', 'false', 'no')
+WARMUP_TEMPLATES = ('index.html', 'processing.html', 'results.html')
+# Servidor de desenvolvimento: debug e reloader só quando pedidos
+DEBUG = os.environ.get('FLASK_DEBUG', '0') in ('1', 'true', 'yes')
+
+metrics.describe('players_lock_wait_seconds', 'histogram', 'Espera por players_lock por operação')
+metrics.describe('players_lock_hold_seconds', 'histogram', 'Tempo com players_lock por operação')
+metrics.describe('balance_context_phase_seconds', 'histogram', 'Etapas de _build_balance_context')
+metrics.describe('job_queue_wait_seconds', 'histogram', 'Espera do job na fila até começar')
+metrics.describe('job_run_seconds', 'histogram', 'Execução do job por status final')
+metrics.describe('balance_jobs_total', 'counter', 'Eventos de jobs deste processo')
+metrics.describe('balance_jobs', 'gauge', 'Jobs no job_store por status')
+metrics.describe('balance_cache', 'gauge', 'Estatísticas do cache de resultados')
+metrics.describe('balance_batch_problems_total', 'counter', 'Problemas de /api/balance/batch por resultado')
+metrics.describe('app_startup_seconds', 'gauge', 'Cold start: importação, aquecimento e primeira resposta')
+
+
+@metrics.collector
+def _collect_jobs():
+    with counters_lock:
+        counters = dict(job_counters)
+    for event, value in counters.items():
+        yield 'balance_jobs_total', {'event': event}, value
+    for status in ('queued', 'running'):
+        yield 'balance_jobs', {'status': status}, job_store.count(status)
+    for field, value in balance_cache.stats().items():
+        yield 'balance_cache', {'field': field}, value
+    for stage, ms in _startup.items():
+        if ms is not None:
+            yield 'app_startup_seconds', {'stage': stage}, ms / 1000.0
+
+
+@contextmanager
+def _roster_lock():
+    with players_lock:
+        yield ()
+
+
+@contextmanager
+def _locked_roster(op, write=False):
+    """players_lock com espera e tempo de posse medidos por operação.
+
+    Com `write`, é uma transação do elenco (trava do arquivo, elenco em dia com
+    o que outros workers gravaram) para a escrita não sobrepor a deles.
+    """
+    start = time.perf_counter()
+    with (roster_transaction() if write else _roster_lock()) as changed:
+        if changed:
+            balance_cache.invalidate(changed)
+        acquired = time.perf_counter()
+        metrics.observe('players_lock_wait_seconds', acquired - start, op=op)
+        try:
+            yield
+        finally:
+            metrics.observe('players_lock_hold_seconds', time.perf_counter() - acquired, op=op)
 
 
-def _build_balance_context(selected_players, num_teams):
-    """Gera contexto com duas opções de times balanceados."""
+@app.before_request
+def _refresh_roster():
+    """Recarrega o elenco se outro worker gravou mudanças (um stat por pedido no caso comum)."""
+    ensure_players_loaded()
+    if roster_changed():
+        with _locked_roster('refresh'):
+            changed = refresh_players()
+        if changed:
+            balance_cache.invalidate(changed)
+
+
+def _build_balance_context(selected_players, num_teams, engine='sampling', deadline_ms=None, workers=None,
+                           progress=None, num_options=DEFAULT_NUM_OPTIONS, history=None, rules=()):
+    """Gera contexto com `num_options` opções de times balanceados e diferentes entre si.
+
+    Com `deadline_ms`, devolve as melhores opções encontradas dentro do prazo;
+    `target_reached` indica se todas ficaram na diferença de força desejada;
+    `attempts` soma as tentativas de todas as rodadas e `tolerance_used` é a
+    faixa de tolerância da melhor opção.
+    `workers` (padrão: BALANCE_WORKERS) espalha as rodadas por um pool de processos.
+    `progress`, se informado, recebe dicts com rodadas, candidatos encontrados e
+    o progresso da busca (tolerância, tentativas, melhor diferença).
+    `history` (matriz de match_history na ordem de `selected_players`) faz o
+    sampler evitar duplas que jogaram juntas recentemente. `rules` são regras
+    extras (tipo, jogadores), ver TeamBalancer.add_rule.
+    """
     import random
 
-    balancer = TeamBalancer(selected_players, num_teams)
+    balancer = TeamBalancer(selected_players, num_teams, deadline_ms)
+    progress_state = {'runs': 0, 'candidates': 0}
+
+    def publish(fields=None):
+        if progress is None:
+            return
+        if fields:
+            # A melhor diferença vale para todas as rodadas, não só a atual
+            best = fields.get('best_spread')
+            if best is not None and progress_state.get('best_spread') is not None:
+                fields = {**fields, 'best_spread': min(best, progress_state['best_spread'])}
+            elif best is None:
+                fields = {k: v for k, v in fields.items() if k != 'best_spread'}
+            progress_state.update(fields)
+        progress(dict(progress_state))
 
-    def canonical(teams):
-        return tuple(sorted(tuple(sorted(p.name for p in team)) for team in teams))
+    balancer.on_progress = publish
+    balancer.history_matrix = history
+    balancer.history_weight = HISTORY_WEIGHT
+    for kind, members in rules:
+        balancer.add_rule(kind, members)
 
-    def pair_set(teams):
-        names_per_team = [[p.name for p in team] for team in teams]
-        pairs = set()
-        for names in names_per_team:
-            for i in range(len(names)):
-                for j in range(i + 1, len(names)):
-                    pairs.add(frozenset((names[i], names[j])))
-        return pairs
+    # Rejeita seleções impossíveis antes de qualquer tentativa; o limite
+    # inferior vira alvo de parada antecipada da busca
+    exact_budget_ms = EXACT_BUDGET_MS if deadline_ms is None else min(EXACT_BUDGET_MS, deadline_ms / 2)
+    with metrics.timer('balance_context_phase_seconds', phase='feasibility'):
+        report = analyze_feasibility(selected_players, num_teams, exact_budget_ms=exact_budget_ms, rules=rules)
+    if not report.feasible:
+        raise ValueError(report.reason)
+    balancer.spread_lower_bound = report.spread_lower_bound
+
+    encoder = DistributionEncoder(selected_players)
+    canonical = encoder.key
+    # Mais candidatos que opções, para haver do que escolher as mais diferentes
+    wanted = max(6, 2 * num_options)
+    runs = max(30, 3 * wanted)
 
     candidates = []
     seen = set()
+    # Tentativas (iterações/nós) somadas de todas as rodadas
+    totals = {'attempts': 0}
     state = random.getstate()
     seed_base = random.SystemRandom().randint(0, 2**31 - 1)
-    try:
-        for k in range(30):
-            random.seed(seed_base + 97 * k)
-            dist = balancer.distribute_players()
-            key = canonical(dist)
-            if key not in seen:
-                candidates.append(dist)
-                seen.add(key)
-            if len(candidates) >= 6:
-                break
-    finally:
-        random.setstate(state)
+    with metrics.timer('balance_context_phase_seconds', phase='generation'):
+        try:
+            if engine == 'bnb' and not rules:
+                # A busca exata já devolve as melhores distribuições distintas
+                random.seed(seed_base)
+                candidates = balancer.best_distributions(wanted)
+                totals['attempts'] = balancer.attempts
+            else:
+                def on_result(runs_done, found, attempts):
+                    totals['attempts'] = attempts
+                    publish({
+                        'runs': runs_done,
+                        'candidates': len(found),
+                        'best_spread': round(min(balancer.strength_spread(dist) for dist in found), 3) if found else None,
+                    })
+
+                parallel = generate_candidates(
+                    selected_players, num_teams, engine, seed_base, canonical,
+                    runs=runs,
+                    wanted=wanted,
+                    deadline=balancer.deadline,
+                    lower_bound=balancer.spread_lower_bound,
+                    workers=workers,
+                    on_result=on_result,
+                    history=history,
+                    rules=rules,
+                )
+                if parallel is not None:
+                    candidates = parallel
+                    balancer.time_is_up()
+                else:
+                    for k in range(runs):
+                        if candidates and balancer.time_is_up():
+                            break
+                        random.seed(seed_base + SEED_STRIDE * k)
+                        progress_state['runs'] = k + 1
+                        try:
+                            dist = balancer.distribute_players(engine)
+                        except ValueError:
+                            if candidates and balancer.timed_out:
+                                break
+                            raise
+                        finally:
+                            totals['attempts'] += balancer.attempts
+                        key = canonical(dist)
+                        if key not in seen:
+                            candidates.append(dist)
+                            seen.add(key)
+                            publish({'candidates': len(candidates)})
+                        if len(candidates) >= wanted:
+                            break
+        finally:
+            random.setstate(state)
 
     if not candidates:
         raise ValueError('Não foi possível gerar opções balanceadas')
 
-    if len(candidates) == 1:
-        first = candidates[0]
-        second = candidates[0]
-    else:
-        best_pair = (candidates[0], candidates[1])
-        best_overlap = float('inf')
-        pair_sets = [pair_set(c) for c in candidates]
-        for i in range(len(candidates)):
-            for j in range(i + 1, len(candidates)):
-                overlap = len(pair_sets[i] & pair_sets[j])
-                if overlap < best_overlap:
-                    best_overlap = overlap
-                    best_pair = (candidates[i], candidates[j])
-        first, second = best_pair
+    with metrics.timer('balance_context_phase_seconds', phase='selection'):
+        spreads = [balancer.strength_spread(dist) for dist in candidates]
+        chosen = select_diverse(
+            candidates, spreads, encoder, num_options, spread_limit=min(spreads) + OPTION_SPREAD_SLACK,
+        )
+    options = [candidates[i] for i in chosen]
+
+    target_reached = all(spreads[i] <= balancer.target_spread + 1e-9 for i in chosen)
+    # Faixa de tolerância da melhor opção, como em distribute_players
+    best_spread = min(spreads[i] for i in chosen)
+    tolerance_used = next((t for t in balancer.tolerances if best_spread <= t + 1e-9), None)
 
     options_stats = []
     whatsapp_texts = []
-    for dist in (first, second):
+    for dist in options:
         team_stats = []
         for i, team in enumerate(dist, 1):
             team_strength = balancer.calculate_team_strength(team)
@@ -99,12 +302,89 @@ def _build_balance_context(selected_players, num_teams):
         'whatsapp_text': whatsapp_texts[0],
         'whatsapp_text_alt': whatsapp_texts[1] if len(whatsapp_texts) > 1 else whatsapp_texts[0],
         'num_teams': num_teams,
+        'num_options': num_options,
+        'engine': engine,
+        'deadline_ms': deadline_ms,
+        'target_reached': target_reached,
+        'timed_out': balancer.timed_out,
+        'attempts': totals['attempts'],
+        'tolerance_used': tolerance_used,
+        # Peso médio de histórico por dupla de colegas em cada opção (0 = nenhuma repetida)
+        'history_penalties': [round(balancer.history_penalty(dist), 3) for dist in options] if history else None,
     }
 
 
+# HTML de / da versão atual do elenco: ((epoch, versão), html, instante da mudança)
+_index_page = [None]
+
+
+def _index_etag():
+    return f'{roster.epoch}-{roster.version}'
+
+
+def _render_index():
+    """HTML da página inicial, renderizado uma vez por versão do elenco (chamar com players_lock)."""
+    key = (roster.epoch, roster.version)
+    cached = _index_page[0]
+    if cached is None or cached[0] != key:
+        html = render_template(
+            'index.html', players=real_players, roster_version=roster.version, roster_epoch=roster.epoch,
+            option_counts=range(MIN_NUM_OPTIONS, MAX_NUM_OPTIONS + 1), default_options=DEFAULT_NUM_OPTIONS,
+        )
+        cached = _index_page[0] = (key, html, roster.modified)
+    return cached
+
+
 @app.route('/', methods=['GET'])
 def index():
-    return render_template('index.html', players=real_players)
+    """Página com o elenco; ETag/Last-Modified pela versão do elenco e 304 se o cliente já tem esta."""
+    with _locked_roster('index'):
+        etag = _index_etag()
+        if etag in request.if_none_match:
+            page = None
+        else:
+            _, html, modified = page = _render_index()
+    if page is None:
+        response = Response(status=304)
+    else:
+        response = Response(html, mimetype='text/html')
+        if modified:
+            response.last_modified = modified
+    response.set_etag(etag)
+    # Sempre revalida: a página muda quando o elenco muda
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route('/api/roster', methods=['GET'])
+def roster_delta():
+    """Elenco em JSON; com `since` (e `epoch`) só o que mudou depois daquela versão.
+
+    Responde `version`, `epoch`, `players` (incluídos ou alterados, com os
+    campos do card da página), `removed` (IDs) e `full`: true quando veio o elenco inteiro (sem `since`, versão
+    antiga demais ou de outra linhagem).
+    """
+    since = request.args.get('since', type=int)
+    epoch = request.args.get('epoch')
+    with _locked_roster('roster'):
+        delta = None
+        if since is not None and epoch in (None, roster.epoch):
+            delta = roster.changes_since(since)
+        players, removed = delta if delta is not None else (list(real_players), [])
+        payload = {
+            'version': roster.version,
+            'epoch': roster.epoch,
+            'full': delta is None,
+            # Categoria e rótulo de intensidade: o suficiente para a página montar o card
+            'players': [
+                {**_player_json(p), 'category': p.category.value, 'intensity_label': p.intensity.value}
+                for p in players
+            ],
+            'removed': removed,
+        }
+    response = jsonify(payload)
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/balance', methods=['POST'])
@@ -112,55 +392,623 @@ def balance():
     selected_players = []
     num_teams = int(request.form.get('num_teams', 4))
     shuffle_count = max(1, int(request.form.get('shuffle_count', 1) or 1))
+    engine = request.form.get('engine') or 'sampling'
+    if engine not in ENGINES:
+        return f"Erro: motor de balanceamento inválido ({engine})", 400
+    deadline_ms = request.form.get('deadline_ms') or None
+    if deadline_ms is not None:
+        try:
+            deadline_ms = int(deadline_ms)
+        except ValueError:
+            return "Erro: prazo inválido", 400
+        if deadline_ms <= 0:
+            return "Erro: prazo deve ser positivo", 400
+    try:
+        num_options = int(request.form.get('num_options') or DEFAULT_NUM_OPTIONS)
+    except ValueError:
+        return "Erro: quantidade de opções inválida", 400
+    if not MIN_NUM_OPTIONS <= num_options <= MAX_NUM_OPTIONS:
+        return f"Erro: quantidade de opções deve ser entre {MIN_NUM_OPTIONS} e {MAX_NUM_OPTIONS}", 400
+    try:
+        rule_ids = _parse_rules(request.form.get('rules'))
+    except ValueError as exc:
+        return f"Erro: {exc}", 400
 
-    with players_lock:
-        selected_players = [p for p in real_players if request.form.get(f'player_{p.name}')]
+    with _locked_roster('balance'):
+        selected_players = _selected_players(request.form)
+        rules = _resolve_rules(rule_ids)
+        cache_key = None
+        if balance_cache.enabled:
+            cache_key = roster_key(
+                selected_players, num_teams,
+                engine=engine, deadline_ms=deadline_ms, shuffle_count=shuffle_count, num_options=num_options,
+                rules=rule_ids,
+            )
 
     if len(selected_players) < num_teams:
         return "Erro: Selecione pelo menos um jogador por time", 400
 
     job_id = str(uuid.uuid4())
-    with job_lock:
-        job_store[job_id] = {'status': 'queued', 'error': None, 'ctx': None}
+    if cache_key is not None:
+        outcome, value = balance_cache.lookup_or_reserve(
+            cache_key, job_id, [p.name for p in selected_players], on_join=job_store.share,
+        )
+        if outcome == 'hit':
+            return render_template('results.html', **value)
+        if outcome == 'joined':
+            return render_template('processing.html', job_id=value)
+
+    if not job_store.create(job_id, queue_limit=JOB_QUEUE_LIMIT):
+        if cache_key is not None:
+            balance_cache.release(cache_key, job_id)
+        _count('rejected')
+        return (
+            "Servidor ocupado, tente novamente em alguns segundos",
+            503,
+            {'Retry-After': str(JOB_RETRY_AFTER)},
+        )
+    _count('submitted')
+
+    _start_sweeper()
+    job_executor.submit(
+        _run_balance_job, job_id, list(selected_players), num_teams, shuffle_count, engine, deadline_ms,
+        cache_key, num_options, rules, time.monotonic(), JOB_TRACE or request.form.get('trace') == '1',
+    )
+
+    return render_template('processing.html', job_id=job_id)
+
+
+def _parse_player_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _selected_players(form):
+    """Jogadores marcados no formulário (chamar com players_lock).
+
+    Usa os IDs enviados em `player_ids`; formulários antigos, com um campo
+    `player_<nome>` por jogador, continuam aceitos.
+    """
+    ids = form.getlist('player_ids')
+    if ids:
+        return roster.select(_parse_player_id(v) for v in ids)
+    chosen = {}
+    for key in form:
+        if key.startswith('player_') and form.get(key):
+            player = roster.find(key[len('player_'):])
+            if player is not None:
+                chosen[player.id] = player
+    return roster.select(chosen)
+
 
-    def worker(players_snapshot, teams_count, j_id, count):
+def _parse_rules(raw):
+    """Regras extras em JSON: [{"type": "apart"|"together"|"spread", "ids": [id, ...]}, ...].
+
+    Aceita a lista já decodificada ou o texto (campo de formulário); devolve
+    [(tipo, [ids ordenados])] ou levanta ValueError.
+    """
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raise ValueError('regras inválidas (JSON)')
+    if not isinstance(raw, list):
+        raise ValueError('regras devem ser uma lista')
+    rules = []
+    for rule in raw:
+        kind = rule.get('type') if isinstance(rule, dict) else None
+        if kind not in RULE_KINDS:
+            raise ValueError(f"tipo de regra inválido: {kind!r}")
         try:
-            ctx = _build_balance_context(players_snapshot, teams_count)
+            ids = sorted({int(pid) for pid in rule.get('ids') or []})
+        except (TypeError, ValueError):
+            raise ValueError('IDs inválidos nas regras')
+        rules.append((kind, ids))
+    return rules
+
+
+def _resolve_rules(rule_ids):
+    """Troca os IDs das regras pelos jogadores do elenco (chamar com players_lock)."""
+    return [(kind, [p for p in (roster.get(pid) for pid in ids) if p is not None]) for kind, ids in rule_ids]
+
+
+def _find_player(data):
+    """Jogador indicado por `id` ou, na falta dele, pelo nome (`old_name`/`name`)."""
+    if data.get('id') is not None:
+        return roster.get(_parse_player_id(data['id']))
+    name = data.get('old_name') or data.get('name')
+    return roster.find(name) if name else None
+
+
+def _count(counter, amount=1):
+    with counters_lock:
+        job_counters[counter] += amount
+
+
+def _run_balance_job(job_id, players_snapshot, teams_count, count, engine_name, budget_ms, cache_key=None,
+                     num_options=DEFAULT_NUM_OPTIONS, rules=(), queued_at=None, trace=False):
+    started = time.monotonic()
+    status = 'expired'
+    try:
+        # O job pode ter expirado enquanto esperava na fila
+        if not job_store.transition(job_id, ('queued',), 'running'):
+            return
+        if queued_at is not None:
+            metrics.observe('job_queue_wait_seconds', started - queued_at)
+        job_trace = metrics.start_trace() if trace else None
+        last_progress = [0.0]
+        latest = {}
+
+        def progress(fields):
+            latest.clear()
+            latest.update(fields)
+            now = time.monotonic()
+            if now - last_progress[0] >= JOB_PROGRESS_INTERVAL:
+                last_progress[0] = now
+                job_store.set_progress(job_id, fields)
+
+        def final_progress():
+            # Último progresso (o intervalo pode ter descartado) e o trace, antes de o job sair de 'running'
+            if job_trace is not None:
+                metrics.stop_trace()
+                job_store.set_progress(job_id, {**latest, 'trace': job_trace.as_dict()})
+            elif latest:
+                job_store.set_progress(job_id, latest)
+
+        try:
+            history = None
+            if HISTORY_WEIGHT > 0:
+                history = match_history.penalty_matrix([p.id for p in players_snapshot])
+            ctx = _build_balance_context(
+                players_snapshot, teams_count, engine_name, budget_ms, progress=progress, num_options=num_options,
+                history=history, rules=rules,
+            )
             ctx['shuffle_count'] = count
-            with job_lock:
-                job_store[j_id]['status'] = 'done'
-                job_store[j_id]['ctx'] = ctx
+            # Vai para o cache antes de concluir: pedidos seguintes usam o cache em
+            # vez de se unir a um job cujo resultado já pode ter sido lido
+            if cache_key is not None:
+                balance_cache.complete(cache_key, job_id, ctx)
+            final_progress()
+            job_store.transition(job_id, ('running',), 'done', ctx=ctx)
+            status = 'done'
+            _count('done')
+            _count('evicted', job_store.evict_contexts(JOB_MAX_CONTEXTS))
         except Exception as exc:
-            with job_lock:
-                job_store[j_id]['status'] = 'error'
-                job_store[j_id]['error'] = str(exc)
+            final_progress()
+            job_store.transition(job_id, ('running',), 'error', error=str(exc))
+            status = 'error'
+            _count('error')
+    finally:
+        metrics.stop_trace()
+        metrics.observe('job_run_seconds', time.monotonic() - started, status=status)
+        if cache_key is not None:
+            balance_cache.release(cache_key, job_id)
 
-    threading.Thread(target=worker, args=(list(selected_players), num_teams, job_id, shuffle_count), daemon=True).start()
 
-    return render_template('processing.html', job_id=job_id)
+def sweep_jobs(now=None):
+    """Remove jobs concluídos (ou com erro) parados há mais que JOB_TTL_SECONDS.
+
+    Antes, jobs na fila ou rodando sem novidade há mais que JOB_STALE_SECONDS
+    (worker que morreu) viram erro: liberam a fila e encerram o SSE de quem espera.
+    """
+    _count('abandoned', job_store.abandon_stale(JOB_STALE_SECONDS, now))
+    expired = job_store.expire(JOB_TTL_SECONDS, now)
+    _count('expired', expired)
+    return expired
+
+
+def _sweeper_loop():
+    while True:
+        time.sleep(JOB_SWEEP_INTERVAL)
+        try:
+            sweep_jobs()
+        except Exception:
+            app.logger.exception("Falha ao limpar jobs expirados")
+
+
+def _start_sweeper():
+    global _sweeper_started
+    with counters_lock:
+        if _sweeper_started:
+            return
+        _sweeper_started = True
+    threading.Thread(target=_sweeper_loop, name='job-sweeper', daemon=True).start()
+
+
+# Cold start em ms desde IMPORT_STARTED: fim da importação, fim do aquecimento e primeira resposta
+_startup = {'import_ms': None, 'warmup_ms': None, 'first_response_ms': None}
+
+
+def _since_import():
+    return round((time.perf_counter() - IMPORT_STARTED) * 1000.0, 1)
+
+
+@app.after_request
+def _record_first_response(response):
+    if _startup['first_response_ms'] is None:
+        _startup['first_response_ms'] = _since_import()
+        app.logger.info("Cold start: importação %s ms, primeira resposta %s ms",
+                        _startup['import_ms'], _startup['first_response_ms'])
+    return response
+
+
+def _warmup():
+    """Deixa prontos o elenco, os templates e o pool de processos antes do primeiro sorteio.
+
+    Não usa `random`: os jobs dependem da sequência semeada por eles.
+    """
+    try:
+        ensure_players_loaded()
+        for name in WARMUP_TEMPLATES:
+            app.jinja_env.get_template(name)
+        with app.test_request_context('/'), players_lock:
+            _render_index()
+        match_history.stats()
+        with players_lock:
+            players = list(real_players)
+        if len(players) >= 2:
+            TeamBalancer(players, 2).constraints
+        pool = get_pool()
+        if pool is not None:
+            # Os processos do pool só sobem na primeira tarefa
+            for _ in range(configured_workers()):
+                pool.submit(int)
+    except Exception:
+        app.logger.exception("Falha no aquecimento")
+    _startup['warmup_ms'] = _since_import()
+
+
+def _start_warmup():
+    threading.Thread(target=_warmup, name='warmup', daemon=True).start()
+
+
+@app.route('/balance_stats', methods=['GET'])
+def balance_stats():
+    with counters_lock:
+        counters = dict(job_counters)
+    return jsonify({
+        'queue_depth': job_store.count('queued'),
+        'active_jobs': job_store.count('running'),
+        'workers': JOB_WORKERS,
+        'queue_limit': JOB_QUEUE_LIMIT,
+        'counters': counters,
+        'cache': balance_cache.stats(),
+        'startup': dict(_startup),
+        **job_store.stats(),
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Contadores e histogramas no formato texto do Prometheus (vazio com METRICS=0)."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/balance_status/<job_id>', methods=['GET'])
 def balance_status(job_id):
-    with job_lock:
-        job = job_store.get(job_id)
-        if not job:
-            return jsonify({'status': 'not_found'}), 404
-        return jsonify({'status': job['status'], 'error': job.get('error')})
+    job = job_store.snapshot(job_id)
+    if not job:
+        return jsonify({'status': 'not_found'}), 404
+    return jsonify({'status': job['status'], 'error': job['error'], 'progress': job['progress']})
+
+
+def _sse(payload, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"data: {json.dumps(payload)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.route('/balance_events/<job_id>', methods=['GET'])
+def balance_events(job_id):
+    """Stream SSE do job: progresso a cada novidade e o status final assim que muda.
+
+    Cada evento traz `status` e, enquanto roda, o último progresso registrado;
+    o stream termina em 'done', 'error' ou 'not_found'. /balance_status
+    continua disponível para clientes sem EventSource.
+    """
+    def stream():
+        version = None
+        while True:
+            job = job_store.wait(job_id, version, SSE_KEEPALIVE)
+            if job is None:
+                yield _sse({'status': 'not_found'})
+                return
+            if job['version'] == version:
+                yield ": keepalive\n\n"
+                continue
+            version = job['version']
+            if job['status'] in FINISHED:
+                yield _sse({'status': job['status'], 'error': job['error']}, version)
+                return
+            yield _sse({'status': job['status'], 'progress': job['progress']}, version)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
 
 
 @app.route('/balance_result/<job_id>', methods=['GET'])
 def balance_result(job_id):
-    with job_lock:
-        job = job_store.get(job_id)
-        if not job:
-            return "Tarefa não encontrada", 404
-        if job['status'] != 'done':
-            return "Tarefa ainda não concluída", 202
-        ctx = job_store.pop(job_id)['ctx']
+    # Jobs compartilhados por pedidos idênticos mantêm o resultado até expirar
+    status, ctx = job_store.take_result(job_id)
+    if status is None:
+        return "Tarefa não encontrada", 404
+    if status != 'done':
+        return "Tarefa ainda não concluída", 202
     return render_template('results.html', **ctx)
 
 
+@app.route('/record_match', methods=['POST'])
+def record_match():
+    """Registra a distribuição jogada: {"teams": [[id, ...], ...], "played_at": epoch opcional}."""
+    data = request.get_json(silent=True) or {}
+    teams = data.get('teams')
+    if not isinstance(teams, list) or len(teams) < 2:
+        return jsonify({'error': 'Informe os times jogados (listas de IDs)'}), 400
+    try:
+        teams = [[int(pid) for pid in team] for team in teams]
+        played_at = float(data['played_at']) if data.get('played_at') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'IDs de jogadores inválidos'}), 400
+
+    with _locked_roster('record_match'):
+        players = [roster.get(pid) for team in teams for pid in team]
+    if any(p is None for p in players):
+        return jsonify({'error': 'Jogador não encontrado'}), 404
+
+    pairs = match_history.record(teams, played_at)
+    # Resultados em cache não consideram a nova partida
+    balance_cache.invalidate(p.name for p in players)
+    return jsonify({'message': 'Partida registrada', 'pairs': pairs, **match_history.stats()}), 200
+
+
+@app.route('/rebalance', methods=['POST'])
+def rebalance():
+    """Ajusta uma distribuição a quem chegou/saiu mudando o mínimo de jogadores de time.
+
+    Corpo: {"teams": [[id, ...], ...], "add": [id, ...], "remove": [id, ...],
+    "max_moves" e "rules" opcionais}. Responde os times (mesma ordem), as mudanças feitas
+    e a diferença de força.
+    """
+    data = request.get_json(silent=True) or {}
+    teams = data.get('teams')
+    if not isinstance(teams, list) or len(teams) < 2:
+        return jsonify({'error': 'Informe a distribuição atual (listas de IDs)'}), 400
+    try:
+        teams = [[int(pid) for pid in team] for team in teams]
+        add = [int(pid) for pid in data.get('add') or []]
+        remove = {int(pid) for pid in data.get('remove') or []}
+        max_moves = int(data.get('max_moves', REBALANCE_MAX_MOVES))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'IDs de jogadores inválidos'}), 400
+    try:
+        rule_ids = _parse_rules(data.get('rules'))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if not 0 <= max_moves <= REBALANCE_MAX_MOVES:
+        return jsonify({'error': f'max_moves deve ser entre 0 e {REBALANCE_MAX_MOVES}'}), 400
+
+    # Quem saiu só deixa a distribuição: pode até já ter sido apagado do elenco
+    teams = [[pid for pid in team if pid not in remove] for team in teams]
+    ids = [pid for team in teams for pid in team] + add
+    with _locked_roster('rebalance'):
+        players = {pid: roster.get(pid) for pid in ids}
+        rules = _resolve_rules(rule_ids)
+    missing = [pid for pid, p in players.items() if p is None]
+    if missing:
+        return jsonify({'error': 'Jogador não encontrado', 'ids': missing}), 404
+    # Mesmos objetos do elenco na distribuição e no balanceador (top players por identidade)
+    current = [[players[pid] for pid in team] for team in teams]
+    selected = list({pid: players[pid] for pid in ids if pid not in remove}.values())
+    if len(selected) < len(teams):
+        return jsonify({'error': 'Jogadores insuficientes para o número de times'}), 400
+
+    # O sorteio do zero (quando a vizinhança não basta) também tem prazo
+    balancer = TeamBalancer(selected, len(teams), deadline_ms=4 * REBALANCE_BUDGET_MS)
+    try:
+        for kind, members in rules:
+            balancer.add_rule(kind, members)
+        result, moves = balancer.rebalance(current, max_moves, REBALANCE_BUDGET_MS / 1000.0)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 422
+    return jsonify({
+        'teams': [[p.id for p in team] for team in result],
+        'strengths': [round(balancer.calculate_team_strength(team), 2) for team in result],
+        'spread': round(balancer.strength_spread(result), 3),
+        'moves': [{'id': p.id, 'name': p.name, 'from': src, 'to': dst} for p, src, dst in moves],
+    }), 200
+
+
+def _player_json(p):
+    return {
+        'id': p.id,
+        'name': p.name,
+        'rating': p.overall_rating,
+        'intensity': p.intensity.name,
+        'mensalista': p.mensalista,
+    }
+
+
+def _context_json(ctx):
+    """Contexto de _build_balance_context em JSON: opções com times, força e jogadores."""
+    return {
+        'options': [
+            [
+                {'number': team['number'], 'strength': team['strength'],
+                 'players': [_player_json(p) for p in team['players']]}
+                for team in option
+            ]
+            for option in ctx['options']
+        ],
+        'whatsapp_texts': ctx['whatsapp_texts'],
+        'num_teams': ctx['num_teams'],
+        'num_options': ctx['num_options'],
+        'engine': ctx['engine'],
+        'deadline_ms': ctx['deadline_ms'],
+        'target_reached': ctx['target_reached'],
+        'timed_out': ctx['timed_out'],
+        'history_penalties': ctx['history_penalties'],
+    }
+
+
+def _parse_batch_problem(problem):
+    """Valida um problema do lote; devolve (ids, num_teams, num_options, engine, prazo, regras) ou levanta ValueError."""
+    if not isinstance(problem, dict):
+        raise ValueError('problema deve ser um objeto')
+    try:
+        ids = [int(pid) for pid in problem.get('player_ids') or []]
+        num_teams = int(problem.get('num_teams', 4))
+        num_options = int(problem.get('num_options') or DEFAULT_NUM_OPTIONS)
+        deadline_ms = problem.get('deadline_ms')
+        deadline_ms = int(deadline_ms) if deadline_ms is not None else None
+    except (TypeError, ValueError):
+        raise ValueError('player_ids, num_teams, num_options e deadline_ms devem ser inteiros')
+    engine = problem.get('engine') or 'sampling'
+    if engine not in ENGINES:
+        raise ValueError(f'motor de balanceamento inválido ({engine})')
+    if num_teams < 2:
+        raise ValueError('num_teams deve ser pelo menos 2')
+    if not MIN_NUM_OPTIONS <= num_options <= MAX_NUM_OPTIONS:
+        raise ValueError(f'quantidade de opções deve ser entre {MIN_NUM_OPTIONS} e {MAX_NUM_OPTIONS}')
+    if deadline_ms is not None and deadline_ms <= 0:
+        raise ValueError('prazo deve ser positivo')
+    return ids, num_teams, num_options, engine, deadline_ms, _parse_rules(problem.get('rules'))
+
+
+def _run_batch_problem(job_id, players, num_teams, num_options, engine, deadline_ms, rules, queued_at):
+    """Executa um problema do lote como job do job_store (entra na mesma fila e métricas de /balance)."""
+    if not job_store.transition(job_id, ('queued',), 'running'):
+        raise RuntimeError('Problema expirou na fila')
+    started = time.perf_counter()
+    metrics.observe('job_queue_wait_seconds', time.monotonic() - queued_at)
+    try:
+        history = None
+        if HISTORY_WEIGHT > 0:
+            history = match_history.penalty_matrix([p.id for p in players])
+        ctx = _build_balance_context(
+            players, num_teams, engine, deadline_ms, num_options=num_options, history=history, rules=rules,
+        )
+        result = _context_json(ctx)
+    except Exception as exc:
+        job_store.transition(job_id, ('running',), 'error', error=str(exc))
+        _count('error')
+        raise
+    # O resultado vai só na resposta do lote: o job sai do job_store ao concluir
+    job_store.transition(job_id, ('running',), 'done')
+    job_store.take_result(job_id)
+    _count('done')
+    return result, round((time.perf_counter() - started) * 1000.0, 1)
+
+
+@app.route('/api/balance/batch', methods=['POST'])
+def balance_batch():
+    """Balanceia vários problemas de uma vez e responde um NDJSON com cada resultado assim que sai.
+
+    Corpo: {"problems": [{"player_ids": [...], "num_teams": 4, "num_options": 2,
+    "engine", "deadline_ms", "rules" e "id" opcionais}, ...]} (ou só a lista).
+    Cada linha traz `index` (posição no lote), `id` (o do problema, se houver) e
+    `status` 'done' com `result` (opções como em /balance) ou 'error' com `error`;
+    a última linha, com status 'complete', resume o lote. Cada problema entra na
+    fila limitada dos jobs: com a fila cheia, o problema vira erro com
+    `retry_after`, e o pedido inteiro recebe 503 se nenhum problema couber.
+    """
+    data = request.get_json(silent=True)
+    problems = data.get('problems') if isinstance(data, dict) else data
+    if not isinstance(problems, list) or not problems:
+        return jsonify({'error': 'Informe a lista de problemas'}), 400
+    if len(problems) > BATCH_MAX_PROBLEMS:
+        return jsonify({'error': f'No máximo {BATCH_MAX_PROBLEMS} problemas por lote'}), 413
+
+    lines = []
+    parsed = {}
+    for index, problem in enumerate(problems):
+        try:
+            parsed[index] = _parse_batch_problem(problem)
+        except ValueError as exc:
+            lines.append({'index': index, 'status': 'error', 'error': str(exc)})
+    with _locked_roster('batch'):
+        resolved = {
+            index: ({pid: roster.get(pid) for pid in ids}, _resolve_rules(rule_ids))
+            for index, (ids, _, _, _, _, rule_ids) in parsed.items()
+        }
+
+    futures = {}
+    jobs = {}
+    rejected = 0
+    for index, (ids, num_teams, num_options, engine, deadline_ms, _) in parsed.items():
+        players, rules = resolved[index]
+        missing = [pid for pid, p in players.items() if p is None]
+        selected = [p for pid, p in sorted(players.items()) if p is not None]
+        if missing:
+            lines.append({'index': index, 'status': 'error', 'error': 'Jogador não encontrado', 'ids': missing})
+        elif len(selected) < num_teams:
+            lines.append({'index': index, 'status': 'error', 'error': 'Selecione pelo menos um jogador por time'})
+        else:
+            job_id = str(uuid.uuid4())
+            if not job_store.create(job_id, queue_limit=JOB_QUEUE_LIMIT):
+                _count('rejected')
+                rejected += 1
+                lines.append({'index': index, 'status': 'error', 'error': 'Servidor ocupado',
+                              'retry_after': JOB_RETRY_AFTER})
+                continue
+            _count('submitted')
+            future = job_executor.submit(
+                _run_batch_problem, job_id, selected, num_teams, num_options, engine, deadline_ms, rules,
+                time.monotonic(),
+            )
+            futures[future] = index
+            jobs[future] = job_id
+    if rejected and not futures:
+        return (
+            jsonify({'error': 'Servidor ocupado, tente novamente em alguns segundos'}),
+            503,
+            {'Retry-After': str(JOB_RETRY_AFTER)},
+        )
+    _start_sweeper()
+
+    def tagged(line):
+        problem = problems[line['index']]
+        if isinstance(problem, dict) and 'id' in problem:
+            line = {'index': line['index'], 'id': problem['id'], **line}
+        return json.dumps(line, ensure_ascii=False) + '\n'
+
+    def stream():
+        started = time.perf_counter()
+        counts = {'done': 0, 'error': len(lines)}
+        try:
+            for line in lines:
+                yield tagged(line)
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result, elapsed_ms = future.result()
+                    line = {'index': index, 'status': 'done', 'elapsed_ms': elapsed_ms, 'result': result}
+                except Exception as exc:
+                    line = {'index': index, 'status': 'error', 'error': str(exc)}
+                counts[line['status']] += 1
+                yield tagged(line)
+        finally:
+            # Cliente desconectou: o que ainda não começou não roda nem ocupa a fila
+            for future in futures:
+                if future.cancel():
+                    job_store.transition(jobs[future], ('queued',), 'error', error='Lote cancelado')
+            for status, amount in counts.items():
+                metrics.inc('balance_batch_problems_total', amount, status=status)
+        yield json.dumps({
+            'status': 'complete', **counts, 'elapsed_ms': round((time.perf_counter() - started) * 1000.0, 1),
+        }) + '\n'
+
+    return Response(stream(), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @app.route('/add_players', methods=['POST'])
 def add_players():
     try:
@@ -181,11 +1029,18 @@ def add_players():
             new_player = Player(name, overall_rating, intensity, mensalista)
             new_players.append(new_player)
 
-        with players_lock:
-            real_players.extend(new_players)
-            save_players(real_players)
+        with _locked_roster('add', write=True):
+            for p in new_players:
+                roster.add(p)
+            seq = max((save_player(p) for p in new_players), default=0)
+            balance_cache.invalidate(p.name for p in new_players)
+        # Espera o disco fora do lock: leitores do elenco não ficam parados
+        wait_players_saved(seq)
 
-        return jsonify({'message': 'Jogadores adicionados com sucesso'}), 200
+        return jsonify({
+            'message': 'Jogadores adicionados com sucesso',
+            'ids': [p.id for p in new_players],
+        }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -197,19 +1052,17 @@ def update_player():
         if not data:
             return jsonify({'error': 'Requisição inválida'}), 400
 
-        old_name = data.get('old_name') or data.get('name')
         name = data.get('name')
         rating = data.get('rating')
         intensity_key = data.get('intensity')
         mensalista = bool(data.get('mensalista', False))
 
-        with players_lock:
-            target = next((p for p in real_players if p.name == old_name), None)
+        with _locked_roster('update', write=True):
+            target = _find_player(data)
             if not target:
                 return jsonify({'error': 'Jogador não encontrado'}), 404
+            old_name = target.name
 
-            if name:
-                target.name = name
             if rating is not None:
                 try:
                     r = int(rating)
@@ -220,8 +1073,12 @@ def update_player():
                 target.overall_rating = r
             if intensity_key:
                 target.intensity = Intensity[intensity_key.upper()]
+            if name:
+                roster.rename(target, name)
             target.mensalista = mensalista
-            save_players(real_players)
+            seq = save_player(target)
+            balance_cache.invalidate({old_name, target.name})
+        wait_players_saved(seq)
 
         return jsonify({'message': 'Jogador atualizado com sucesso'}), 200
     except Exception as e:
@@ -232,22 +1089,29 @@ def update_player():
 def delete_player():
     try:
         data = request.get_json()
-        if not data or 'name' not in data:
-            return jsonify({'error': 'Nome do jogador é obrigatório'}), 400
+        if not data or ('name' not in data and 'id' not in data):
+            return jsonify({'error': 'ID ou nome do jogador é obrigatório'}), 400
 
-        name = data['name']
-        with players_lock:
-            idx = next((i for i, p in enumerate(real_players) if p.name == name), None)
-            if idx is None:
+        with _locked_roster('delete', write=True):
+            target = _find_player(data)
+            if target is None:
                 return jsonify({'error': 'Jogador não encontrado'}), 404
 
-            real_players.pop(idx)
-            save_players(real_players)
+            roster.remove(target.id)
+            seq = delete_saved_player(target)
+            balance_cache.invalidate([target.name])
+        wait_players_saved(seq)
         return jsonify({'message': 'Jogador removido com sucesso'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 
+_startup['import_ms'] = _since_import()
+# Processos do pool (spawn/forkserver) reimportam o módulo principal como __mp_main__
+if WARMUP and __name__ != '__mp_main__':
+    _start_warmup()
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=DEBUG)
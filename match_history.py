@@ -0,0 +1,170 @@
+"""Histórico de partidas jogadas: quem jogou junto com quem, com decaimento no tempo.
+
+Guarda, para cada dupla de jogadores (por ID), um peso de co-ocorrência: cada
+partida em que jogaram no mesmo time soma 1, e o peso cai pela metade a cada
+`half_life_days`. Só as duplas com peso relevante ficam no arquivo JSON
+(esparso). Vários processos podem usar o mesmo arquivo: cada leitura confere
+por `stat` se ele mudou e o recarrega, e cada partida é registrada sob a
+trava `<arquivo>.lock`, somada ao conteúdo atual do arquivo antes de
+gravar. `penalty_matrix` entrega a matriz densa dos jogadores selecionados
+para o balanceador.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # sem fcntl (Windows) resta o recarregamento por stat, sem trava entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HALF_LIFE_DAYS = 28.0
+MIN_WEIGHT = 0.01  # duplas abaixo disso são esquecidas
+
+
+def _pair(a: int, b: int) -> Tuple[int, int]:
+    return (a, b) if a < b else (b, a)
+
+
+class MatchHistory:
+    def __init__(self, path: str, half_life_days: float = HALF_LIFE_DAYS):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.half_life = half_life_days * 86400.0
+        self._pairs: Optional[Dict[Tuple[int, int], float]] = None
+        # Pesos valem no instante `_reference`; o decaimento até agora é aplicado na leitura
+        self._reference = 0.0
+        self._matches = 0
+        # (inode, mtime_ns, tamanho) do arquivo carregado; mudou, recarrega
+        self._file_id: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+
+    def _decay(self, now: float) -> float:
+        return 0.5 ** (max(0.0, now - self._reference) / self.half_life)
+
+    def _stat_id(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _ensure_loaded(self) -> None:
+        """Carrega o arquivo na primeira vez e de novo sempre que outro processo o regravar."""
+        file_id = self._stat_id()
+        if self._pairs is not None and file_id == self._file_id:
+            return
+        self._pairs = {}
+        self._reference = 0.0
+        self._matches = 0
+        self._file_id = file_id
+        if file_id is None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            self._reference = float(raw.get('reference', 0.0))
+            self._matches = int(raw.get('matches', 0))
+            for key, weight in (raw.get('pairs') or {}).items():
+                a, b = (int(x) for x in key.split(','))
+                self._pairs[_pair(a, b)] = float(weight)
+        except Exception:
+            logger.exception("Falha ao carregar histórico de partidas de %s", self.path)
+
+    @contextmanager
+    def _file_lock(self):
+        """Trava de escrita entre processos (chamar com self._lock)."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def record(self, teams: Sequence[Iterable[int]], played_at: Optional[float] = None) -> int:
+        """Registra uma partida (times como listas de IDs); retorna quantas duplas somaram peso."""
+        now = time.time() if played_at is None else played_at
+        with self._lock, self._file_lock():
+            # Parte do arquivo atual: partidas gravadas por outros processos não se perdem
+            self._ensure_loaded()
+            # Traz todos os pesos para o instante da partida antes de somar
+            if now > self._reference:
+                factor = self._decay(now)
+                self._pairs = {k: w * factor for k, w in self._pairs.items() if w * factor >= MIN_WEIGHT}
+                self._reference = now
+            # Partida antiga registrada depois: soma já com o decaimento dela
+            increment = 0.5 ** ((self._reference - now) / self.half_life)
+            added = 0
+            for team in teams:
+                ids = sorted(set(int(i) for i in team))
+                for x in range(len(ids)):
+                    for y in range(x + 1, len(ids)):
+                        key = (ids[x], ids[y])
+                        self._pairs[key] = self._pairs.get(key, 0.0) + increment
+                        added += 1
+            self._matches += 1
+            self._save()
+            return added
+
+    def _save(self) -> None:
+        data = {
+            'reference': self._reference,
+            'half_life_days': self.half_life / 86400.0,
+            'matches': self._matches,
+            'pairs': {f'{a},{b}': round(w, 4) for (a, b), w in sorted(self._pairs.items())},
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self._file_id = self._stat_id()
+        except Exception:
+            logger.exception("Falha ao salvar histórico de partidas em %s", self.path)
+
+    def penalty_matrix(self, player_ids: Sequence[int], now: Optional[float] = None) -> Optional[List[List[float]]]:
+        """Matriz n×n de pesos (já decaídos) entre os jogadores, na ordem dada.
+
+        None quando nenhuma dupla entre eles tem histórico: o balanceador
+        então nem calcula a penalidade.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._ensure_loaded()
+            if not self._pairs:
+                return None
+            factor = self._decay(now)
+            position = {pid: i for i, pid in enumerate(player_ids)}
+            matrix = [[0.0] * len(player_ids) for _ in player_ids]
+            found = False
+            for (a, b), weight in self._pairs.items():
+                i, j = position.get(a), position.get(b)
+                if i is None or j is None:
+                    continue
+                matrix[i][j] = matrix[j][i] = weight * factor
+                found = True
+            return matrix if found else None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._ensure_loaded()
+            return {'matches': self._matches, 'pairs': len(self._pairs)}
+
+
+def create_match_history(base_dir: str) -> MatchHistory:
+    """Arquivo por MATCH_HISTORY_FILE (padrão: match_history.json) e meia-vida por MATCH_HISTORY_HALF_LIFE_DAYS."""
+    path = os.environ.get('MATCH_HISTORY_FILE', 'match_history.json')
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    return MatchHistory(path, float(os.environ.get('MATCH_HISTORY_HALF_LIFE_DAYS', HALF_LIFE_DAYS)))
@@ -0,0 +1,191 @@
+"""Contadores e histogramas de latência no formato texto do Prometheus.
+
+Registro global do processo: `inc` soma em contadores, `observe` e `timer`
+alimentam histogramas com baldes fixos, `collector` registra funções lidas
+só na coleta (profundidade da fila, cache). `render` gera o texto servido em
+/metrics. Com METRICS=0 tudo vira no-op: cada chamada custa um teste de flag.
+
+Trace por job (opcional): `start_trace` liga um Trace à thread atual; cada
+`timer` com rótulo `phase` anota nele início e duração da etapa, e o código
+pode acrescentar eventos (`Trace.add`) antes de anexar o trace ao job.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ENABLED = os.environ.get('METRICS', '1') not in ('0', 'false', 'no')
+
+# Baldes em segundos: do milissegundo do sampler aos segundos de um job inteiro
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 50000, 100000)
+
+_lock = threading.Lock()
+_help: Dict[str, Tuple[str, str]] = {}
+_counters: Dict[Tuple[str, Tuple], float] = {}
+# (nome, rótulos) -> [contagem por balde..., soma, total]
+_histograms: Dict[Tuple[str, Tuple], List[float]] = {}
+_buckets: Dict[str, Tuple[float, ...]] = {}
+_collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+_local = threading.local()
+
+
+def describe(name: str, kind: str, help_text: str, buckets: Optional[Tuple[float, ...]] = None) -> None:
+    """Declara tipo ('counter', 'histogram', 'gauge') e descrição de uma métrica."""
+    _help[name] = (kind, help_text)
+    if buckets is not None:
+        _buckets[name] = buckets
+
+
+def _labels(labels: Dict[str, object]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if not ENABLED:
+        return
+    buckets = _buckets.get(name, LATENCY_BUCKETS)
+    key = (name, _labels(labels))
+    with _lock:
+        row = _histograms.get(key)
+        if row is None:
+            row = _histograms[key] = [0.0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                row[i] += 1
+                break
+        row[-2] += value
+        row[-1] += 1
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name: str, labels: Dict[str, object]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if ENABLED:
+            observe(self.name, elapsed, **self.labels)
+        trace = getattr(_local, 'trace', None)
+        if trace is not None and 'phase' in self.labels:
+            trace.add(self.labels['phase'], self.start, elapsed)
+        return False
+
+
+def timer(name: str, **labels):
+    """Mede o bloco no histograma `name` (e, com rótulo `phase`, no trace da thread)."""
+    if not ENABLED and getattr(_local, 'trace', None) is None:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+def collector(fn: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]) -> Callable:
+    """Registra uma função que devolve (nome, rótulos, valor) no momento da coleta; serve de decorador."""
+    _collectors.append(fn)
+    return fn
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    inner = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+    return '{' + inner + '}'
+
+
+def render() -> str:
+    """Todas as métricas no formato de exposição texto do Prometheus."""
+    if not ENABLED:
+        return ''
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(row) for key, row in _histograms.items()}
+    samples: Dict[str, List[str]] = {}
+    for (name, labels), value in sorted(counters.items()):
+        samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), row in sorted(histograms.items()):
+        lines = samples.setdefault(name, [])
+        cumulative = 0.0
+        for bound, count in zip(_buckets.get(name, LATENCY_BUCKETS), row):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {cumulative:g}")
+        lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {row[-1]:g}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {row[-2]:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {row[-1]:g}")
+    for fn in list(_collectors):
+        for name, labels, value in fn():
+            samples.setdefault(name, []).append(f"{name}{_format_labels(_labels(labels))} {value:g}")
+    out = []
+    for name in sorted(samples):
+        kind, help_text = _help.get(name, ('untyped', ''))
+        if help_text:
+            out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(samples[name])
+    return '\n'.join(out) + '\n'
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+class Trace:
+    """Linha do tempo de um job: (etapa, início em ms desde o começo, duração em ms, campos)."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Dict] = []
+
+    def add(self, name: str, start: float, elapsed: float, **fields) -> None:
+        self.spans.append({
+            'name': name,
+            'start_ms': round((start - self.origin) * 1000.0, 2),
+            'ms': round(elapsed * 1000.0, 2),
+            **fields,
+        })
+
+    def as_dict(self) -> Dict:
+        return {'total_ms': round((time.perf_counter() - self.origin) * 1000.0, 2), 'spans': self.spans}
+
+
+def start_trace() -> Trace:
+    _local.trace = Trace()
+    return _local.trace
+
+
+def stop_trace() -> Optional[Trace]:
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return getattr(_local, 'trace', None)
+
@@ -0,0 +1,80 @@
+"""Escolha de opções de times diferentes entre si.
+
+Cada jogador vira uma posição (bit) e cada distribuição é codificada por
+inteiros: a máscara de cada time dá a chave canônica para remover repetidas,
+e a máscara de colegas de cada jogador dá as duplas que jogam juntas. Duas
+distribuições compartilham tantas duplas quanto a soma de
+popcount(colegas_a[i] & colegas_b[i]) / 2 — O(n) operações em inteiros
+pequenos em vez de conjuntos de pares de nomes.
+"""
+from typing import Dict, List, Optional, Sequence
+
+from team_balancer import Player
+
+
+class DistributionEncoder:
+    """Codifica distribuições de um mesmo elenco como máscaras de bits."""
+
+    def __init__(self, players: Sequence[Player]):
+        # Identidade do objeto: as distribuições reutilizam os Player do elenco
+        self._bit: Dict[int, int] = {id(p): i for i, p in enumerate(players)}
+        self.size = len(players)
+
+    def team_masks(self, teams: List[List[Player]]) -> List[int]:
+        masks = []
+        for team in teams:
+            mask = 0
+            for p in team:
+                mask |= 1 << self._bit[id(p)]
+            masks.append(mask)
+        return masks
+
+    def key(self, teams: List[List[Player]]) -> tuple:
+        """Chave canônica: a mesma para distribuições iguais a menos da ordem."""
+        return tuple(sorted(self.team_masks(teams)))
+
+    def teammates(self, teams: List[List[Player]]) -> List[int]:
+        """Máscara de colegas de time de cada jogador (sem o próprio)."""
+        rows = [0] * self.size
+        for mask, team in zip(self.team_masks(teams), teams):
+            for p in team:
+                i = self._bit[id(p)]
+                rows[i] = mask & ~(1 << i)
+        return rows
+
+
+def shared_pairs(a: List[int], b: List[int]) -> int:
+    """Duplas de colegas presentes nas duas distribuições."""
+    return sum((x & y).bit_count() for x, y in zip(a, b)) // 2
+
+
+def select_diverse(
+    candidates: List[List[List[Player]]],
+    spreads: List[float],
+    encoder: DistributionEncoder,
+    num_options: int,
+    spread_limit: Optional[float] = None,
+) -> List[int]:
+    """Índices de até `num_options` candidatos bem diferentes entre si.
+
+    Começa pelo de menor diferença de força e, a cada passo, escolhe o
+    candidato (com diferença até `spread_limit`) cuja maior sobreposição de
+    duplas com os já escolhidos é a menor; empates vão para o mais
+    equilibrado.
+    """
+    order = sorted(range(len(candidates)), key=lambda i: spreads[i])
+    if spread_limit is not None:
+        order = [i for i in order if spreads[i] <= spread_limit] or order[:1]
+    if not order:
+        return []
+    rows = {i: encoder.teammates(candidates[i]) for i in order}
+    chosen = [order[0]]
+    # Maior sobreposição de cada candidato com os escolhidos até agora
+    worst = {i: shared_pairs(rows[i], rows[order[0]]) for i in order[1:]}
+    while len(chosen) < num_options and worst:
+        pick = min(worst, key=lambda i: (worst[i], spreads[i]))
+        chosen.append(pick)
+        del worst[pick]
+        for i in worst:
+            worst[i] = max(worst[i], shared_pairs(rows[i], rows[pick]))
+    return chosen
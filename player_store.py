@@ -0,0 +1,412 @@
+"""Persistência incremental do elenco, compartilhada entre processos.
+
+O arquivo JSON de jogadores (players.json) continua sendo o snapshot, no mesmo
+formato de sempre; cada mudança é anexada a um journal ao lado dele
+(`players.json.journal`, uma linha JSON por registro). A linha é escrita na
+hora; uma thread faz um único fsync por lote do que se acumulou e, depois de
+`compact_every` registros, reescreve o snapshot e zera o journal.
+
+Vários processos (workers do gunicorn) usam os mesmos arquivos. A versão do
+que cada um já aplicou é (inode, mtime, tamanho) do snapshot + posição no
+journal: `changed` compara com o disco por dois stat. Escritas são
+compare-and-swap sob uma trava de arquivo (`players.json.lock`): antes de
+gravar, o processo confere se o disco ainda está na versão que ele conhece
+e, se não estiver, aplica primeiro o que os outros gravaram (`sync` entrega
+essas mudanças ao elenco em memória). Assim nenhum processo compacta ou
+reescreve o snapshot a partir de uma cópia desatualizada.
+
+Registros (jogadores identificados pelo ID estável; registros sem "id", de
+versões anteriores, usam o nome):
+  {"op": "put", "id": <id>, "player": {...}, "v": <versão>, "t": <epoch>}  insere ou substitui
+  {"op": "delete", "id": <id>, "name": <nome>, "v": ..., "t": ...}
+  {"op": "meta", "v": <versão>, "epoch": <linhagem>, "t": ...}  primeira linha após compactar
+
+Versão do elenco: cada mudança soma 1 (`v`, igual em todos os processos) e a
+compactação a preserva na linha "meta". `epoch` identifica a linhagem: hash
+do snapshot quando não há "meta" (arquivo novo ou de versões anteriores),
+então versões de elencos diferentes nunca se confundem.
+Reaplicar um registro já presente no snapshot não muda nada, então uma queda
+entre a troca do snapshot e a limpeza do journal não corrompe o elenco.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # sem fcntl (Windows) resta a comparação de versão, sem trava entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COMPACT_EVERY = 200
+
+metrics.describe('journal_write_seconds', 'histogram', 'Gravação de um lote do journal (com fsync)')
+metrics.describe('journal_records_total', 'counter', 'Registros gravados no journal')
+metrics.describe('journal_compactions_total', 'counter', 'Compactações do journal no snapshot')
+metrics.describe('journal_foreign_records_total', 'counter', 'Registros gravados por outros processos e aplicados aqui')
+metrics.describe('journal_reloads_total', 'counter', 'Releituras completas após compactação de outro processo')
+
+
+def ensure_ids(players: List[Dict]) -> None:
+    """Dá IDs aos registros sem ID, em ordem, a partir do maior existente.
+
+    A atribuição é determinística: o mesmo snapshot sempre recebe os mesmos IDs.
+    """
+    records = [p for p in players if isinstance(p, dict)]
+    next_id = max((int(p.get('id') or 0) for p in records), default=0) + 1
+    for p in records:
+        if not p.get('id'):
+            p['id'] = next_id
+            next_id += 1
+
+
+def _position(players: List[Dict], record: Dict) -> Optional[int]:
+    field = 'id' if record.get('id') else 'name'
+    keys = [p.get(field) if isinstance(p, dict) else None for p in players]
+    if field == 'id':
+        wanted = [record['id']]
+    else:
+        wanted = [record.get('name'), record.get('player', {}).get('name')]
+    for key in wanted:
+        if key is not None and key in keys:
+            return keys.index(key)
+    return None
+
+
+def apply_record(players: List[Dict], record: Dict) -> None:
+    """Aplica um registro do journal à lista de dicts de jogadores."""
+    if record['op'] == 'meta':
+        return
+    pos = _position(players, record)
+    if record['op'] == 'put':
+        if pos is None:
+            players.append(record['player'])
+            ensure_ids(players)
+        else:
+            players[pos] = record['player']
+    elif record['op'] == 'delete':
+        if pos is not None:
+            players.pop(pos)
+    else:
+        raise ValueError(f"Operação desconhecida no journal: {record['op']!r}")
+
+
+def _content_epoch(raw: bytes) -> str:
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+class PlayerJournal:
+    def __init__(self, snapshot_path: str, compact_every: int = COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + '.journal'
+        self.lock_path = snapshot_path + '.lock'
+        self.compact_every = compact_every
+        self._state: Optional[List[Dict]] = None
+        self._journal_records = 0
+        # Versão do disco já aplicada a _state: snapshot lido e bytes do journal
+        self._snapshot_id: Optional[Tuple[int, int, int]] = None
+        self._journal_ino = 0
+        self._offset = 0
+        # Mudanças de outros processos ainda não entregues ao elenco (ver sync)
+        self._foreign: List[Dict] = []
+        self._reloaded = False
+        # Versão, linhagem e instante da última mudança do que está em _state
+        self.version = 0
+        self.epoch = ''
+        self.modified = 0.0
+        self._enqueued = 0
+        self._durable = 0
+        self._cond = threading.Condition()
+        # Serializa leitura/escrita dos arquivos neste processo; reentrante
+        # porque append e compactação rodam dentro de `locked`
+        self._io_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = None
+        self._writer: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _stat_id(path: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _journal_stat(self) -> Tuple[int, int]:
+        """(inode, tamanho) do journal; a compactação troca o arquivo (inode novo)."""
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return 0, 0
+        return st.st_ino, st.st_size
+
+    def changed(self) -> bool:
+        """True se o disco tem mudanças ainda não entregues por `sync` (dois stat, sem travas)."""
+        return (
+            bool(self._foreign) or self._reloaded
+            or self._stat_id(self.snapshot_path) != self._snapshot_id
+            or self._journal_stat() != (self._journal_ino, self._offset)
+        )
+
+    def empty(self) -> bool:
+        """True se ainda não há snapshot nem journal no disco."""
+        return not os.path.exists(self.snapshot_path) and not os.path.exists(self.journal_path)
+
+    def load(self) -> Optional[List[Dict]]:
+        """Lê snapshot + journal; None se nenhum dos dois existir.
+
+        Registros inválidos do journal (ex.: última linha cortada por uma
+        queda) são ignorados com aviso.
+        """
+        with self._io_lock:
+            players, records, found = self._read()
+            self._state = [dict(p) for p in players]
+            self._journal_records = records
+            self._foreign = []
+            self._reloaded = False
+            return players if found else None
+
+    def _read(self):
+        """Lê tudo do disco e registra a versão lida (chamar com _io_lock)."""
+        players: List[Dict] = []
+        found = False
+        raw = b''
+        # stat antes de ler: se o snapshot trocar no meio, a próxima checagem relê
+        self._snapshot_id = self._stat_id(self.snapshot_path)
+        self.version, self.epoch, self.modified = 0, '', 0.0
+        if os.path.exists(self.snapshot_path):
+            found = True
+            with open(self.snapshot_path, 'rb') as f:
+                raw = f.read()
+            players = list(json.loads(raw.decode('utf-8')) or [])
+            self.modified = os.path.getmtime(self.snapshot_path)
+        ensure_ids(players)
+        records = 0
+        self._offset = 0
+        self._journal_ino = 0
+        if os.path.exists(self.journal_path):
+            found = True
+            with open(self.journal_path, 'rb') as f:
+                self._journal_ino = os.fstat(f.fileno()).st_ino
+                data = f.read()
+            for record in self._parse(data):
+                apply_record(players, record)
+                self._track(record)
+                records += record['op'] != 'meta'
+            self._offset = data.rfind(b'\n') + 1
+        if not self.epoch:
+            self.epoch = _content_epoch(raw)
+        return players, records, found
+
+    def _track(self, record: Dict) -> None:
+        """Atualiza versão, linhagem e instante da última mudança com um registro lido."""
+        if record['op'] == 'meta':
+            self.version = int(record.get('v') or 0)
+            self.epoch = str(record.get('epoch') or '')
+        else:
+            # Registros de versões anteriores não têm "v": contam em ordem
+            self.version = int(record.get('v') or self.version + 1)
+        self.modified = float(record.get('t') or self.modified)
+
+    def _parse(self, data: bytes) -> List[Dict]:
+        """Registros das linhas completas de `data` (a última, sem quebra, pode estar sendo escrita)."""
+        records = []
+        end = data.rfind(b'\n') + 1
+        for lineno, line in enumerate(data[:end].splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if record.get('op') not in ('put', 'delete', 'meta'):
+                    raise ValueError(record.get('op'))
+                records.append(record)
+            except Exception:
+                logger.warning("Registro inválido em %s, linha %s", self.journal_path, lineno)
+        return records
+
+    def _catch_up(self) -> None:
+        """Aplica a _state o que outros processos gravaram desde a versão conhecida (chamar com _io_lock)."""
+        journal_ino, journal_size = self._journal_stat()
+        if (self._state is None or self._stat_id(self.snapshot_path) != self._snapshot_id
+                or (journal_ino and journal_ino != self._journal_ino) or journal_size < self._offset):
+            # Snapshot trocado (compactação/reescrita de outro processo): relê tudo
+            if self._state is not None:
+                self._reloaded = True
+                metrics.inc('journal_reloads_total')
+            players, self._journal_records, _ = self._read()
+            self._state = [dict(p) for p in players]
+            self._foreign = []
+            return
+        if journal_size == self._offset:
+            return
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        records = [r for r in self._parse(data) if r['op'] != 'meta']
+        for record in records:
+            apply_record(self._state, record)
+            self._track(record)
+        self._offset += data.rfind(b'\n') + 1
+        self._journal_records += len(records)
+        self._foreign.extend(records)
+        metrics.inc('journal_foreign_records_total', len(records))
+
+    def sync(self) -> Optional[Tuple[str, List[Dict], int]]:
+        """Mudanças de outros processos ainda não aplicadas ao elenco em memória.
+
+        ('delta', registros, versão) no caso comum; ('full', elenco completo,
+        versão) quando o snapshot foi trocado por fora; None se nada mudou.
+        """
+        with self._io_lock:
+            self._catch_up()
+            if self._reloaded:
+                self._reloaded = False
+                self._foreign = []
+                return 'full', [dict(p) for p in self._state], self.version
+            if self._foreign:
+                records, self._foreign = self._foreign, []
+                return 'delta', records, self.version
+            return None
+
+    @contextmanager
+    def locked(self):
+        """Trava de escrita entre processos (reentrante na mesma thread), já com _state em dia."""
+        with self._io_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+                self._lock_file = open(self.lock_path, 'a')
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                self._catch_up()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def append(self, record: Dict) -> int:
+        """Grava um registro no journal (sem fsync) e retorna o número de sequência para `wait`.
+
+        Compare-and-swap: sob a trava, o que outros processos gravaram antes é
+        aplicado primeiro, então o registro entra por cima da versão atual. A
+        versão nova fica em record['v'].
+        """
+        with self.locked():
+            record['v'] = self.version + 1
+            record['t'] = round(time.time(), 3)
+            line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+            os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+            with open(self.journal_path, 'a+b') as f:
+                self._journal_ino = os.fstat(f.fileno()).st_ino
+                # Uma linha cortada por queda não pode engolir o próximo registro
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        line = b'\n' + line
+                f.write(line)
+                f.flush()
+                self._offset = f.tell()
+            apply_record(self._state, record)
+            self._track(record)
+            self._journal_records += 1
+        metrics.inc('journal_records_total')
+        with self._cond:
+            self._enqueued += 1
+            seq = self._enqueued
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='player-journal', daemon=True)
+                self._writer.start()
+            self._cond.notify_all()
+            return seq
+
+    def wait(self, seq: int, timeout: Optional[float] = None) -> bool:
+        """Espera o registro `seq` chegar ao disco; False se o prazo acabar."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._durable >= seq, timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            seq = self._enqueued
+        return self.wait(seq, timeout)
+
+    def rewrite(self, players: List[Dict]) -> int:
+        """Grava o elenco completo como snapshot, zera o journal e retorna a nova versão.
+
+        Começa uma linhagem nova (`epoch` passa a ser o hash do snapshot gravado).
+        """
+        self.flush()
+        with self.locked():
+            self.version += 1
+            self.modified = time.time()
+            self._write_snapshot(players, new_epoch=True)
+            self._state = [dict(p) for p in players]
+            # O elenco em memória já é este: nada de outros processos a entregar
+            self._foreign = []
+            self._reloaded = False
+            return self.version
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._enqueued > self._durable)
+                last = self._enqueued
+            try:
+                with metrics.timer('journal_write_seconds'):
+                    self._sync_batch()
+            except Exception:
+                logger.exception("Falha ao gravar registros em %s", self.journal_path)
+            with self._cond:
+                # Mesmo com falha libera quem espera; o erro fica no log
+                self._durable = last
+                self._cond.notify_all()
+
+    def _sync_batch(self) -> None:
+        """Um fsync para todas as linhas escritas desde o último; compacta se passou do limite."""
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'rb') as f:
+                os.fsync(f.fileno())
+        if self._journal_records >= self.compact_every:
+            with self.locked():
+                if self._journal_records >= self.compact_every:
+                    self._write_snapshot(self._state)
+                    metrics.inc('journal_compactions_total')
+
+    def _write_snapshot(self, players: List[Dict], new_epoch: bool = False) -> None:
+        """Troca o snapshot atomicamente e só então reinicia o journal (chamar dentro de `locked`).
+
+        O journal recomeça com a linha "meta" (versão e linhagem atuais). Se a
+        queda for antes dela, a linhagem vira o hash do snapshot novo: os
+        clientes recebem o elenco completo em vez de um delta errado.
+        """
+        os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+        raw = json.dumps(players, ensure_ascii=False, indent=2).encode('utf-8')
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if new_epoch:
+            self.epoch = _content_epoch(raw)
+        meta = {'op': 'meta', 'v': self.version, 'epoch': self.epoch, 't': round(self.modified, 3)}
+        line = (json.dumps(meta) + '\n').encode('utf-8')
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._journal_ino, self._offset = self._journal_stat()
+        self._snapshot_id = self._stat_id(self.snapshot_path)
+        self._journal_records = 0
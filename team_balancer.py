@@ -1,12 +1,39 @@
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
+from contextlib import contextmanager
+import heapq
+from collections import deque
+import itertools
+import math
 import random
 import json
 import os
 import logging
 import threading
+import time
 from dataclasses import dataclass
 from enum import Enum
 
+import metrics
+from constraints import CompiledConstraints, TeamCounts, SPREAD, APART, TOGETHER
+from player_store import PlayerJournal
+
+# numpy é opcional (sem ele o modo 'batched' usa o sampler comum) e só é
+# importado quando usado: custa ~100 ms no cold start
+_numpy = None
+
+
+def load_numpy():
+    """Módulo numpy, importado na primeira chamada; None se não estiver instalado."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            _numpy = False
+        else:
+            _numpy = numpy
+    return _numpy or None
+
 
 class Category(Enum):
     ELITE = "elite"
@@ -20,12 +47,14 @@ class Intensity(Enum):
     LOW = "baixa"
 
 
-@dataclass
+@dataclass(slots=True)
 class Player:
     name: str
     overall_rating: float
     intensity: Intensity
     mensalista: bool = False
+    # ID estável atribuído pelo Roster (0 = ainda sem ID)
+    id: int = 0
 
     @property
     def category(self) -> Category:
@@ -39,6 +68,124 @@ class Player:
             return Category.BEGINNER
 
 
+# Mudanças recentes guardadas para deltas por versão (ver Roster.changes_since)
+ROSTER_CHANGELOG = 256
+
+
+class Roster:
+    """Elenco com IDs estáveis e índices por ID e por nome.
+
+    `players` é a própria lista de jogadores (ordem de exibição); mudanças devem
+    passar pelos métodos para manter os índices. Consultas são O(1).
+
+    `version` (com `epoch`, a linhagem, e `modified`) acompanha a versão
+    gravada em player_store: é a mesma em todos os processos e sobe a cada
+    inclusão, edição ou remoção.
+    """
+
+    def __init__(self, players: List[Player], changelog: int = ROSTER_CHANGELOG):
+        self.players = players
+        self.version = 0
+        self.epoch = ''
+        self.modified = 0.0
+        # (versão, ID) das últimas mudanças; deltas só valem a partir de _changes_floor
+        self._changes = deque(maxlen=changelog)
+        self._changes_floor = 0
+        self.reindex()
+
+    def set_version(self, version: int, epoch: str, modified: float) -> None:
+        """Versão de um elenco carregado inteiro: deltas só a partir dela."""
+        self.version = version
+        self.epoch = epoch
+        self.modified = modified
+        self._changes.clear()
+        self._changes_floor = version
+
+    def record_change(self, version: int, player_id: int, modified: float) -> None:
+        """Registra a mudança de um jogador na versão `version`."""
+        if len(self._changes) == self._changes.maxlen:
+            self._changes_floor = self._changes[0][0]
+        self._changes.append((version, player_id))
+        self.version = max(self.version, version)
+        self.modified = modified
+
+    def changes_since(self, version: int) -> Optional[Tuple[List[Player], List[int]]]:
+        """(jogadores incluídos ou alterados, IDs removidos) depois de `version`.
+
+        None se a versão é antiga demais (ou de outra linhagem): aí só o elenco inteiro serve.
+        """
+        if not self._changes_floor <= version <= self.version:
+            return None
+        ids = {pid for v, pid in self._changes if v > version}
+        changed = [self._by_id[i] for i in sorted(ids) if i in self._by_id]
+        removed = sorted(i for i in ids if i not in self._by_id)
+        return changed, removed
+
+    def reindex(self) -> None:
+        """Reconstrói os índices; jogadores sem ID (ou com ID repetido) recebem um novo."""
+        self._by_id: Dict[int, Player] = {}
+        self._by_name: Dict[str, Player] = {}
+        self._next_id = max((p.id for p in self.players), default=0) + 1
+        for p in self.players:
+            if not p.id or p.id in self._by_id:
+                p.id = self._next_id
+                self._next_id += 1
+            self._by_id[p.id] = p
+            self._by_name.setdefault(p.name, p)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def get(self, player_id: int) -> Optional[Player]:
+        return self._by_id.get(player_id)
+
+    def find(self, name: str) -> Optional[Player]:
+        return self._by_name.get(name)
+
+    def select(self, ids) -> List[Player]:
+        """Jogadores dos IDs informados (ignora desconhecidos e repetidos), em ordem de ID."""
+        chosen = {i: self._by_id[i] for i in ids if i in self._by_id}
+        return [chosen[i] for i in sorted(chosen)]
+
+    def add(self, player: Player) -> Player:
+        player.id = self._next_id
+        self._next_id += 1
+        self.players.append(player)
+        self._by_id[player.id] = player
+        self._by_name.setdefault(player.name, player)
+        return player
+
+    def insert(self, player: Player) -> Player:
+        """Inclui um jogador que já tem ID (gravado por outro processo)."""
+        self.players.append(player)
+        self._by_id[player.id] = player
+        self._by_name.setdefault(player.name, player)
+        self._next_id = max(self._next_id, player.id + 1)
+        return player
+
+    def rename(self, player: Player, name: str) -> None:
+        if name == player.name:
+            return
+        self._unindex_name(player)
+        player.name = name
+        self._by_name.setdefault(name, player)
+
+    def remove(self, player_id: int) -> Optional[Player]:
+        player = self._by_id.pop(player_id, None)
+        if player is not None:
+            self.players.remove(player)
+            self._unindex_name(player)
+        return player
+
+    def _unindex_name(self, player: Player) -> None:
+        if self._by_name.get(player.name) is player:
+            del self._by_name[player.name]
+            # Nomes repetidos: o índice passa para o próximo com o mesmo nome
+            other = next((p for p in self.players if p.name == player.name and p is not player), None)
+            if other is not None:
+                self._by_name[player.name] = other
+
+
 # Lista padrão de jogadores (usada no primeiro run ou como fallback)
 real_players = [
     Player("Ivo", 4, Intensity.HIGH, mensalista=False),
@@ -99,9 +246,13 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# Snapshot em DATA_FILE + journal incremental (ver player_store)
+_journal = PlayerJournal(DATA_FILE)
+
 
 def _player_to_dict(p: Player) -> Dict:
     return {
+        'id': int(p.id),
         'name': p.name,
         'rating': int(p.overall_rating),
         'intensity': p.intensity.name,
@@ -115,29 +266,50 @@ def _player_from_dict(d: Dict) -> Player:
     intensity_key = str(d.get('intensity', 'LOW')).upper()
     intensity = Intensity[intensity_key]
     mensalista = bool(d.get('mensalista', False))
-    return Player(name, rating, intensity, mensalista)
+    return Player(name, rating, intensity, mensalista, id=int(d.get('id') or 0))
 
 
 def save_players(players: List[Player]) -> None:
-    """Persiste jogadores em escrita atômica; loga erros ao invés de silenciar."""
+    """Reescreve o elenco inteiro (snapshot atômico); loga erros ao invés de silenciar."""
     try:
-        data = [_player_to_dict(p) for p in players]
-        os.makedirs(os.path.dirname(DATA_FILE) or '.', exist_ok=True)
-        tmp_path = DATA_FILE + '.tmp'
-        with open(tmp_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, DATA_FILE)
+        with metrics.timer('players_save_seconds'):
+            version = _journal.rewrite([_player_to_dict(p) for p in players])
+        roster.set_version(version, _journal.epoch, _journal.modified)
     except Exception:
         logger.exception("Falha ao salvar jogadores em %s", DATA_FILE)
 
 
+def _append_record(record: Dict) -> int:
+    seq = _journal.append(record)
+    roster.record_change(record['v'], record['id'], record['t'])
+    return seq
+
+
+def save_player(player: Player) -> int:
+    """Registra inclusão/alteração de um jogador no journal, sem reescrever o elenco.
+
+    Sobe a versão do elenco. Retorna o número de sequência para `wait_players_saved`.
+    """
+    return _append_record({'op': 'put', 'id': player.id, 'player': _player_to_dict(player)})
+
+
+def delete_saved_player(player: Player) -> int:
+    """Registra a remoção de um jogador no journal; retorna o número de sequência."""
+    return _append_record({'op': 'delete', 'id': player.id, 'name': player.name})
+
+
+def wait_players_saved(seq: int, timeout: Optional[float] = None) -> bool:
+    """Espera a gravação (com fsync) dos registros até `seq`.
+
+    Chamar fora de players_lock: várias escritas próximas saem num único fsync.
+    """
+    return _journal.wait(seq, timeout)
+
+
 def _load_players_from_file() -> List[Player]:
-    """Carrega jogadores do JSON; ignora registros inválidos ao invés de descartar tudo."""
-    if not os.path.exists(DATA_FILE):
-        return []
+    """Carrega jogadores do snapshot JSON e do journal; ignora registros inválidos."""
     try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            raw = json.load(f)
+        raw = _journal.load()
         loaded: List[Player] = []
         for idx, item in enumerate(raw or []):
             try:
@@ -151,32 +323,277 @@ def _load_players_from_file() -> List[Player]:
 
 
 def load_or_init_players() -> None:
-    """Substitui real_players por dados do arquivo; se vazio/inexistente, inicializa salvando padrão."""
+    """Substitui real_players por dados do arquivo; sem arquivo, fica a lista padrão.
+
+    Não grava nada: a lista padrão vai para o disco na primeira escrita do
+    elenco (ver roster_transaction).
+    """
+    global _players_loaded, _defaults_pending
     loaded = _load_players_from_file()
-    global real_players
     if loaded:
-        real_players.clear()
-        real_players.extend(loaded)
-    else:
-        # Primeira execução: salva a lista padrão para persistir
+        real_players[:] = loaded
+    _defaults_pending = not loaded
+    roster.reindex()
+    roster.set_version(_journal.version, _journal.epoch, _journal.modified)
+    _players_loaded = True
+
+
+def ensure_players_loaded() -> None:
+    """Carrega o elenco no primeiro uso (importar o módulo não lê nem grava arquivos)."""
+    if _players_loaded:
+        return
+    with _load_lock:
+        if not _players_loaded:
+            load_or_init_players()
+
+
+def _put_player(data: Player) -> Player:
+    """Aplica ao elenco um jogador lido do disco: atualiza o de mesmo ID ou inclui."""
+    current = roster.get(data.id) if data.id else roster.find(data.name)
+    if current is None:
+        return roster.insert(data) if data.id else roster.add(data)
+    roster.rename(current, data.name)
+    current.overall_rating = data.overall_rating
+    current.intensity = data.intensity
+    current.mensalista = data.mensalista
+    return current
+
+
+def refresh_players() -> List[str]:
+    """Traz para real_players o que outros processos gravaram; retorna os nomes afetados.
+
+    Chamar com players_lock. Só lê o disco se ele mudou: no caso comum aplica
+    os registros novos do journal; depois de uma compactação ou reescrita de
+    outro processo, recarrega o elenco inteiro.
+    """
+    change = _journal.sync()
+    if change is None:
+        return []
+    kind, payload, version = change
+    if kind == 'full':
+        names = {p.name for p in real_players}
+        loaded = []
+        for item in payload:
+            try:
+                loaded.append(_player_from_dict(item))
+            except Exception:
+                logger.warning("Registro inválido em %s: %r", DATA_FILE, item)
+        real_players[:] = loaded
+        roster.reindex()
+        roster.set_version(version, _journal.epoch, _journal.modified)
+        return sorted(names | {p.name for p in loaded})
+    names = set()
+    for record in payload:
+        if record.get('id'):
+            roster.record_change(int(record.get('v') or version), record['id'], float(record.get('t') or time.time()))
+        if record['op'] == 'put':
+            try:
+                data = _player_from_dict(record['player'])
+            except Exception:
+                logger.warning("Registro inválido em %s: %r", DATA_FILE, record)
+                continue
+            current = roster.get(data.id)
+            if current is not None:
+                names.add(current.name)
+            names.add(_put_player(data).name)
+        else:
+            target = roster.get(record['id']) if record.get('id') else roster.find(record.get('name'))
+            if target is not None:
+                roster.remove(target.id)
+                names.add(target.name)
+    return sorted(names)
+
+
+def roster_changed() -> bool:
+    """Verificação barata (stat) se outro processo gravou mudanças no elenco."""
+    return _journal.changed()
+
+
+@contextmanager
+def roster_transaction():
+    """players_lock + trava do arquivo, com o elenco já em dia; entrega os nomes atualizados.
+
+    Escritas do elenco dentro dela são compare-and-swap entre processos: nada
+    gravado por outro worker fica para trás, e IDs novos não colidem.
+    """
+    with players_lock:
+        ensure_players_loaded()
+        with _journal.locked():
+            changed = refresh_players()
+            _save_pending_defaults()
+            yield changed
+
+
+def _save_pending_defaults() -> None:
+    """Primeira escrita sem arquivo de jogadores: grava antes a lista padrão (chamar dentro da transação)."""
+    global _defaults_pending
+    if _defaults_pending and _journal.empty():
         save_players(real_players)
+    # Se outro worker gravou primeiro, refresh_players já trouxe o elenco dele
+    _defaults_pending = False
+
 
+# Índices do elenco sobre a própria real_players
+roster = Roster(real_players)
 
-# Carrega ou inicializa ao importar o módulo
-load_or_init_players()
+# Elenco lido do disco no primeiro uso (ensure_players_loaded), não ao importar
+_players_loaded = False
+_defaults_pending = False
+_load_lock = threading.Lock()
 
-# Lock para proteger acessos concorrentes à lista de jogadores
+# Lock para proteger acessos concorrentes à lista de jogadores (neste processo)
 players_lock = threading.Lock()
 
+# Motores de busca disponíveis em TeamBalancer.distribute_players
+ENGINES = ('sampling', 'bnb', 'batched', 'local')
+
+metrics.describe('balancer_distribute_seconds', 'histogram', 'Duração de distribute_players por motor')
+metrics.describe('balancer_runs_total', 'counter', 'Execuções de distribute_players por motor e resultado')
+metrics.describe('balancer_attempts', 'histogram', 'Tentativas (iterações/nós) por execução', metrics.COUNT_BUCKETS)
+metrics.describe('balancer_tolerance_total', 'counter', 'Menor tolerância de força atingida por execução')
+metrics.describe('players_save_seconds', 'histogram', 'Reescrita completa do elenco (save_players)')
+
+NO_VALID_DISTRIBUTION = (
+    "Não foi possível encontrar uma distribuição válida com a distribuição equilibrada de jogadores de alta intensidade"
+)
+
+
+class BalancingProblem:
+    """Elenco compilado para a busca: arrays paralelos indexados pela posição em `players`.
+
+    Montado uma vez por TeamBalancer. Guarda nota, alta intensidade e top
+    player de cada jogador e os grupos usados pelo sampler (top players,
+    alta intensidade e baixa intensidade elite/médio/fraco, sem os top),
+    todos em ordem de elenco. A busca trabalha com índices e só converte
+    para Player na saída (`materialize`).
+    """
+
+    __slots__ = ('players', 'ratings', 'high', 'top', 'top_indices', 'high_indices',
+                 'elite_indices', 'medium_indices', 'weak_indices', 'total_rating')
+
+    def __init__(self, players: List[Player], top_players: List[Player]):
+        self.players = players
+        self.ratings = [p.overall_rating for p in players]
+        self.high = [p.intensity == Intensity.HIGH for p in players]
+        position = {id(p): i for i, p in enumerate(players)}
+        # Na ordem de _top_players (nota decrescente), como o sampler espera
+        self.top_indices = [position[id(p)] for p in top_players]
+        self.top = [False] * len(players)
+        for i in self.top_indices:
+            self.top[i] = True
+        rest = [i for i in range(len(players)) if not self.top[i]]
+        self.high_indices = [i for i in rest if self.high[i]]
+        low = [i for i in rest if not self.high[i]]
+        self.elite_indices = [i for i in low if self.ratings[i] >= 6]
+        self.medium_indices = [i for i in low if 3 <= self.ratings[i] < 6]
+        self.weak_indices = [i for i in low if self.ratings[i] < 3]
+        self.total_rating = sum(self.ratings)
+
+    def materialize(self, teams: List[List[int]]) -> List[List[Player]]:
+        return [[self.players[i] for i in team] for team in teams]
+
 
 class TeamBalancer:
-    def __init__(self, players: List[Player], num_teams: int = 4):
+    def __init__(self, players: List[Player], num_teams: int = 4, deadline_ms: Optional[float] = None):
         self.players = players
         self.num_teams = num_teams
         self.players_per_team = len(players) // num_teams
         self.extra = len(players) % num_teams  # times que recebem um jogador a mais
         self.max_attempts = 50000
         self._strength_tolerance = 1.0
+        self.tolerances = [1.0, 1.5, 2.0]
+        self.batch_size = 4096
+        self.local_iterations = 20000
+        # Busca "anytime": ao passar do prazo, devolve o melhor resultado até então
+        self.target_spread = 0.3
+        # Limite inferior conhecido da diferença (ver feasibility.analyze): ao
+        # atingi-lo, nenhuma busca consegue melhorar e pode parar
+        self.spread_lower_bound = 0.0
+        self.target_reached = False
+        self.timed_out = False
+        # Da última busca: tentativas (iterações na local, nós no bnb) e a menor
+        # tolerância de `tolerances` que o resultado respeita
+        self.attempts = 0
+        self.tolerance_used: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.set_time_budget(deadline_ms)
+        # Recebe o progresso das buscas (ver _report_progress); None desativa
+        self.on_progress: Optional[Callable[[Dict], None]] = None
+        # Top players calculados uma vez por elenco (ver _top_players)
+        self._top: Optional[List[Player]] = None
+        self._top_members: frozenset = frozenset()
+        self.problem = BalancingProblem(players, self._top_players())
+        # Histórico de quem jogou junto (matriz na ordem de `players`, ver
+        # match_history); o sampler soma history_weight * penalidade à diferença
+        # de força e, achada uma solução, tenta mais history_attempts vezes
+        self.history_matrix: Optional[List[List[float]]] = None
+        self.history_weight = 0.5
+        self.history_attempts = 500
+        # Regras extras (ver constraints e add_rule); compiladas junto com as
+        # de top players e alta intensidade na primeira busca
+        self.rules: List[Tuple[str, List[Player]]] = []
+        self._constraints: Optional[CompiledConstraints] = None
+
+    def add_rule(self, kind: str, players: List[Player]) -> None:
+        """Acrescenta uma regra 'together', 'apart' ou 'spread' sobre jogadores deste balanceador.
+
+        Jogadores fora de `players` são ignorados; regras impossíveis geram
+        ValueError na compilação.
+        """
+        self.rules.append((kind, list(players)))
+        self._constraints = None
+
+    def keep_together(self, players: List[Player]) -> None:
+        self.add_rule(TOGETHER, players)
+
+    def keep_apart(self, players: List[Player]) -> None:
+        self.add_rule(APART, players)
+
+    def spread_evenly(self, players: List[Player]) -> None:
+        """Espalha o grupo entre os times (ex.: goleiros)."""
+        self.add_rule(SPREAD, players)
+
+    @property
+    def constraints(self) -> CompiledConstraints:
+        """Regras compiladas para índices de `problem`: top players e alta intensidade espalhados + `rules`."""
+        if self._constraints is None:
+            problem = self.problem
+            position = {id(p): i for i, p in enumerate(self.players)}
+            compiled = [
+                (SPREAD, problem.top_indices),
+                (SPREAD, [i for i, h in enumerate(problem.high) if h]),
+            ]
+            for kind, players in self.rules:
+                compiled.append((kind, [position[id(p)] for p in players if id(p) in position]))
+            self._constraints = CompiledConstraints(len(self.players), self.num_teams, compiled)
+        return self._constraints
+
+    def set_time_budget(self, budget_ms: Optional[float]) -> None:
+        """Define o prazo (em ms a partir de agora); None remove o limite."""
+        self.timed_out = False
+        self.deadline = time.monotonic() + budget_ms / 1000.0 if budget_ms is not None else None
+
+    def time_is_up(self) -> bool:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.timed_out = True
+            return True
+        return False
+
+    def _report_progress(self, tolerance: Optional[float], attempts: int, best_spread: float) -> None:
+        """Repassa tolerância atual, tentativas feitas e melhor diferença a `on_progress`."""
+        if self.on_progress is not None:
+            self.on_progress({
+                'tolerance': tolerance,
+                'attempts': attempts,
+                'best_spread': round(best_spread, 3) if best_spread != float('inf') else None,
+            })
+
+    def _early_exit_spread(self) -> float:
+        return max(self.target_spread, self.spread_lower_bound + 1e-9)
+
+    def strength_spread(self, teams: List[List[Player]]) -> float:
+        strengths = [self.calculate_team_strength(team) for team in teams]
+        return max(strengths) - min(strengths)
 
     def calculate_team_strength(self, team: List[Player]) -> float:
         if not team:
@@ -187,40 +604,27 @@ class TeamBalancer:
         return sum(1 for p in team if p.intensity == Intensity.HIGH)
 
     def _top_players(self) -> List[Player]:
-        if not self.players or self.num_teams <= 0:
-            return []
-        sorted_players = sorted(
-            self.players,
-            key=lambda p: (-p.overall_rating, p.name),
-        )
-        return sorted_players[: min(self.num_teams, len(sorted_players))]
+        """Os `num_teams` melhores jogadores (cópia: pode ser embaralhada)."""
+        if self._top is None:
+            if not self.players or self.num_teams <= 0:
+                self._top = []
+            else:
+                sorted_players = sorted(
+                    self.players,
+                    key=lambda p: (-p.overall_rating, p.name),
+                )
+                self._top = sorted_players[: min(self.num_teams, len(sorted_players))]
+            # Identidade do objeto: vale também para jogadores criados sem ID
+            self._top_members = frozenset(id(p) for p in self._top)
+        return list(self._top)
+
+    def _is_top(self, player: Player) -> bool:
+        if self._top is None:
+            self._top_players()
+        return id(player) in self._top_members
 
     def is_valid_distribution(self, teams: List[List[Player]]) -> bool:
-        # Verifica tamanhos: times com players_per_team ou players_per_team+1 (quando há resto)
-        for team in teams:
-            if len(team) < self.players_per_team or len(team) > self.players_per_team + 1:
-                return False
-        # Garante que todos os jogadores foram distribuídos
-        if sum(len(t) for t in teams) != len(self.players):
-            return False
-
-        # Garante que os jogadores de maior nivel estejam em times distintos
-        top_players = self._top_players()
-        if top_players:
-            top_names = {p.name for p in top_players}
-            top_counts = [sum(1 for p in team if p.name in top_names) for team in teams]
-            if max(top_counts) > 1:
-                return False
-            if sum(top_counts) != len(top_names):
-                return False
-
-        # Verifica o balanceamento de jogadores de alta intensidade
-        # Verifica se a distribuição de jogadores de alta intensidade está equilibrada
-        high_intensity_counts = [self.count_high_intensity(team) for team in teams]
-        max_high_intensity_diff = max(high_intensity_counts) - min(high_intensity_counts)
-
-        # Permitimos no máximo uma diferença de 1 jogador de alta intensidade entre os times
-        if max_high_intensity_diff > 1:
+        if not self._meets_hard_constraints(teams):
             return False
 
         # Verifica o balanceamento de força
@@ -228,8 +632,222 @@ class TeamBalancer:
         max_strength_diff = max(team_strengths) - min(team_strengths)
         return max_strength_diff <= self._strength_tolerance
 
-    def distribute_players(self) -> List[List[Player]]:
-        mean_strength = sum(p.overall_rating for p in self.players) / len(self.players) if self.players else 4.0
+    def _meets_hard_constraints(self, teams: List[List[Player]]) -> bool:
+        """Tamanhos, top players separados, alta intensidade equilibrada e regras extras (sem olhar força)."""
+        position = {id(p): i for i, p in enumerate(self.players)}
+        if any(id(p) not in position for team in teams for p in team):
+            return False
+        return self._index_valid([[position[id(p)] for p in team] for team in teams])
+
+    def _index_valid(self, teams: List[List[int]]) -> bool:
+        """Restrições rígidas sobre times de índices de `problem`."""
+        if len(teams) != self.num_teams:
+            return False
+        # Times com players_per_team ou players_per_team+1 (quando há resto)
+        lo, hi = self.players_per_team, self.players_per_team + 1
+        placed = 0
+        for team in teams:
+            if len(team) < lo or len(team) > hi:
+                return False
+            placed += len(team)
+        # Todos os jogadores distribuídos
+        if placed != len(self.players):
+            return False
+        # Top players em times distintos, alta intensidade com no máximo 1 de
+        # diferença entre os times e as regras extras
+        return self.constraints.counts(teams).valid()
+
+    def distribute_players(self, engine: str = 'sampling') -> List[List[Player]]:
+        """Gera uma distribuição válida usando o motor escolhido (ver ENGINES).
+
+        Com prazo definido, devolve a melhor distribuição encontrada até ele;
+        `target_reached` indica se a diferença de força ficou em `target_spread`.
+        Com regras extras (`rules`), 'bnb' e 'batched' usam o sampler: os dois
+        só conhecem as regras de top players e alta intensidade.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Motor de balanceamento desconhecido: {engine}")
+        self.attempts = 0
+        start = time.perf_counter()
+        try:
+            with metrics.timer('balancer_distribute_seconds', engine=engine):
+                if engine == 'bnb' and not self.rules:
+                    distribution = self.best_distributions(1)[0]
+                elif engine == 'batched' and load_numpy() is not None and len(self.players) >= self.num_teams and not self.rules:
+                    distribution = self._distribute_batched()
+                elif engine == 'local':
+                    distribution = self.local_search()
+                else:
+                    distribution = self._distribute_by_sampling()
+        except ValueError:
+            metrics.inc('balancer_runs_total', engine=engine, result='error')
+            metrics.observe('balancer_attempts', self.attempts, engine=engine)
+            raise
+        spread = self.strength_spread(distribution)
+        self.target_reached = spread <= self.target_spread + 1e-9
+        self.tolerance_used = next((t for t in self.tolerances if spread <= t + 1e-9), None)
+        metrics.inc('balancer_runs_total', engine=engine, result='timeout' if self.timed_out else 'ok')
+        metrics.observe('balancer_attempts', self.attempts, engine=engine)
+        metrics.inc('balancer_tolerance_total', tolerance=self.tolerance_used)
+        trace = metrics.current_trace()
+        if trace is not None:
+            trace.add('distribute', start, time.perf_counter() - start, engine=engine, attempts=self.attempts,
+                      tolerance=self.tolerance_used, spread=round(spread, 3))
+        return distribution
+
+    def _greedy_distribution(self, mean_strength: float, team_target_sizes: List[int]) -> List[List[Player]]:
+        """Monta uma distribuição aleatória gulosa (uma tentativa do sampler)."""
+        teams, _, _ = self._greedy_indices(mean_strength, team_target_sizes)
+        return self.problem.materialize(teams) if teams is not None else None
+
+    def _greedy_indices(
+        self, mean_strength: float, team_target_sizes: List[int],
+    ) -> Tuple[Optional[List[List[int]]], List[float], TeamCounts]:
+        """Tentativa gulosa sobre índices de `problem`; retorna (times, soma de notas por time, contadores).
+
+        Cada jogador entra no time previsto ou, se as regras não deixarem, no
+        próximo que aceitar; quando nenhum aceita, a tentativa é podada ali e
+        os times voltam None. Mesma sequência de sorteios de sempre: a mesma
+        semente gera a mesma distribuição.
+        """
+        problem = self.problem
+        ratings = problem.ratings
+        num_teams = self.num_teams
+        teams: List[List[int]] = [[] for _ in range(num_teams)]
+        sums = [0.0] * num_teams
+        state = self.constraints.counts()
+        allows, add = state.allows, state.add
+
+        def place(t: int, i: int) -> bool:
+            if allows(t, i):
+                teams[t].append(i)
+                sums[t] += ratings[i]
+                add(t, i)
+                return True
+            for k in range(1, num_teams):
+                u = (t + k) % num_teams
+                if allows(u, i):
+                    teams[u].append(i)
+                    sums[u] += ratings[i]
+                    add(u, i)
+                    return True
+            return False
+
+        # Distribui os jogadores de maior nivel para times distintos
+        top_players = list(problem.top_indices)
+        random.shuffle(top_players)
+        for i, player in enumerate(top_players):
+            if not place(i % num_teams, player):
+                return None, sums, state
+
+        # Correção 2: conta alta intensidade que já veio dos top players por time
+        high = problem.high
+        high_already = [sum(1 for i in team if high[i]) for team in teams]
+
+        # Distribui jogadores de alta intensidade igualmente entre os times,
+        # compensando o que cada time já recebeu via top players
+        high_intensity_players = list(problem.high_indices)
+        random.shuffle(high_intensity_players)
+        total_high = len(high_intensity_players) + sum(high_already)
+        target_high_per_team = total_high // num_teams
+
+        for t in range(num_teams):
+            needed = max(0, target_high_per_team - high_already[t])
+            for _ in range(needed):
+                if high_intensity_players and not place(t, high_intensity_players.pop()):
+                    return None, sums, state
+
+        # Distribui os jogadores de alta intensidade restantes (se houver)
+        for i, player in enumerate(high_intensity_players):
+            if not place(i % num_teams, player):
+                return None, sums, state
+
+        # Jogadores restantes (baixa intensidade) já agrupados por nível
+        elite_players = list(problem.elite_indices)
+        medium_players = list(problem.medium_indices)
+        weak_players = list(problem.weak_indices)
+
+        random.shuffle(elite_players)
+        random.shuffle(medium_players)
+        random.shuffle(weak_players)
+
+        # Distribui jogadores elite restantes
+        for i, player in enumerate(elite_players):
+            if not place(i % num_teams, player):
+                return None, sums, state
+
+        # Junta médios e fracos
+        remaining_players = medium_players + weak_players
+        random.shuffle(remaining_players)
+
+        # Correção 1: respeita o tamanho-alvo individual de cada time
+        while remaining_players:
+            progressed = False
+            for t in range(num_teams):
+                size = len(teams[t])
+                if size < team_target_sizes[t] and remaining_players:
+                    candidates = [i for i in remaining_players[:3] if allows(t, i)]
+                    if not candidates:
+                        # Nenhum dos próximos três cabe aqui: o primeiro que couber
+                        candidates = [next((i for i in remaining_players if allows(t, i)), None)]
+                        if candidates[0] is None:
+                            continue
+                    total = sums[t]
+                    best_candidate = min(
+                        candidates,
+                        key=lambda i: abs((total + ratings[i]) / (size + 1) - mean_strength),
+                    )
+                    place(t, best_candidate)
+                    remaining_players.remove(best_candidate)
+                    progressed = True
+            if not progressed:
+                return None, sums, state
+
+        return teams, sums, state
+
+    def _history_penalty(self, teams: List[List[int]]) -> float:
+        """Peso médio de histórico por dupla de colegas de time (0 sem histórico)."""
+        matrix = self.history_matrix
+        if matrix is None:
+            return 0.0
+        total = 0.0
+        pairs = 0
+        for team in teams:
+            size = len(team)
+            for a in range(size):
+                row = matrix[team[a]]
+                for b in range(a + 1, size):
+                    total += row[team[b]]
+            pairs += size * (size - 1) // 2
+        return total / pairs if pairs else 0.0
+
+    def history_penalty(self, teams: List[List[Player]]) -> float:
+        """Penalidade de histórico de uma distribuição de jogadores deste balanceador."""
+        position = {id(p): i for i, p in enumerate(self.players)}
+        return self._history_penalty([[position[id(p)] for p in team] for team in teams])
+
+    def _index_spread(
+        self, teams: Optional[List[List[int]]], sums: List[float], state: Optional[TeamCounts] = None,
+    ) -> Optional[float]:
+        """Diferença de força se os times (índices) respeitam as restrições rígidas; senão None.
+
+        `state` são os contadores da montagem (ver _greedy_indices): limites
+        máximos e grupos já foram garantidos nela, falta conferir tamanhos e mínimos.
+        """
+        if teams is None:
+            return None
+        if state is None:
+            if not self._index_valid(teams):
+                return None
+        else:
+            lo, hi = self.players_per_team, self.players_per_team + 1
+            if any(len(team) < lo or len(team) > hi for team in teams) or not state.meets_lower():
+                return None
+        means = [sums[t] / len(team) if team else 0 for t, team in enumerate(teams)]
+        return max(means) - min(means)
+
+    def _distribute_by_sampling(self) -> List[List[Player]]:
+        mean_strength = self.problem.total_rating / len(self.players) if self.players else 4.0
 
         # Tamanho-alvo por time: os primeiros `extra` times recebem um jogador a mais
         team_target_sizes = [
@@ -239,103 +857,924 @@ class TeamBalancer:
 
         best_distribution = None
         best_strength_diff = float('inf')
+        best_score = float('inf')
+        history = self.history_matrix is not None and self.history_weight > 0
+        # Reserva para quando o prazo acaba antes de relaxar a tolerância
+        fallback = None
+        fallback_diff = max(self.tolerances)
+        attempts_made = 0
 
         # Correção 3: tolerância adaptativa — relaxa gradualmente se não achar solução
-        for tolerance in [1.0, 1.5, 2.0]:
+        for tolerance in self.tolerances:
             self._strength_tolerance = tolerance
 
-            for _ in range(self.max_attempts):
-                top_players = self._top_players()
-                top_names = {p.name for p in top_players}
-                available_players = [p for p in self.players if p.name not in top_names]
-
-                # Separa jogadores por intensidade
-                high_intensity_players = [p for p in available_players if p.intensity == Intensity.HIGH]
-                low_intensity_players = [p for p in available_players if p.intensity == Intensity.LOW]
-
-                # Inicializa times vazios
-                teams = [[] for _ in range(self.num_teams)]
-
-                # Distribui os jogadores de maior nivel para times distintos
-                random.shuffle(top_players)
-                for i, player in enumerate(top_players):
-                    teams[i % self.num_teams].append(player)
-
-                # Correção 2: conta alta intensidade que já veio dos top players por time
-                high_already = [self.count_high_intensity(t) for t in teams]
-
-                # Distribui jogadores de alta intensidade igualmente entre os times,
-                # compensando o que cada time já recebeu via top players
-                random.shuffle(high_intensity_players)
-                total_high = len(high_intensity_players) + sum(high_already)
-                target_high_per_team = total_high // self.num_teams
-
-                for i, team in enumerate(teams):
-                    needed = max(0, target_high_per_team - high_already[i])
-                    for _ in range(needed):
-                        if high_intensity_players:
-                            team.append(high_intensity_players.pop())
-
-                # Distribui os jogadores de alta intensidade restantes (se houver)
-                for i, player in enumerate(high_intensity_players):
-                    teams[i % self.num_teams].append(player)
-
-                # Agrupa jogadores restantes (baixa intensidade) por nível
-                elite_players = [p for p in low_intensity_players if p.overall_rating >= 6]
-                medium_players = [p for p in low_intensity_players if 3 <= p.overall_rating < 6]
-                weak_players = [p for p in low_intensity_players if p.overall_rating < 3]
-
-                random.shuffle(elite_players)
-                random.shuffle(medium_players)
-                random.shuffle(weak_players)
-
-                # Distribui jogadores elite restantes
-                for i, player in enumerate(elite_players):
-                    teams[i % self.num_teams].append(player)
-
-                # Junta médios e fracos
-                remaining_players = medium_players + weak_players
-                random.shuffle(remaining_players)
-
-                # Correção 1: respeita o tamanho-alvo individual de cada time
-                while remaining_players:
-                    for i, team in enumerate(teams):
-                        if len(team) < team_target_sizes[i] and remaining_players:
-                            candidate_count = min(3, len(remaining_players))
-                            candidates = remaining_players[:candidate_count]
-
-                            if candidates:
-                                best_candidate = min(
-                                    candidates,
-                                    key=lambda p: abs(self.calculate_team_strength(team + [p]) - mean_strength),
-                                )
-                                team.append(best_candidate)
-                                remaining_players.remove(best_candidate)
-
-                if self.is_valid_distribution(teams):
-                    team_strengths = [self.calculate_team_strength(team) for team in teams]
-                    strength_diff = max(team_strengths) - min(team_strengths)
-
-                    if strength_diff < best_strength_diff:
-                        best_strength_diff = strength_diff
-                        best_distribution = [team.copy() for team in teams]
-
-                    if strength_diff <= 0.3:
+            last_attempt = self.max_attempts
+            for attempt in range(self.max_attempts):
+                if attempt >= last_attempt:
+                    break
+                if attempt % 64 == 63:
+                    self._report_progress(tolerance, attempts_made, best_strength_diff)
+                    if self.time_is_up():
                         break
-
-            if best_distribution is not None:
+                attempts_made += 1
+                teams, sums, state = self._greedy_indices(mean_strength, team_target_sizes)
+                strength_diff = self._index_spread(teams, sums, state)
+                if strength_diff is None:
+                    continue
+
+                if strength_diff <= tolerance:
+                    # Com histórico, a escolha pesa também as duplas repetidas
+                    penalty = self._history_penalty(teams) if history else 0.0
+                    score = strength_diff + self.history_weight * penalty
+                    if score < best_score:
+                        best_score = score
+                        best_strength_diff = strength_diff
+                        best_distribution = teams
+                    if strength_diff <= self._early_exit_spread():
+                        if penalty == 0:
+                            break
+                        # Alvo de força atingido: segue só mais uma janela buscando menos repetição
+                        last_attempt = min(last_attempt, attempt + self.history_attempts)
+                elif self.deadline is not None and strength_diff <= fallback_diff:
+                    fallback_diff = strength_diff
+                    fallback = teams
+
+            if best_distribution is not None or self.timed_out:
                 break
 
+        self.attempts = attempts_made
         if best_distribution is None:
-            raise ValueError(
-                "Não foi possível encontrar uma distribuição válida com a distribuição equilibrada de jogadores de alta intensidade"
-            )
+            best_distribution = fallback
+        if best_distribution is None:
+            raise ValueError(NO_VALID_DISTRIBUTION)
 
         # Embaralha a ordem dos times para variar a apresentacao (cores/posicoes)
-        final_distribution = best_distribution[:]
+        final_distribution = self.problem.materialize(best_distribution)
         random.shuffle(final_distribution)
         return final_distribution
 
+    def local_search(
+        self,
+        teams: Optional[List[List[Player]]] = None,
+        max_iterations: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        target: Optional[float] = None,
+    ) -> List[List[Player]]:
+        """Melhora uma distribuição por trocas entre times (simulated annealing).
+
+        Parte de `teams` ou de uma distribuição gulosa como as do sampler. Cada
+        time mantém soma de notas, tamanho e contagem de alta intensidade, então
+        cada troca é avaliada em O(1) e só são aceitas trocas que preservam as
+        restrições de tamanho e as de `constraints` (top players, intensidade e
+        regras extras; membros de grupos 'together' ficam onde estão). Para ao atingir
+        `target` (padrão `target_spread` ou o limite inferior conhecido), após `max_iterations`, após
+        `time_budget` segundos ou no prazo do balanceador.
+        """
+        if not self.players or self.num_teams <= 0:
+            raise ValueError("Nenhum jogador para distribuir")
+        if teams is None:
+            teams = self._valid_starting_point()
+        elif not self._meets_hard_constraints(teams):
+            raise ValueError("Distribuição inicial não respeita as restrições")
+        if max_iterations is None:
+            max_iterations = self.local_iterations
+        if target is None:
+            target = self._early_exit_spread()
+
+        num_teams = len(teams)
+        members = [list(team) for team in teams]
+        sums = [sum(p.overall_rating for p in team) for team in members]
+        sizes = [len(team) for team in members]
+        # Top players, alta intensidade e regras extras como contadores por time
+        position = {id(p): i for i, p in enumerate(self.players)}
+        counts = self.constraints.counts([[position[id(p)] for p in team] for team in members])
+        mean = sum(sums) / sum(sizes)
+        size_lo = self.players_per_team
+        size_hi = self.players_per_team + 1
+
+        def spread() -> float:
+            means = [sums[i] / sizes[i] for i in range(num_teams)]
+            return max(means) - min(means)
+
+        def cost(total: float, size: int) -> float:
+            return (total / size - mean) ** 2
+
+        best_spread = spread()
+        best = [list(team) for team in members]
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        if self.deadline is not None:
+            deadline = self.deadline if deadline is None else min(deadline, self.deadline)
+        temperature = 0.05
+        cooling = (1e-4 / temperature) ** (1.0 / max(1, max_iterations))
+
+        it = -1
+        for it in range(max_iterations):
+            if best_spread <= target:
+                break
+            if it % 256 == 255:
+                self._report_progress(None, it, best_spread)
+            if deadline is not None and it % 256 == 255 and time.monotonic() >= deadline:
+                self.timed_out = self.deadline is not None and time.monotonic() >= self.deadline
+                break
+            temperature *= cooling
+
+            a, b = random.sample(range(num_teams), 2)
+            ia = random.randrange(sizes[a])
+            pa = members[a][ia]
+            # Movimento simples quando os tamanhos permitem; senão troca dois jogadores
+            move = sizes[a] > size_lo and sizes[b] < size_hi and random.random() < 0.3
+            if move:
+                pb = None
+                ra, rb = pa.overall_rating, 0.0
+                da, db = -1, 1
+            else:
+                ib = random.randrange(sizes[b])
+                pb = members[b][ib]
+                ra, rb = pa.overall_rating, pb.overall_rating
+                da = db = 0
+            ia_pos = position[id(pa)]
+            ib_pos = position[id(pb)] if pb is not None else None
+            if not counts.allows_move(ia_pos, a, b, ib_pos):
+                continue
+
+            new_sum_a = sums[a] - ra + rb
+            new_sum_b = sums[b] + ra - rb
+            delta = (
+                cost(new_sum_a, sizes[a] + da) + cost(new_sum_b, sizes[b] + db)
+                - cost(sums[a], sizes[a]) - cost(sums[b], sizes[b])
+            )
+            if delta > 0 and random.random() >= math.exp(-delta / temperature):
+                continue
+
+            if move:
+                members[a].pop(ia)
+                members[b].append(pa)
+            else:
+                members[a][ia] = pb
+                members[b][ib] = pa
+            sums[a], sums[b] = new_sum_a, new_sum_b
+            sizes[a] += da
+            sizes[b] += db
+            counts.remove(a, ia_pos)
+            counts.add(b, ia_pos)
+            if ib_pos is not None:
+                counts.remove(b, ib_pos)
+                counts.add(a, ib_pos)
+
+            current = spread()
+            if current < best_spread:
+                best_spread = current
+                best = [list(team) for team in members]
+
+        self.attempts = it + 1
+        if best_spread > max(self.tolerances):
+            raise ValueError(NO_VALID_DISTRIBUTION)
+        random.shuffle(best)
+        return best
+
+    def _valid_starting_point(self) -> List[List[Player]]:
+        """Primeira distribuição gulosa que respeita as restrições rígidas."""
+        mean_strength = self.problem.total_rating / len(self.players)
+        team_target_sizes = [
+            self.players_per_team + (1 if i < self.extra else 0)
+            for i in range(self.num_teams)
+        ]
+        for attempt in range(self.max_attempts):
+            if attempt % 64 == 63 and self.time_is_up():
+                break
+            teams = self._greedy_distribution(mean_strength, team_target_sizes)
+            if teams is not None and self._meets_hard_constraints(teams):
+                return teams
+        raise ValueError(NO_VALID_DISTRIBUTION)
+
+    def rebalance(
+        self,
+        teams: List[List[Player]],
+        max_moves: int = 3,
+        time_budget: float = 0.05,
+    ) -> Tuple[List[List[Player]], List[Tuple[Player, int, int]]]:
+        """Ajusta uma distribuição já sorteada ao elenco atual mudando o mínimo de jogadores de time.
+
+        `teams` é a distribuição anterior (os mesmos objetos Player de
+        `players`): quem não está mais em `players` sai e quem não está em
+        `teams` entra. Os que chegam vão para qualquer time sem contar como
+        movimento; entre os que já estavam escalados, a busca tenta 0, 1, ...,
+        `max_moves` mudanças de time (com poda pelo mínimo de mudanças que as
+        restrições ainda exigem) e fica com a menor quantidade que respeita
+        tamanhos, `constraints` (top players, alta intensidade, regras extras)
+        e a menor tolerância de força possível. Se nada servir dentro de `max_moves` ou de `time_budget`
+        segundos, sorteia do zero e alinha os times aos anteriores.
+
+        Retorna (times na ordem de `teams`, mudanças como (jogador, time de
+        origem, time de destino)).
+        """
+        num_teams = self.num_teams
+        if len(teams) != num_teams:
+            raise ValueError(f"A distribuição tem {len(teams)} times, esperado {num_teams}")
+        if len(self.players) < num_teams:
+            raise ValueError("Jogadores insuficientes para o número de times")
+        deadline = time.monotonic() + time_budget
+        if self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+
+        problem = self.problem
+        ratings = problem.ratings
+        position = {id(p): i for i, p in enumerate(self.players)}
+        assign = [-1] * len(self.players)
+        order: List[List[int]] = [[] for _ in range(num_teams)]
+        for t, team in enumerate(teams):
+            for p in team:
+                i = position.get(id(p))
+                if i is None:
+                    continue
+                if assign[i] >= 0:
+                    raise ValueError(f"Jogador repetido na distribuição: {p.name}")
+                assign[i] = t
+                order[t].append(i)
+        original = list(assign)
+        added = [i for i, t in enumerate(assign) if t < 0]
+        movable = [i for i, t in enumerate(assign) if t >= 0]
+
+        sizes = [0] * num_teams
+        sums = [0.0] * num_teams
+        counts = self.constraints.counts()
+
+        def shift(i: int, src: int, dst: int) -> None:
+            if src >= 0:
+                sizes[src] -= 1
+                sums[src] -= ratings[i]
+                counts.remove(src, i)
+            if dst >= 0:
+                sizes[dst] += 1
+                sums[dst] += ratings[i]
+                counts.add(dst, i)
+            assign[i] = dst
+
+        for i in movable:
+            shift(i, -1, assign[i])
+
+        lo, hi = self.players_per_team, self.players_per_team + 1
+
+        def moves_needed() -> int:
+            """Limite inferior de mudanças para corrigir tamanhos e as regras de `constraints`."""
+            over = sum(s - hi for s in sizes if s > hi)
+            under = sum(lo - s for s in sizes if s < lo)
+            return max(over, under, counts.moves_needed())
+
+        def spread() -> Optional[float]:
+            if moves_needed():
+                return None
+            means = [sums[t] / sizes[t] for t in range(num_teams)]
+            return max(means) - min(means)
+
+        # Onde colocar os que chegam: todas as combinações quando são poucas
+        if num_teams ** len(added) <= 64:
+            placements = list(itertools.product(range(num_teams), repeat=len(added)))
+        else:
+            # Muitos novatos: um lugar só, guloso pelo time menor e mais fraco
+            counts, totals, greedy = list(sizes), list(sums), []
+            for i in sorted(added, key=lambda i: -ratings[i]):
+                t = min(range(num_teams), key=lambda t: (counts[t], totals[t] / counts[t] if counts[t] else 0.0))
+                counts[t] += 1
+                totals[t] += ratings[i]
+                greedy.append((i, t))
+            added = [i for i, _ in greedy]
+            placements = [tuple(t for _, t in greedy)]
+
+        best_by_depth: List[Tuple[float, Optional[List[int]]]] = []
+        path: List[int] = []
+
+        def search(left: int, start: int, found: list) -> None:
+            if moves_needed() > left:
+                return
+            if left == 0:
+                current = spread()
+                if current is not None and current < found[0]:
+                    found[0], found[1] = current, list(assign)
+                return
+            for idx in range(start, len(movable)):
+                if time.monotonic() >= deadline:
+                    return
+                i = movable[idx]
+                src = assign[i]
+                for dst in range(num_teams):
+                    if dst == src:
+                        continue
+                    shift(i, src, dst)
+                    path.append(i)
+                    search(left - 1, idx + 1, found)
+                    path.pop()
+                    shift(i, dst, src)
+
+        for depth in range(max_moves + 1):
+            found = [float('inf'), None]
+            for placement in placements:
+                for i, t in zip(added, placement):
+                    shift(i, -1, t)
+                search(depth, 0, found)
+                for i, t in zip(added, placement):
+                    shift(i, t, -1)
+            best_by_depth.append((found[0], found[1]))
+            if found[0] <= self.tolerances[0] or time.monotonic() >= deadline:
+                break
+
+        # Menos mudanças vence; a tolerância só relaxa quando nenhuma profundidade a atinge
+        chosen = None
+        for tolerance in self.tolerances:
+            chosen = next((a for s, a in best_by_depth if s <= tolerance), None)
+            if chosen is not None:
+                break
+        if chosen is None:
+            chosen = self._aligned_rebuild(original)
+
+        result = [[i for i in order[t] if chosen[i] == t] for t in range(num_teams)]
+        moves = []
+        for i, t in enumerate(chosen):
+            if original[i] != t:
+                result[t].append(i)
+                if original[i] >= 0:
+                    moves.append((self.players[i], original[i], t))
+        return problem.materialize(result), moves
+
+    def _aligned_rebuild(self, original: List[int]) -> List[int]:
+        """Sorteia do zero e numera os times pelo maior número de jogadores em comum com `original`."""
+        teams = self.distribute_players()
+        position = {id(p): i for i, p in enumerate(self.players)}
+        indices = [[position[id(p)] for p in team] for team in teams]
+        overlap = [
+            [sum(1 for i in team if original[i] == t) for t in range(self.num_teams)]
+            for team in indices
+        ]
+        pairs = sorted(
+            ((overlap[n][t], n, t) for n in range(len(indices)) for t in range(self.num_teams)),
+            reverse=True,
+        )
+        target: Dict[int, int] = {}
+        used = set()
+        for _, n, t in pairs:
+            if n not in target and t not in used:
+                target[n] = t
+                used.add(t)
+        assign = [-1] * len(self.players)
+        for n, team in enumerate(indices):
+            for i in team:
+                assign[i] = target[n]
+        return assign
+
+    def _encode_roster(self):
+        """Codifica o elenco como arrays paralelos (nota, alta intensidade, top)."""
+        np = load_numpy()
+        rating = np.array(self.problem.ratings, dtype=np.float64)
+        high = np.array(self.problem.high, dtype=bool)
+        top = np.array(self.problem.top, dtype=bool)
+        return rating, high, top
+
+    def _fill_slots(self, quotas, length: int):
+        """Distribui `length` vagas seguindo as cotas por time; o excedente vai em rodízio."""
+        np = load_numpy()
+        cum = quotas.cumsum(axis=1)
+        slots = np.arange(length)
+        teams = (slots[None, :, None] >= cum[:, None, :]).sum(axis=2)
+        overflow = slots[None, :] - cum[:, -1:]
+        return np.where(overflow >= 0, overflow % self.num_teams, teams)
+
+    def _batched_candidates(self, rng, encoded, rows: int):
+        """Monta `rows` distribuições de uma vez, como matriz (linha, jogador) -> time.
+
+        Segue as mesmas etapas do sampler: top players em times distintos, alta
+        intensidade compensando o que veio dos tops, elites de baixa intensidade
+        em rodízio e o restante completando o tamanho-alvo de cada time, cada
+        vaga com o melhor dos três próximos da fila (`_place_closest`).
+        """
+        np = load_numpy()
+        rating, high, top = encoded
+        num_teams = self.num_teams
+        row_ids = np.arange(rows)[:, None]
+        team_ids = np.arange(num_teams)
+        teams = np.empty((rows, len(rating)), dtype=np.int64)
+
+        def shuffled(idx):
+            return idx[rng.random((rows, len(idx))).argsort(axis=1)]
+
+        def place(idx, slots):
+            teams[row_ids, shuffled(idx)] = slots
+            return (slots[:, :, None] == team_ids).sum(axis=1)
+
+        top_idx = np.flatnonzero(top)
+        counts = place(top_idx, np.broadcast_to(np.arange(len(top_idx)), (rows, len(top_idx))))
+        high_already = np.zeros((rows, num_teams), dtype=np.int64)
+        np.add.at(high_already, (np.repeat(row_ids, len(top_idx), axis=1), teams[:, top_idx]), high[top_idx])
+
+        high_idx = np.flatnonzero(high & ~top)
+        target_high = (len(high_idx) + int(high[top_idx].sum())) // num_teams
+        needed = np.clip(target_high - high_already, 0, None)
+        counts += place(high_idx, self._fill_slots(needed, len(high_idx)))
+
+        low = ~high & ~top
+        elite_idx = np.flatnonzero(low & (rating >= 6))
+        counts += place(elite_idx, np.broadcast_to(np.arange(len(elite_idx)) % num_teams, (rows, len(elite_idx))))
+
+        rest_idx = np.flatnonzero(low & (rating < 6))
+        target_sizes = self.players_per_team + (team_ids < self.extra)
+        capacity = np.clip(target_sizes - counts, 0, None)
+        self._place_closest(teams, shuffled(rest_idx), counts, capacity, rating)
+        return teams
+
+    def _place_closest(self, teams, queue, sizes, capacity, rating) -> None:
+        """Última etapa do sampler em lote: médios e fracos completam os times.
+
+        Como em `_greedy_indices`, os times com vaga são visitados em rodízio e
+        cada um recebe, dos três primeiros jogadores da fila (`queue`, já
+        embaralhada por linha), o que deixa a média do time mais perto da média
+        geral. A fila é uma janela de três por linha mais um ponteiro; cada
+        passo do laço decide uma vaga em todas as linhas.
+        """
+        np = load_numpy()
+        rows, length = queue.shape
+        if length == 0:
+            return
+        num_teams = self.num_teams
+        row_ids = np.arange(rows)
+        mean_strength = float(rating.mean())
+        # Soma de notas por time com os jogadores já colocados (os da fila ainda não têm time)
+        placed = np.ones(len(rating), dtype=bool)
+        placed[queue[0]] = False
+        flat = (teams[:, placed] + row_ids[:, None] * num_teams).ravel()
+        sums = np.bincount(
+            flat, weights=np.broadcast_to(rating[placed], (rows, int(placed.sum()))).ravel(),
+            minlength=rows * num_teams,
+        ).reshape(rows, num_teams)
+        sizes = sizes.astype(np.float64)
+        # Sequência de times de cada linha: rodadas sobre os times que ainda têm vaga
+        passes = int(capacity.max()) if capacity.size else 0
+        open_slot = capacity[:, None, :] > np.arange(passes)[None, :, None]
+        order = (~open_slot.reshape(rows, -1)).argsort(axis=1, kind='stable')[:, :length]
+        sequence = np.tile(np.arange(num_teams), passes)[order]
+        # Sem rules o sampler sempre preenche: a soma das vagas cobre a fila
+        window = np.full((rows, 3), -1, dtype=np.int64)
+        head = min(3, length)
+        window[:, :head] = queue[:, :head]
+        pointer = head
+        padded = np.concatenate([queue, np.full((rows, 1), -1, dtype=np.int64)], axis=1)
+        for step in range(length):
+            t = sequence[:, step]
+            team_sum = sums[row_ids, t][:, None]
+            team_size = sizes[row_ids, t][:, None]
+            gap = np.abs((team_sum + rating[window]) / (team_size + 1) - mean_strength)
+            gap[window < 0] = np.inf
+            j = gap.argmin(axis=1)
+            chosen = window[row_ids, j]
+            teams[row_ids, chosen] = t
+            sums[row_ids, t] += rating[chosen]
+            sizes[row_ids, t] += 1
+            # Tira o escolhido da janela mantendo a ordem e puxa o próximo da fila
+            shift = np.arange(3)[None, :] >= j[:, None]
+            window[:, :2] = np.where(shift[:, :2], window[:, 1:], window[:, :2])
+            window[:, 2] = padded[:, min(pointer, length)]
+            pointer += 1
+
+    def _score_batch(self, teams, encoded):
+        """Valida e pontua um lote com reduções vetorizadas; retorna (válidas, diferença de força)."""
+        np = load_numpy()
+        rating, high, top = encoded
+        rows = teams.shape[0]
+        num_teams = self.num_teams
+        flat = (teams + np.arange(rows)[:, None] * num_teams).ravel()
+
+        def per_team(weights=None):
+            if weights is not None:
+                weights = np.broadcast_to(weights, teams.shape).ravel()
+            return np.bincount(flat, weights=weights, minlength=rows * num_teams).reshape(rows, num_teams)
+
+        sizes = per_team()
+        high_counts = per_team(high.astype(np.float64))
+        top_counts = per_team(top.astype(np.float64))
+        means = per_team(rating) / np.maximum(sizes, 1)
+
+        valid = (sizes >= self.players_per_team).all(axis=1) & (sizes <= self.players_per_team + 1).all(axis=1)
+        valid &= top_counts.max(axis=1) <= 1
+        valid &= high_counts.max(axis=1) - high_counts.min(axis=1) <= 1
+        return valid, means.max(axis=1) - means.min(axis=1)
+
+    def _distribute_batched(self) -> List[List[Player]]:
+        np = load_numpy()
+        encoded = self._encode_roster()
+        # Semente derivada de `random` para manter o reseed de _build_balance_context
+        rng = np.random.default_rng(random.getrandbits(64))
+
+        best_row = None
+        best_strength_diff = float('inf')
+        fallback_row = None
+        fallback_diff = max(self.tolerances)
+        total_attempts = 0
+        for tolerance in self.tolerances:
+            self._strength_tolerance = tolerance
+            attempts = 0
+            rows = min(256, self.batch_size)
+            while attempts < self.max_attempts and not self.time_is_up():
+                # Lotes crescentes: elencos fáceis resolvem já no primeiro lote pequeno
+                rows = min(rows, self.max_attempts - attempts)
+                attempts += rows
+                teams = self._batched_candidates(rng, encoded, rows)
+                valid, spread = self._score_batch(teams, encoded)
+                loose = np.flatnonzero(valid & (spread <= fallback_diff))
+                if loose.size:
+                    i = loose[np.argmin(spread[loose])]
+                    fallback_diff = float(spread[i])
+                    fallback_row = teams[i]
+                ok = np.flatnonzero(valid & (spread <= tolerance))
+                if ok.size:
+                    i = ok[np.argmin(spread[ok])]
+                    if spread[i] < best_strength_diff:
+                        best_strength_diff = float(spread[i])
+                        best_row = teams[i]
+                    if best_strength_diff <= self._early_exit_spread():
+                        break
+                self._report_progress(tolerance, total_attempts + attempts, best_strength_diff)
+                rows = min(rows * 2, self.batch_size)
+            total_attempts += attempts
+            if best_row is not None or self.timed_out:
+                break
+        self.attempts = total_attempts
+
+        if best_row is None:
+            best_row = fallback_row
+        if best_row is None:
+            raise ValueError(NO_VALID_DISTRIBUTION)
+
+        distribution = [[] for _ in range(self.num_teams)]
+        for player, team in zip(self.players, best_row.tolist()):
+            distribution[team].append(player)
+        random.shuffle(distribution)
+        return distribution
+
+    def best_distributions(self, k: int = 1) -> List[List[List[Player]]]:
+        """Busca exata (branch-and-bound) das k melhores distribuições distintas.
+
+        Jogadores com a mesma nota, intensidade e condição de top são
+        intercambiáveis, então a busca decide apenas quantos de cada grupo vão
+        para cada time. Ramos são podados pelo limite inferior da diferença de
+        força e pelas restrições de intensidade, tamanho e top players.
+        Retorna as distribuições em ordem crescente de diferença de força; com
+        prazo esgotado (`timed_out`), o resultado é o melhor encontrado até ali.
+        """
+        solutions = self._branch_and_bound(max(1, k))
+        max_tolerance = max(self.tolerances)
+        solutions = [s for s in solutions if s[0] <= max_tolerance + 1e-9]
+        if not solutions:
+            raise ValueError(NO_VALID_DISTRIBUTION)
+        self.target_reached = solutions[0][0] <= self.target_spread + 1e-9
+        return [self._materialize(groups, counts) for _, groups, counts in solutions]
+
+    def minimum_spread(self) -> Optional[float]:
+        """Menor diferença de força possível (busca exata), ou None se nenhuma
+        distribuição respeita as restrições. Com prazo esgotado (`timed_out`),
+        é apenas a melhor diferença encontrada."""
+        solutions = self._branch_and_bound(1)
+        return solutions[0][0] if solutions else None
+
+    def _player_groups(self) -> List[Tuple[float, bool, bool, List[Player]]]:
+        """Agrupa jogadores intercambiáveis como (nota, alta intensidade, top, jogadores)."""
+        grouped: Dict[Tuple[float, bool, bool], List[Player]] = {}
+        for p in self.players:
+            key = (p.overall_rating, p.intensity == Intensity.HIGH, self._is_top(p))
+            grouped.setdefault(key, []).append(p)
+        # Nota decrescente: o limite por somas de prefixo depende dessa ordem
+        keys = sorted(grouped, key=lambda g: (-g[0], not g[2], not g[1]))
+        return [(r, high, top, grouped[(r, high, top)]) for r, high, top in keys]
+
+    def _branch_and_bound(self, k: int) -> List[Tuple[float, list, List[List[int]]]]:
+        """Retorna até k tuplas (diferença, grupos, contagens por grupo e time)."""
+        num_teams = self.num_teams
+        n = len(self.players)
+        if num_teams <= 0 or n < num_teams:
+            return []
+
+        groups = self._player_groups()
+        num_groups = len(groups)
+        sizes = sorted(
+            (self.players_per_team + (1 if i < self.extra else 0) for i in range(num_teams)),
+            reverse=True,
+        )
+
+        # Somas de prefixo das notas (decrescentes) separadas por intensidade:
+        # cada time recebe uma quantidade quase fixa de jogadores de alta
+        pools = {True: [0.0], False: [0.0]}
+        starts = []
+        for rating, high, _, members in groups:
+            starts.append((len(pools[True]) - 1, len(pools[False]) - 1))
+            for _ in members:
+                pools[high].append(pools[high][-1] + rating)
+        starts.append((len(pools[True]) - 1, len(pools[False]) - 1))
+        high_prefix, low_prefix = pools[True], pools[False]
+        high_count, low_count = len(high_prefix) - 1, len(low_prefix) - 1
+        total = high_prefix[-1] + low_prefix[-1]
+        mean = total / n
+
+        high_total = sum(len(m) for _, high, _, m in groups if high)
+        high_lo = high_total // num_teams
+        high_hi = high_lo + (1 if high_total % num_teams else 0)
+
+        # Limite inferior global: com notas inteiras as somas dos times também são
+        # inteiras, então procura a menor janela [menor média, maior média] que
+        # comporta somas inteiras totalizando `total`
+        floor_bound = 0.0
+        integral = all(float(g[0]).is_integer() for g in groups)
+        distinct_sizes = sorted(set(sizes))
+        if integral:
+            floor_bound = self._integral_spread_bound(sizes, int(round(total)))
+        floor_bound = max(floor_bound, self.spread_lower_bound)
+
+        sums = [0.0] * num_teams
+        filled = [0] * num_teams
+        highs = [0] * num_teams
+        tops = [0] * num_teams
+        assignment: List[List[int]] = []
+        best: List[Tuple[float, int, List[List[int]]]] = []  # heap de máximo via negação
+        state = {'counter': 0, 'done': False, 'cap': float('inf'), 'nodes': 0}
+        eps = 1e-9
+        infeasible = (float('inf'), 0.0)
+
+        def bound(d: int) -> Tuple[float, float]:
+            """Limite inferior da diferença de força e desequilíbrio parcial (para ordenar)."""
+            high_pos, low_pos = starts[d]
+            rem_high = high_count - high_pos
+            rem_low = low_count - low_pos
+            need_high = room_high = need_low = 0
+            low_max = float('inf')
+            high_min = float('-inf')
+            rest_total = (high_prefix[-1] - high_prefix[high_pos]) + (low_prefix[-1] - low_prefix[low_pos])
+            rest_mean = rest_total / (rem_high + rem_low) if rem_high + rem_low else 0.0
+            proj_max = float('-inf')
+            proj_min = float('inf')
+            min_sums = []
+            max_sums = []
+            for i in range(num_teams):
+                cap = sizes[i] - filled[i]
+                h = highs[i]
+                if h > high_hi or high_lo - h > cap:
+                    return infeasible
+                need_high += max(0, high_lo - h)
+                room_high += min(cap, high_hi - h)
+                need_low += max(0, cap - (high_hi - h))
+                min_sum = float('inf')
+                max_sum = float('-inf')
+                for take in {max(0, high_lo - h), min(cap, high_hi - h)}:
+                    rest = cap - take
+                    if take > rem_high or rest > rem_low:
+                        continue
+                    smallest = (high_prefix[-1] - high_prefix[high_count - take]
+                                + low_prefix[-1] - low_prefix[low_count - rest])
+                    largest = (high_prefix[high_pos + take] - high_prefix[high_pos]
+                               + low_prefix[low_pos + rest] - low_prefix[low_pos])
+                    min_sum = min(min_sum, smallest)
+                    max_sum = max(max_sum, largest)
+                if min_sum == float('inf'):
+                    return infeasible
+                min_sum += sums[i]
+                max_sum += sums[i]
+                min_sums.append(min_sum)
+                max_sums.append(max_sum)
+                lo_mean = min_sum / sizes[i]
+                hi_mean = max_sum / sizes[i]
+                if lo_mean > high_min:
+                    high_min = lo_mean
+                if hi_mean < low_max:
+                    low_max = hi_mean
+                projected = (sums[i] + cap * rest_mean) / sizes[i]
+                proj_max = max(proj_max, projected)
+                proj_min = min(proj_min, projected)
+            if need_high > rem_high or room_high < rem_high or need_low > rem_low:
+                return infeasible
+            # A média geral fica entre a menor e a maior média final
+            lb = max(floor_bound, high_min - low_max, high_min - mean, mean - low_max)
+            limit = cutoff()
+            if integral and lb < limit < float('inf') and not fits_window(min_sums, max_sums, limit):
+                return infeasible
+            # Diferença projetada se o restante fosse dividido pela média: ordena os ramos
+            return lb, proj_max - proj_min
+
+        def fits_window(min_sums: List[float], max_sums: List[float], width: float) -> bool:
+            """Existe janela [L, L + width] com somas inteiras viáveis que totalizam `total`?
+
+            A menor média final é L = a/s para algum tamanho s e L <= média geral,
+            então bastam poucos candidatos quando a janela é estreita.
+            """
+            for size in distinct_sizes:
+                for a in range(math.floor(mean * size + eps), math.ceil((mean - width) * size - eps) - 1, -1):
+                    low = a / size
+                    lower_total = upper_total = 0
+                    for i in range(num_teams):
+                        lower = max(min_sums[i], math.ceil(low * sizes[i] - eps))
+                        upper = min(max_sums[i], math.floor((low + width) * sizes[i] + eps))
+                        if lower > upper:
+                            break
+                        lower_total += lower
+                        upper_total += upper
+                    else:
+                        if lower_total <= total <= upper_total:
+                            return True
+            return False
+
+        def cutoff() -> float:
+            return -best[0][0] if len(best) >= k else state['cap']
+
+        def compositions(d: int):
+            _, high, top, members = groups[d]
+            count = len(members)
+            limits = []
+            twins = []
+            for i in range(num_teams):
+                cap = sizes[i] - filled[i]
+                if top:
+                    cap = min(cap, 1 - tops[i])
+                if high:
+                    cap = min(cap, high_hi - highs[i])
+                limits.append(max(0, cap))
+                # Times com o mesmo tamanho e os mesmos jogadores são simétricos:
+                # força ordem não crescente. Só a soma igual não basta, pois
+                # conteúdos diferentes geram distribuições distintas no top-k
+                twin = -1
+                for j in range(i - 1, -1, -1):
+                    if sizes[j] == sizes[i] and all(xs[j] == xs[i] for xs in assignment):
+                        twin = j
+                        break
+                twins.append(twin)
+            suffix_room = [0] * (num_teams + 1)
+            for i in range(num_teams - 1, -1, -1):
+                suffix_room[i] = suffix_room[i + 1] + limits[i]
+
+            current = [0] * num_teams
+
+            def rec(i: int, left: int):
+                if i == num_teams:
+                    if left == 0:
+                        yield list(current)
+                    return
+                upper = min(left, limits[i])
+                if twins[i] >= 0:
+                    upper = min(upper, current[twins[i]])
+                lower = max(0, left - suffix_room[i + 1])
+                for x in range(upper, lower - 1, -1):
+                    current[i] = x
+                    yield from rec(i + 1, left - x)
+                current[i] = 0
+
+            return rec(0, count)
+
+        def apply(d: int, xs: List[int], sign: int) -> None:
+            rating, high, top, _ = groups[d]
+            for i, x in enumerate(xs):
+                if x:
+                    sums[i] += sign * x * rating
+                    filled[i] += sign * x
+                    if high:
+                        highs[i] += sign * x
+                    if top:
+                        tops[i] += sign * x
+
+        # Tabela de transposição: estados com os mesmos times (a menos de ordem)
+        # têm as mesmas continuações; guarda as melhores para reaproveitar
+        memo: Dict[tuple, Tuple[float, list]] = {}
+        frames: List[Tuple[int, List[int], list]] = []
+
+        def record(spread: float) -> None:
+            state['counter'] += 1
+            entry = (-spread, state['counter'], [list(xs) for xs in assignment])
+            if len(best) >= k:
+                heapq.heapreplace(best, entry)
+            else:
+                heapq.heappush(best, entry)
+            for depth, order, found in frames:
+                suffix = [[xs[i] for i in order] for xs in assignment[depth:]]
+                found.append((spread, suffix))
+            if len(best) >= k and cutoff() <= floor_bound + eps:
+                state['done'] = True
+
+        def dfs(d: int) -> None:
+            if d == num_groups:
+                means = [sums[i] / sizes[i] for i in range(num_teams)]
+                spread = max(means) - min(means)
+                if spread < cutoff() - eps:
+                    record(spread)
+                return
+            state['nodes'] += 1
+            if state['nodes'] % 256 == 0:
+                self._report_progress(None, state['nodes'], -max(best)[0] if best else float('inf'))
+                if self.time_is_up():
+                    state['done'] = True
+                    return
+
+            team_states = [(sizes[i], filled[i], sums[i], highs[i], tops[i]) for i in range(num_teams)]
+            order = sorted(range(num_teams), key=team_states.__getitem__)
+            key = (d, tuple(team_states[i] for i in order))
+            cached = memo.get(key)
+            if cached is not None and cutoff() <= cached[0] + eps:
+                for spread, suffix in cached[1]:
+                    if state['done'] or spread >= cutoff() - eps:
+                        break
+                    base = len(assignment)
+                    for canon_xs in suffix:
+                        xs = [0] * num_teams
+                        for pos, i in enumerate(order):
+                            xs[i] = canon_xs[pos]
+                        assignment.append(xs)
+                    record(spread)
+                    del assignment[base:]
+                return
+
+            found: list = []
+            frames.append((d, order, found))
+            children = []
+            for xs in compositions(d):
+                apply(d, xs, 1)
+                lb, spread_guess = bound(d + 1)
+                apply(d, xs, -1)
+                if lb < cutoff() - eps:
+                    children.append((lb, spread_guess, xs))
+            children.sort(key=lambda c: (c[0], c[1]))
+            for lb, _, xs in children:
+                if state['done'] or lb >= cutoff() - eps:
+                    break
+                apply(d, xs, 1)
+                assignment.append(xs)
+                dfs(d + 1)
+                assignment.pop()
+                apply(d, xs, -1)
+            frames.pop()
+            found.sort(key=lambda f: f[0])
+            memo[key] = (cutoff(), found[:k])
+
+        if bound(0)[0] == float('inf'):
+            return []
+
+        # Aprofundamento iterativo no teto de diferença: tetos apertados podam
+        # quase tudo, então tenta primeiro o limite inferior e relaxa aos poucos.
+        # Cada passada é exata abaixo do seu teto; basta k soluções para parar.
+        max_tolerance = max(self.tolerances)
+        step = 0.05
+        cap = floor_bound
+        previous: list = []
+        while True:
+            previous = list(best)
+            best.clear()
+            memo.clear()
+            state['done'] = False
+            state['cap'] = cap + 2 * eps if cap < max_tolerance else float('inf')
+            dfs(0)
+            if self.timed_out:
+                # Prazo esgotado: fica com a passada que achou mais soluções
+                if len(previous) > len(best):
+                    best[:] = previous
+                break
+            if len(best) >= k or cap >= max_tolerance:
+                break
+            cap = min(max_tolerance, cap + step)
+            step *= 2
+
+        self.attempts = state['nodes']
+        ordered = sorted(best, key=lambda e: (-e[0], e[1]))
+        return [(-neg, groups, counts) for neg, _, counts in ordered]
+
+    @staticmethod
+    def _integral_spread_bound(sizes: List[int], total: int) -> float:
+        """Menor diferença de médias possível apenas com somas inteiras por time."""
+        n = sum(sizes)
+        distinct = sorted(set(sizes))
+        mean = total / n
+        candidates = sorted({
+            a / s
+            for s in distinct
+            for a in range(math.floor(mean * s) - s, math.ceil(mean * s) + s + 1)
+        })
+        lows = [v for v in candidates if v <= mean + 1e-9]
+        highs = [v for v in candidates if v >= mean - 1e-9]
+        best = float('inf')
+        for low in lows:
+            min_total = sum(math.ceil(low * s - 1e-9) for s in sizes)
+            if min_total > total:
+                continue
+            for high in highs:
+                if high - low >= best:
+                    break
+                if sum(math.floor(high * s + 1e-9) for s in sizes) >= total:
+                    best = high - low
+                    break
+        return max(0.0, best) if best < float('inf') else 0.0
+
+    def _materialize(self, groups, counts: List[List[int]]) -> List[List[Player]]:
+        """Converte contagens por grupo em times concretos, sorteando dentro de cada grupo."""
+        teams: List[List[Player]] = [[] for _ in range(self.num_teams)]
+        for (_, _, _, members), xs in zip(groups, counts):
+            pool = members[:]
+            random.shuffle(pool)
+            start = 0
+            for i, x in enumerate(xs):
+                teams[i].extend(pool[start:start + x])
+                start += x
+        random.shuffle(teams)
+        return teams
+
     def print_teams(self, teams: List[List[Player]]) -> None:
         print("\nTimes Balanceados:")
         all_strengths = []
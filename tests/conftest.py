@@ -0,0 +1,64 @@
+"""Ambiente isolado para os testes do app: elenco, histórico e jobs num diretório temporário.
+
+As variáveis precisam estar definidas antes de importar team_balancer e main,
+que leem o ambiente ao importar.
+"""
+import os
+import re
+import tempfile
+import time
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix='peladapp-tests-')
+os.environ['PLAYERS_FILE'] = os.path.join(_workdir, 'players.json')
+os.environ['MATCH_HISTORY_FILE'] = os.path.join(_workdir, 'match_history.json')
+os.environ['JOB_STORE'] = 'memory'
+os.environ['WARMUP'] = '0'
+os.environ['BALANCE_WORKERS'] = '0'
+
+
+@pytest.fixture(scope='session')
+def main_module():
+    import main
+    return main
+
+
+@pytest.fixture
+def client(main_module):
+    return main_module.app.test_client()
+
+
+@pytest.fixture
+def roster_ids(main_module):
+    """IDs do elenco atual, garantindo que ele foi carregado."""
+    def ids():
+        main_module.ensure_players_loaded()
+        with main_module.players_lock:
+            return [p.id for p in main_module.real_players]
+    return ids
+
+
+@pytest.fixture
+def submit_balance(client, roster_ids):
+    """POST /balance com os primeiros `size` jogadores; devolve (resposta, ID do job ou None)."""
+    def submit(size=12, num_teams=2, **form):
+        data = {'player_ids': [str(pid) for pid in roster_ids()[:size]], 'num_teams': str(num_teams), **form}
+        response = client.post('/balance', data=data)
+        match = re.search(r'const jobId = "([0-9a-f-]+)"', response.get_data(as_text=True))
+        return response, match.group(1) if match else None
+    return submit
+
+
+@pytest.fixture
+def wait_job(client):
+    """Espera o job sair da fila/execução; devolve o último /balance_status."""
+    def wait(job_id, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = client.get(f'/balance_status/{job_id}').get_json()
+            if status['status'] not in ('queued', 'running'):
+                return status
+            time.sleep(0.02)
+        raise AssertionError(f'job {job_id} não terminou')
+    return wait
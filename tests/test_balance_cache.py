@@ -0,0 +1,89 @@
+"""Cache de resultados: chave canônica, single-flight, invalidação, LRU e TTL."""
+import pytest
+
+from balance_cache import BalanceCache, roster_key
+from team_balancer import Intensity, Player
+
+
+def _players():
+    return [Player(f'J{i}', 1 + i % 7, Intensity.HIGH if i % 2 else Intensity.LOW, id=i + 1) for i in range(8)]
+
+
+def test_roster_key_ignores_order_but_not_content():
+    players = _players()
+    key = roster_key(players, 2, engine='sampling', shuffle_count=1)
+    assert roster_key(list(reversed(players)), 2, shuffle_count=1, engine='sampling') == key
+    assert roster_key(players, 3, engine='sampling', shuffle_count=1) != key
+    assert roster_key(players, 2, engine='bnb', shuffle_count=1) != key
+    assert roster_key(players, 2, engine='sampling', shuffle_count=2) != key
+    players[0].overall_rating += 1
+    assert roster_key(players, 2, engine='sampling', shuffle_count=1) != key
+
+
+def test_single_flight_then_hit():
+    cache = BalanceCache()
+    joined = []
+    assert cache.lookup_or_reserve('k', 'job-1', ['A', 'B']) == ('miss', None)
+    assert cache.lookup_or_reserve('k', 'job-2', ['A', 'B'], on_join=joined.append) == ('joined', 'job-1')
+    assert joined == ['job-1']
+    cache.complete('k', 'job-1', {'options': []})
+    assert cache.lookup_or_reserve('k', 'job-3', ['A', 'B']) == ('hit', {'options': []})
+    stats = cache.stats()
+    assert (stats['misses'], stats['joined'], stats['hits'], stats['inflight']) == (1, 1, 1, 0)
+
+
+def test_release_lets_next_request_run():
+    cache = BalanceCache()
+    cache.lookup_or_reserve('k', 'job-1', ['A'])
+    cache.release('k', 'job-2')  # reserva de outro job: não mexe
+    assert cache.lookup_or_reserve('k', 'job-2', ['A'])[0] == 'joined'
+    cache.release('k', 'job-1')
+    assert cache.lookup_or_reserve('k', 'job-3', ['A']) == ('miss', None)
+
+
+def test_invalidate_drops_results_and_in_flight_jobs():
+    cache = BalanceCache()
+    cache.lookup_or_reserve('ab', 'job-1', ['A', 'B'])
+    cache.complete('ab', 'job-1', {'ctx': 'ab'})
+    cache.lookup_or_reserve('cd', 'job-2', ['C', 'D'])
+    assert cache.invalidate(['B']) == 1
+    assert cache.lookup_or_reserve('ab', 'job-3', ['A', 'B']) == ('miss', None)
+    # Job em andamento com jogador alterado não guarda o resultado (já obsoleto)
+    cache.invalidate(['D'])
+    cache.complete('cd', 'job-2', {'ctx': 'cd'})
+    assert cache.lookup_or_reserve('cd', 'job-4', ['C', 'D']) == ('miss', None)
+
+
+def test_lru_eviction_and_ttl():
+    cache = BalanceCache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.lookup_or_reserve(key, key, [key])
+        cache.complete(key, key, {'key': key})
+    assert cache.lookup_or_reserve('a', 'x', ['a']) == ('miss', None)
+    assert cache.lookup_or_reserve('c', 'y', ['c'])[0] == 'hit'
+    assert cache.stats()['evicted'] == 1
+
+    expiring = BalanceCache(ttl_seconds=-1)
+    expiring.lookup_or_reserve('a', 'job', ['a'])
+    expiring.complete('a', 'job', {})
+    assert expiring.lookup_or_reserve('a', 'job-2', ['a']) == ('miss', None)
+    assert expiring.stats()['expired'] == 1
+    assert not BalanceCache(max_entries=0).enabled
+
+
+def test_identical_balance_requests_share_one_result(main_module, client, submit_balance, wait_job):
+    if not main_module.balance_cache.enabled:
+        pytest.skip('cache desativado')
+    response, job_id = submit_balance(size=14, shuffle_count='7')
+    wait_job(job_id)
+    hits = main_module.balance_cache.stats()['hits']
+    # Mesmo pedido: resultados direto do cache, sem novo job
+    response, again = submit_balance(size=14, shuffle_count='7')
+    assert response.status_code == 200 and again is None
+    assert main_module.balance_cache.stats()['hits'] == hits + 1
+    # Alterar um jogador da seleção descarta o resultado
+    player = main_module.roster.get(main_module.real_players[0].id)
+    assert client.post('/update_player', json={'id': player.id, 'rating': player.overall_rating}).status_code == 200
+    _, rerun = submit_balance(size=14, shuffle_count='7')
+    assert rerun is not None
+    wait_job(rerun)
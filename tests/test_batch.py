@@ -0,0 +1,79 @@
+"""Lote NDJSON em /api/balance/batch: uma linha por problema, linha final e limites da fila."""
+import json
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def test_each_problem_gets_a_line_and_the_batch_a_summary(client, roster_ids):
+    ids = roster_ids()
+    problems = [
+        {'id': 'a', 'player_ids': ids[:12], 'num_teams': 2, 'num_options': 2},
+        {'player_ids': ids[:16], 'num_teams': 4},
+        {'id': 'sem-jogador', 'player_ids': [10 ** 9], 'num_teams': 2},
+        {'id': 'invalido', 'player_ids': ids[:8], 'num_teams': 'x'},
+        {'id': 'poucos', 'player_ids': ids[:1], 'num_teams': 2},
+    ]
+    response = client.post('/api/balance/batch', json={'problems': problems})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = _lines(response)
+    summary = lines.pop()
+    assert summary['status'] == 'complete'
+    assert (summary['done'], summary['error']) == (2, 3)
+    by_index = {line['index']: line for line in lines}
+    assert sorted(by_index) == list(range(len(problems)))
+    assert by_index[0]['id'] == 'a' and 'id' not in by_index[1]
+    for index, teams in ((0, 2), (1, 4)):
+        result = by_index[index]['result']
+        assert by_index[index]['status'] == 'done'
+        for option in result['options']:
+            assert len(option) == teams
+            placed = sorted(p['id'] for team in option for p in team['players'])
+            assert placed == sorted(problems[index]['player_ids'])
+    assert len(by_index[0]['result']['options']) == 2
+    assert by_index[2] == {'index': 2, 'id': 'sem-jogador', 'status': 'error', 'error': 'Jogador não encontrado',
+                           'ids': [10 ** 9]}
+    assert by_index[3]['status'] == by_index[4]['status'] == 'error'
+
+
+def test_plain_list_is_accepted(client, roster_ids):
+    response = client.post('/api/balance/batch', json=[{'player_ids': roster_ids()[:10], 'num_teams': 2}])
+    lines = _lines(response)
+    assert [line['status'] for line in lines] == ['done', 'complete']
+
+
+def test_rejects_empty_and_oversized_batches(main_module, client, roster_ids, monkeypatch):
+    assert client.post('/api/balance/batch', json={'problems': []}).status_code == 400
+    assert client.post('/api/balance/batch', data='x', content_type='text/plain').status_code == 400
+    monkeypatch.setattr(main_module, 'BATCH_MAX_PROBLEMS', 2)
+    problem = {'player_ids': roster_ids()[:10], 'num_teams': 2}
+    assert client.post('/api/balance/batch', json=[problem] * 3).status_code == 413
+
+
+def test_full_queue_answers_503_with_retry_after(main_module, client, roster_ids, monkeypatch):
+    monkeypatch.setattr(main_module, 'JOB_QUEUE_LIMIT', 0)
+    problem = {'player_ids': roster_ids()[:10], 'num_teams': 2}
+    response = client.post('/api/balance/batch', json=[problem, problem])
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(main_module.JOB_RETRY_AFTER)
+
+
+def test_rejected_problem_becomes_an_error_line(main_module, client, roster_ids, monkeypatch):
+    create = main_module.job_store.create
+    calls = []
+
+    def first_only(job_id, queue_limit=None):
+        calls.append(job_id)
+        return create(job_id, queue_limit) if len(calls) == 1 else False
+
+    monkeypatch.setattr(main_module.job_store, 'create', first_only)
+    problem = {'player_ids': roster_ids()[:10], 'num_teams': 2}
+    response = client.post('/api/balance/batch', json=[problem, {**problem, 'id': 'cheio'}])
+    assert response.status_code == 200
+    lines = _lines(response)
+    assert lines[0] == {'index': 1, 'id': 'cheio', 'status': 'error', 'error': 'Servidor ocupado',
+                        'retry_after': main_module.JOB_RETRY_AFTER}
+    assert lines[1]['index'] == 0 and lines[1]['status'] == 'done'
+    assert (lines[2]['done'], lines[2]['error']) == (1, 1)
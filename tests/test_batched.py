@@ -0,0 +1,74 @@
+"""Motor em lote (NumPy): validação vetorizada e candidatos equivalentes aos do sampler."""
+import random
+
+import pytest
+
+import team_balancer
+from team_balancer import Intensity, Player, TeamBalancer
+
+np = pytest.importorskip('numpy')
+
+ROSTERS = [(16, 2), (20, 4), (23, 3), (30, 5)]
+
+
+def _roster(size, seed):
+    rng = random.Random(seed)
+    return [Player(f'J{i}', rng.randint(1, 7), rng.choice(list(Intensity)), id=i + 1) for i in range(size)]
+
+
+@pytest.mark.parametrize('seed,size,num_teams', [(s, n, t) for s, (n, t) in enumerate(ROSTERS)])
+def test_score_batch_matches_scalar_checks(seed, size, num_teams):
+    balancer = TeamBalancer(_roster(size, seed), num_teams)
+    encoded = balancer._encode_roster()
+    rng = np.random.default_rng(seed)
+    # Candidatos do gerador e atribuições aleatórias (quase todas inválidas)
+    teams = np.concatenate([
+        balancer._batched_candidates(rng, encoded, 200),
+        rng.integers(0, num_teams, (200, size)),
+    ])
+    valid, spread = balancer._score_batch(teams, encoded)
+    assert valid.any() and not valid.all()
+    for row, ok, row_spread in zip(teams.tolist(), valid.tolist(), spread.tolist()):
+        indices = [[i for i, t in enumerate(row) if t == team] for team in range(num_teams)]
+        assert ok == balancer._index_valid(indices)
+        if ok:
+            assert row_spread == pytest.approx(balancer.strength_spread(balancer.problem.materialize(indices)))
+
+
+@pytest.mark.parametrize('seed,size,num_teams', [(s, n, t) for s, (n, t) in enumerate(ROSTERS)])
+def test_batched_candidates_are_as_valid_as_the_sampler(seed, size, num_teams):
+    balancer = TeamBalancer(_roster(size, seed), num_teams)
+    encoded = balancer._encode_roster()
+    valid, spread = balancer._score_batch(
+        balancer._batched_candidates(np.random.default_rng(seed), encoded, 500), encoded)
+
+    random.seed(seed)
+    mean = balancer.problem.total_rating / size
+    sizes = [balancer.players_per_team + (1 if i < balancer.extra else 0) for i in range(num_teams)]
+    sampled = []
+    for _ in range(500):
+        teams, sums, state = balancer._greedy_indices(mean, sizes)
+        sampled.append(balancer._index_spread(teams, sums, state))
+    sampler_valid = [s for s in sampled if s is not None]
+
+    assert valid.mean() >= len(sampler_valid) / len(sampled) - 0.05
+    assert float(spread[valid].mean()) <= sum(sampler_valid) / len(sampler_valid) + 0.25
+
+
+@pytest.mark.parametrize('seed,size,num_teams', [(s, n, t) for s, (n, t) in enumerate(ROSTERS)])
+def test_batched_engine_returns_valid_distribution(seed, size, num_teams):
+    random.seed(seed)
+    players = _roster(size, seed)
+    balancer = TeamBalancer(players, num_teams)
+    teams = balancer.distribute_players('batched')
+    assert balancer._meets_hard_constraints(teams)
+    assert balancer.strength_spread(teams) <= max(balancer.tolerances) + 1e-9
+    assert sorted(p.id for team in teams for p in team) == [p.id for p in players]
+
+
+def test_batched_falls_back_to_sampler_without_numpy(monkeypatch):
+    monkeypatch.setattr(team_balancer, '_numpy', False)
+    monkeypatch.setattr(TeamBalancer, '_distribute_batched', lambda self: pytest.fail('numpy ausente'))
+    balancer = TeamBalancer(_roster(16, 0), 2)
+    teams = balancer.distribute_players('batched')
+    assert balancer._meets_hard_constraints(teams)
@@ -0,0 +1,81 @@
+"""Benchmarks: medições de cada alvo, comparação com execução anterior e recusa de bases diferentes."""
+import json
+
+import pytest
+
+from benchmarks import __main__ as cli
+from benchmarks import run
+from benchmarks.compare import compare
+from benchmarks.rosters import synthetic_roster
+from team_balancer import TeamBalancer
+
+
+def _suite(engine='sampling', target='distribute', p50=10.0, failure_rate=0.0):
+    return {
+        'meta': {'engine': engine, 'target': target},
+        'cases': [{
+            'key': '10x2/real/0.5', 'latency_ms': {'p50': p50}, 'failure_rate': failure_rate, 'spread_mean': 0.1,
+        }],
+    }
+
+
+def test_percentile_uses_nearest_rank():
+    values = [5.0, 1.0, 3.0, 2.0, 4.0]
+    assert run.percentile(values, 50) == 3.0
+    assert run.percentile(values, 90) == 5.0
+    assert run.percentile(values, 100) == 5.0
+    assert run.percentile([], 50) is None
+
+
+def test_run_case_summarizes_repeats():
+    result = run.run_case(run.cases(quick=True)[0], repeats=3)
+    assert result['key'] == '10x2/real/0.5' and result['repeats'] == 3
+    assert sum(result['tolerances'].values()) + sum(result['failures'].values()) == 3
+    assert result['attempts_mean'] >= 1
+    assert result['latency_ms']['p50'] <= result['latency_ms']['max']
+
+
+def test_context_target_reports_attempts_of_every_run(main_module, monkeypatch):
+    monkeypatch.setattr(main_module.balance_cache, 'max_entries', 0)
+    per_run = []
+    distribute = TeamBalancer.distribute_players
+
+    def counted(self, engine='sampling'):
+        try:
+            return distribute(self, engine)
+        finally:
+            per_run.append(self.attempts)
+
+    monkeypatch.setattr(TeamBalancer, 'distribute_players', counted)
+    players = synthetic_roster(10, 1)
+    _, attempts, tolerance, spread, _ = run._run_context(players, 2, 'sampling', None, 1)
+    # Soma de todas as rodadas, e não o último progresso (a cada 64 tentativas)
+    assert attempts == sum(per_run) and len(per_run) > 1
+    balancer = TeamBalancer(players, 2)
+    assert tolerance == next(t for t in balancer.tolerances if spread <= t + 1e-9)
+
+
+def test_compare_flags_slower_or_failing_cases():
+    assert not compare(_suite(p50=11.0), _suite())[0]['regression']
+    assert compare(_suite(p50=20.0), _suite())[0]['regression']
+    assert compare(_suite(failure_rate=0.2), _suite())[0]['regression']
+    # Execuções antigas sem motor/alvo em `meta` valem como sampling/distribute
+    assert compare(_suite(), {'cases': _suite()['cases']})
+
+
+@pytest.mark.parametrize('baseline', [_suite(engine='bnb'), _suite(target='context')])
+def test_compare_refuses_other_engine_or_target(baseline):
+    with pytest.raises(ValueError):
+        compare(_suite(), baseline)
+
+
+def test_cli_refuses_baseline_before_running(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'base.json'
+    path.write_text(json.dumps(_suite(target='context')))
+
+    def never(*args, **kwargs):
+        raise AssertionError('não devia rodar')
+
+    monkeypatch.setattr(cli, 'run_suite', never)
+    assert cli.main(['--quick', '--compare', str(path)]) == 2
+    assert "target 'context'" in capsys.readouterr().err
@@ -0,0 +1,88 @@
+"""Motor exato (branch-and-bound) contra força bruta em elencos pequenos."""
+import itertools
+import random
+
+import pytest
+
+from team_balancer import Intensity, Player, TeamBalancer
+
+
+def _roster(size, seed):
+    rng = random.Random(seed)
+    return [
+        Player(f'J{i}', rng.choice([2, 3, 3.5, 4, 5, 5.5, 6, 7]), rng.choice(list(Intensity)), id=i + 1)
+        for i in range(size)
+    ]
+
+
+def _brute_force(balancer):
+    """Diferenças de força, em ordem crescente, de todas as distribuições distintas
+    que respeitam as restrições rígidas.
+
+    Jogadores com a mesma nota, intensidade e condição de top são
+    intercambiáveis e times são trocáveis entre si: cada distribuição conta uma
+    única vez, como no top-k da busca exata.
+    """
+    players = balancer.players
+    seen = {}
+    for assign in itertools.product(range(balancer.num_teams), repeat=len(players)):
+        teams = [[p for p, t in zip(players, assign) if t == team] for team in range(balancer.num_teams)]
+        if not balancer._meets_hard_constraints(teams):
+            continue
+        key = tuple(sorted(
+            tuple(sorted((p.overall_rating, p.intensity.value, balancer._is_top(p)) for p in team))
+            for team in teams
+        ))
+        seen.setdefault(key, balancer.strength_spread(teams))
+    return sorted(seen.values())
+
+
+CASES = [(size, teams, seed) for size, teams in ((6, 2), (7, 2), (8, 2), (7, 3), (9, 3)) for seed in range(4)]
+
+
+@pytest.mark.parametrize('size,num_teams,seed', CASES)
+def test_minimum_spread_matches_brute_force(size, num_teams, seed):
+    balancer = TeamBalancer(_roster(size, seed), num_teams)
+    expected = _brute_force(balancer)
+    found = balancer.minimum_spread()
+    if not expected:
+        assert found is None
+    else:
+        assert found == pytest.approx(expected[0], abs=1e-9)
+
+
+@pytest.mark.parametrize('k', [1, 3, 6])
+@pytest.mark.parametrize('size,num_teams,seed', CASES[:8])
+def test_best_distributions_match_brute_force_top_k(size, num_teams, seed, k):
+    balancer = TeamBalancer(_roster(size, seed), num_teams)
+    expected = [s for s in _brute_force(balancer) if s <= max(balancer.tolerances) + 1e-9][:k]
+    if not expected:
+        with pytest.raises(ValueError):
+            balancer.best_distributions(k)
+        return
+    options = balancer.best_distributions(k)
+    assert [balancer.strength_spread(teams) for teams in options] == pytest.approx(expected, abs=1e-9)
+    for teams in options:
+        assert balancer._meets_hard_constraints(teams)
+        assert sorted(p.id for team in teams for p in team) == sorted(p.id for p in balancer.players)
+
+
+def test_top_k_keeps_distinct_teams_with_equal_sums():
+    # {7, 6, 4} e {7, 5, 5} somam o mesmo mas geram distribuições diferentes
+    high, low = Intensity.HIGH, Intensity.LOW
+    ratings = [(7, low), (3, low), (5, high), (4, high), (6, high), (5, high), (1, high), (7, low)]
+    players = [Player(f'J{i}', r, it, id=i + 1) for i, (r, it) in enumerate(ratings)]
+    balancer = TeamBalancer(players, 2)
+    options = balancer.best_distributions(3)
+    assert [balancer.strength_spread(teams) for teams in options] == pytest.approx([0.0, 0.5, 0.5])
+    assert len({
+        tuple(sorted(tuple(sorted(p.overall_rating for p in team)) for team in teams)) for teams in options
+    }) == 3
+
+
+def test_bnb_engine_returns_optimum():
+    players = _roster(9, 11)
+    balancer = TeamBalancer(players, 3)
+    expected = _brute_force(balancer)[0]
+    teams = TeamBalancer(players, 3).distribute_players('bnb')
+    assert balancer.strength_spread(teams) == pytest.approx(expected, abs=1e-9)
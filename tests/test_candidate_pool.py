@@ -0,0 +1,84 @@
+"""Pool de processos: mesmas sementes, mesmos candidatos que o caminho serial."""
+import random
+import time
+
+import pytest
+
+import candidate_pool
+from candidate_pool import SEED_STRIDE, generate_candidates
+from team_balancer import Intensity, Player
+
+
+def _roster(size, seed):
+    rng = random.Random(seed)
+    return [Player(f'J{i}', rng.randint(1, 7), rng.choice(list(Intensity)), id=i + 1) for i in range(size)]
+
+
+def _key(teams):
+    return tuple(sorted(tuple(sorted(p.id for p in team)) for team in teams))
+
+
+@pytest.fixture
+def pool():
+    yield 2
+    candidate_pool.shutdown_pool()
+
+
+def test_disabled_pool_returns_none():
+    assert generate_candidates(_roster(10, 0), 2, 'sampling', 1, _key, workers=1) is None
+
+
+def test_parallel_candidates_match_serial_seeds(pool):
+    players = _roster(20, 1)
+    seed_base, runs, wanted = 1234, 8, 4
+    parallel = generate_candidates(players, 4, 'sampling', seed_base, _key, runs=runs, wanted=wanted, workers=pool)
+
+    serial = []
+    seen = set()
+    for k in range(runs):
+        status, teams, _, _ = candidate_pool._run_seed(players, 4, 'sampling', seed_base + SEED_STRIDE * k, None, 0.0)
+        assert status == 'ok'
+        dist = [[players[i] for i in team] for team in teams]
+        if _key(dist) not in seen:
+            seen.add(_key(dist))
+            serial.append(dist)
+        if len(serial) >= wanted:
+            break
+    assert [_key(d) for d in parallel] == [_key(d) for d in serial]
+
+
+def test_parallel_rules_and_progress(pool):
+    players = _roster(16, 2)
+    low = [p for p in players if p.intensity == Intensity.LOW]
+    rules = [('apart', low[:2])]
+    progress = []
+    candidates = generate_candidates(
+        players, 2, 'sampling', 7, _key, runs=6, wanted=3, workers=pool, rules=rules,
+        on_result=lambda done, found, attempts: progress.append((done, attempts)),
+    )
+    assert candidates
+    assert [done for done, _ in progress] == list(range(1, len(progress) + 1))
+    # Tentativas somadas das rodadas: cada rodada faz ao menos uma
+    attempts = [tries for _, tries in progress]
+    assert attempts[0] >= 1 and all(b > a for a, b in zip(attempts, attempts[1:]))
+    for teams in candidates:
+        assert not any(low[0] in team and low[1] in team for team in teams)
+
+
+def test_run_seed_uses_remaining_time_of_absolute_deadline(monkeypatch):
+    budgets = []
+
+    class Recorder(candidate_pool.TeamBalancer):
+        def __init__(self, players, num_teams, deadline_ms=None):
+            budgets.append(deadline_ms)
+            super().__init__(players, num_teams, deadline_ms)
+
+    monkeypatch.setattr(candidate_pool, 'TeamBalancer', Recorder)
+    players = _roster(12, 3)
+    now = time.monotonic()
+    candidate_pool._run_seed(players, 2, 'sampling', 1, now + 5.0, 0.0)
+    # Prazo vencido enquanto a tarefa esperava na fila: só o orçamento mínimo
+    candidate_pool._run_seed(players, 2, 'sampling', 1, now - 10.0, 0.0)
+    candidate_pool._run_seed(players, 2, 'sampling', 1, None, 0.0)
+    assert 4000 < budgets[0] <= 5000
+    assert budgets[1:] == [1.0, None]
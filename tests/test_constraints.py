@@ -0,0 +1,161 @@
+"""Regras 'together', 'apart' e 'spread': compilação, contadores e motores."""
+import itertools
+import random
+
+import pytest
+
+from constraints import APART, SPREAD, TOGETHER, CompiledConstraints
+from feasibility import analyze, rule_conflict
+from team_balancer import Intensity, Player, TeamBalancer
+
+
+def test_spread_limits():
+    rules = CompiledConstraints(7, 3, [(SPREAD, [0, 1, 2, 3, 4])])
+    assert (rules.lower, rules.upper) == ([1], [2])
+    assert rules.counts([[0, 1], [2, 3], [4, 5, 6]]).valid()
+    assert not rules.counts([[0, 1, 2], [3, 4], [5, 6]]).valid()
+    assert not rules.counts([[0, 1, 5], [2, 3, 4], [6]]).valid()
+
+
+def test_apart_allows_one_per_team():
+    rules = CompiledConstraints(6, 3, [(APART, [0, 1])])
+    state = rules.counts()
+    state.add(0, 0)
+    assert not state.allows(0, 1)
+    assert state.allows(1, 1)
+    state.remove(0, 0)
+    assert state.allows(0, 1)
+    with pytest.raises(ValueError):
+        CompiledConstraints(6, 2, [(APART, [0, 1, 2])])
+
+
+def test_together_groups_are_merged():
+    rules = CompiledConstraints(6, 2, [(TOGETHER, [0, 1]), (TOGETHER, [1, 2])])
+    assert rules.groups == [[0, 1, 2]]
+    state = rules.counts()
+    state.add(0, 0)
+    assert not state.allows(1, 1)
+    assert state.allows(0, 2)
+    assert rules.counts([[0, 1, 2], [3, 4, 5]]).valid()
+    assert not rules.counts([[0, 1, 3], [2, 4, 5]]).valid()
+
+
+def test_contradictory_rules_raise():
+    with pytest.raises(ValueError):
+        CompiledConstraints(6, 2, [(TOGETHER, [0, 1]), (APART, [0, 1])])
+    with pytest.raises(ValueError):
+        CompiledConstraints(4, 2, [('mixed', [0, 1])])
+
+
+def test_moves_needed_and_allows_move():
+    rules = CompiledConstraints(6, 2, [(APART, [0, 1]), (TOGETHER, [2, 3])])
+    state = rules.counts([[0, 1, 2], [3, 4, 5]])
+    assert not state.valid()
+    assert state.moves_needed() == 1
+    # Membro de grupo não troca de time sozinho
+    assert not state.allows_move(2, 0, 1)
+    assert state.allows_move(1, 0, 1, 4)
+    state = rules.counts([[0, 2, 3], [1, 4, 5]])
+    assert state.valid() and state.moves_needed() == 0
+
+
+def _roster():
+    ratings = [3, 4, 5, 6] * 4
+    return [
+        Player(f'J{i:02d}', rating, Intensity.HIGH if i % 4 == 1 else Intensity.LOW, id=i + 1)
+        for i, rating in enumerate(ratings)
+    ]
+
+
+def _team_of(teams):
+    return {p.id: t for t, team in enumerate(teams) for p in team}
+
+
+@pytest.mark.parametrize('engine', ['sampling', 'local', 'bnb', 'batched'])
+@pytest.mark.parametrize('seed', range(5))
+def test_engines_respect_rules(engine, seed):
+    players = _roster()
+    balancer = TeamBalancer(players, 4)
+    # Dupla fora das regras implícitas (top players e alta intensidade), que a tornariam contraditória
+    low = [p for p in players if p.intensity == Intensity.LOW and not balancer._is_top(p)]
+    together = low[:2]
+    rest = [p for p in players if p not in together]
+    apart, keepers = rest[:4], rest[4:8]
+    balancer.keep_together(together)
+    balancer.keep_apart(apart)
+    balancer.spread_evenly(keepers)
+    random.seed(seed)
+    teams = balancer.distribute_players(engine)
+
+    team_of = _team_of(teams)
+    assert team_of[together[0].id] == team_of[together[1].id]
+    assert len({team_of[p.id] for p in apart}) == len(apart)
+    per_team = [sum(1 for p in keepers if team_of[p.id] == t) for t in range(4)]
+    assert per_team == [1, 1, 1, 1]
+    assert balancer._meets_hard_constraints(teams)
+
+
+def _strong_highs():
+    """9 de alta intensidade (os 3 top entre eles) e 3 de baixa: 3 times de 4, cada um com exatamente 3 HIGH."""
+    highs = [Player(f'H{i}', 7 if i < 3 else 4, Intensity.HIGH, id=i + 1) for i in range(9)]
+    lows = [Player(f'L{i}', 3, Intensity.LOW, id=i + 10) for i in range(3)]
+    return highs, lows
+
+
+def test_feasibility_reports_rules_that_break_the_high_cap():
+    highs, lows = _strong_highs()
+    players = highs + lows
+    # Três HIGH juntos mais o top player do time passam de 3 HIGH
+    report = analyze(players, 3, rules=[(TOGETHER, highs[3:6])])
+    assert not report.feasible
+    assert "Regra 'together' (H3, H4, H5) impossível" in report.reason
+    # Um HIGH com três LOW lota o time sem chegar aos 3 HIGH
+    report = analyze(players, 3, rules=[(TOGETHER, [highs[3]] + lows)])
+    assert not report.feasible and '(H3, L0, L1, L2)' in report.reason
+    # Dois HIGH comuns com um LOW cabem ao lado de um top
+    assert analyze(players, 3, rules=[(TOGETHER, highs[3:5] + lows[:1])], exact_budget_ms=None).feasible
+
+
+def test_feasibility_names_the_rule_that_overflows_the_teams():
+    players = [Player(f'J{i:02d}', 4, Intensity.LOW, id=i + 1) for i in range(12)]
+    groups = [[0, 3, 4], [1, 5, 6], [2, 7, 8], [9, 10, 11]]
+    rules = [(TOGETHER, [players[i] for i in group]) for group in groups]
+    assert analyze(players, 3, rules=rules[:3], exact_budget_ms=None).feasible
+    report = analyze(players, 3, rules=rules)
+    assert not report.feasible and "Regra 'together' (J09, J10, J11)" in report.reason
+    # Contradição pega na compilação também aponta a regra
+    report = analyze(players, 3, rules=[(TOGETHER, players[3:5]), (APART, players[3:5])])
+    assert not report.feasible and "Regra 'apart' (J03, J04)" in report.reason
+
+
+def _valid_exists(balancer):
+    players = balancer.players
+    for assign in itertools.product(range(balancer.num_teams), repeat=len(players) - 1):
+        teams = [[p for p, t in zip(players, (0,) + assign) if t == team] for team in range(balancer.num_teams)]
+        if balancer._meets_hard_constraints(teams):
+            return True
+    return False
+
+
+@pytest.mark.parametrize('seed', range(16))
+def test_rule_conflict_matches_brute_force(seed):
+    rng = random.Random(seed)
+    size = rng.choice([8, 9])
+    players = [Player(f'J{i}', rng.randint(1, 7), rng.choice(list(Intensity)), id=i + 1) for i in range(size)]
+    rules = [(rng.choice([TOGETHER, TOGETHER, SPREAD, APART]), rng.sample(players, rng.randint(2, 4)))
+             for _ in range(rng.randint(1, 3))]
+    balancer = TeamBalancer(players, 3)
+    try:
+        for kind, members in rules:
+            balancer.add_rule(kind, members)
+        balancer.constraints
+        expected = _valid_exists(balancer)
+    except ValueError:
+        expected = False
+    assert (rule_conflict(players, 3, rules) is None) == expected
+
+
+def test_balance_context_rejects_conflicting_rules(main_module):
+    highs, lows = _strong_highs()
+    with pytest.raises(ValueError, match="Regra 'together'"):
+        main_module._build_balance_context(highs + lows, 3, num_options=1, rules=[(TOGETHER, highs[3:6])])
@@ -0,0 +1,50 @@
+"""Busca "anytime": com prazo, os motores param a tempo e devolvem o melhor resultado até ali."""
+import random
+import time
+
+import pytest
+
+from team_balancer import Intensity, Player, TeamBalancer
+
+
+def _roster(size, seed):
+    rng = random.Random(seed)
+    return [Player(f'J{i}', rng.randint(1, 7), rng.choice(list(Intensity)), id=i + 1) for i in range(size)]
+
+
+@pytest.mark.parametrize('engine', ['sampling', 'batched', 'local'])
+def test_deadline_stops_search_with_best_so_far(engine):
+    random.seed(0)
+    balancer = TeamBalancer(_roster(40, 0), 4, deadline_ms=100)
+    # Alvo inalcançável e busca longa: só o prazo encerra
+    balancer.target_spread = balancer.spread_lower_bound = -1.0
+    balancer.max_attempts = 10 ** 7
+    balancer.local_iterations = 10 ** 8
+    start = time.monotonic()
+    teams = balancer.distribute_players(engine)
+    assert time.monotonic() - start < 2.0
+    assert balancer.timed_out
+    assert not balancer.target_reached
+    assert balancer._meets_hard_constraints(teams)
+    assert balancer.strength_spread(teams) <= max(balancer.tolerances) + 1e-9
+
+
+def test_deadline_before_relaxing_tolerance_returns_fallback():
+    random.seed(1)
+    balancer = TeamBalancer(_roster(24, 1), 3, deadline_ms=50)
+    # A primeira tolerância é impossível e o prazo acaba antes de relaxá-la
+    balancer.tolerances = [-1.0, 5.0]
+    balancer.max_attempts = 10 ** 7
+    teams = balancer.distribute_players('sampling')
+    assert balancer.timed_out
+    assert balancer._meets_hard_constraints(teams)
+    assert balancer.tolerance_used == 5.0
+
+
+def test_without_deadline_search_is_not_timed_out():
+    random.seed(2)
+    balancer = TeamBalancer(_roster(16, 2), 2, deadline_ms=0)
+    balancer.set_time_budget(None)
+    assert not balancer.time_is_up()
+    balancer.distribute_players('sampling')
+    assert not balancer.timed_out
@@ -0,0 +1,63 @@
+"""Stream SSE de /balance_events: progresso, keepalive e evento final."""
+import json
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_cache(main_module, monkeypatch):
+    monkeypatch.setattr(main_module.balance_cache, 'max_entries', 0)
+
+
+def _events(chunks):
+    """Payloads dos eventos `data:` de pedaços do stream (keepalives viram None)."""
+    events = []
+    for chunk in chunks:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if text.startswith(':'):
+            events.append(None)
+        for line in text.splitlines():
+            if line.startswith('data: '):
+                events.append(json.loads(line[len('data: '):]))
+    return events
+
+
+def test_stream_ends_with_terminal_event(client, submit_balance):
+    _, job_id = submit_balance()
+    response = client.get(f'/balance_events/{job_id}')
+    assert response.mimetype == 'text/event-stream'
+    events = [e for e in _events([response.get_data()]) if e is not None]
+    assert events[-1] == {'status': 'done', 'error': None}
+    assert all(e['status'] in ('queued', 'running') for e in events[:-1])
+    assert client.get(f'/balance_result/{job_id}').status_code == 200
+
+
+def test_final_progress_is_kept_after_the_job(main_module, submit_balance, wait_job):
+    _, job_id = submit_balance()
+    status = wait_job(job_id)
+    assert status['status'] == 'done'
+    # O último progresso sai antes de o job concluir, mesmo dentro do intervalo
+    assert status['progress']['candidates'] >= 1
+    assert status['progress']['runs'] >= 1
+
+
+def test_keepalive_until_status_changes(main_module, client, monkeypatch):
+    monkeypatch.setattr(main_module, 'SSE_KEEPALIVE', 0.05)
+    main_module.job_store.create('sse-job')
+    chunks = iter(client.get('/balance_events/sse-job', buffered=False).response)
+    assert _events([next(chunks)]) == [{'status': 'queued', 'progress': None}]
+    assert _events([next(chunks)]) == [None]
+    main_module.job_store.transition('sse-job', ('queued',), 'running')
+    main_module.job_store.set_progress('sse-job', {'runs': 3})
+    event = _events([next(chunks)])[0]
+    while event is None or event.get('progress') is None:
+        event = _events([next(chunks)])[0]
+    assert event == {'status': 'running', 'progress': {'runs': 3}}
+    main_module.job_store.transition('sse-job', ('running',), 'error', error='falhou')
+    events = _events(list(chunks))
+    assert events[-1] == {'status': 'error', 'error': 'falhou'}
+
+
+def test_unknown_job_gets_not_found_event(client):
+    events = _events([client.get('/balance_events/missing').get_data()])
+    assert events == [{'status': 'not_found'}]
@@ -0,0 +1,74 @@
+"""Análise de viabilidade: limite inferior contra força bruta e recusa rápida de seleções impossíveis."""
+import itertools
+import random
+
+import pytest
+
+from feasibility import analyze, spread_lower_bound
+from team_balancer import Intensity, Player, TeamBalancer
+
+
+def _roster(size, seed):
+    rng = random.Random(seed)
+    return [
+        Player(f'J{i}', rng.choice([2, 3, 3.5, 4, 5, 5.5, 6, 7]), rng.choice(list(Intensity)), id=i + 1)
+        for i in range(size)
+    ]
+
+
+def _brute_force(balancer):
+    """Menor diferença de força entre as distribuições que respeitam as restrições rígidas."""
+    players = balancer.players
+    best = None
+    for assign in itertools.product(range(balancer.num_teams), repeat=len(players)):
+        if assign[0] != 0:
+            continue
+        teams = [[p for p, t in zip(players, assign) if t == team] for team in range(balancer.num_teams)]
+        if balancer._meets_hard_constraints(teams):
+            spread = balancer.strength_spread(teams)
+            best = spread if best is None else min(best, spread)
+    return best
+
+
+CASES = [(size, teams, seed) for size, teams in ((6, 2), (7, 2), (8, 2), (7, 3), (9, 3)) for seed in range(4)]
+
+
+@pytest.mark.parametrize('size,num_teams,seed', CASES)
+def test_lower_bound_never_exceeds_optimum(size, num_teams, seed):
+    players = _roster(size, seed)
+    expected = _brute_force(TeamBalancer(players, num_teams))
+    bound = spread_lower_bound(players, num_teams)
+    if bound is None:
+        assert expected is None
+    elif expected is not None:
+        assert bound <= expected + 1e-9
+    report = analyze(players, num_teams)
+    feasible = expected is not None and expected <= max(TeamBalancer(players, num_teams).tolerances) + 1e-9
+    assert report.feasible == feasible
+    if report.exact:
+        assert report.spread_lower_bound == pytest.approx(expected, abs=1e-9)
+
+
+def test_rejects_fewer_players_than_teams():
+    report = analyze(_roster(3, 0), 4)
+    assert not report.feasible
+    assert '3 jogadores para 4 times' in report.reason
+
+
+def test_rejects_spread_above_tolerance_without_searching():
+    # Um jogador por time e um craque entre iniciantes: a diferença é evidente
+    players = [Player('Craque', 7, Intensity.LOW, id=1)] + [
+        Player(f'J{i}', 1, Intensity.LOW, id=i) for i in range(2, 4)
+    ]
+    report = analyze(players, 3, exact_budget_ms=None)
+    assert not report.feasible
+    assert not report.exact
+    assert 'acima da tolerância' in report.reason
+    assert report.spread_lower_bound > max(TeamBalancer(players, 3).tolerances)
+
+
+def test_exact_proof_sets_lower_bound():
+    players = _roster(8, 3)
+    report = analyze(players, 2)
+    assert report.exact
+    assert report.spread_lower_bound == pytest.approx(TeamBalancer(players, 2).minimum_spread())
@@ -0,0 +1,156 @@
+"""Transições, resultados, expiração e descarte de jobs nos dois backends."""
+import threading
+import time
+
+import pytest
+
+from job_store import ABANDONED_ERROR, MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'))
+
+
+def _finish(store, job_id, ctx=None):
+    assert store.transition(job_id, ('queued',), 'running')
+    assert store.transition(job_id, ('running',), 'done', ctx=ctx)
+
+
+def test_transitions(store):
+    assert store.create('a')
+    assert store.status('a') == ('queued', None)
+    assert not store.transition('a', ('running',), 'done')
+    assert store.transition('a', ('queued',), 'running')
+    assert store.transition('a', ('running',), 'error', error='falhou')
+    assert store.status('a') == ('error', 'falhou')
+    assert not store.transition('a', ('queued', 'running'), 'done')
+    assert store.status('missing') is None
+    assert not store.transition('missing', ('queued',), 'running')
+
+
+def test_queue_limit(store):
+    assert store.create('a', queue_limit=2)
+    assert store.create('b', queue_limit=2)
+    assert not store.create('c', queue_limit=2)
+    # Só os que ainda esperam contam para o limite
+    assert store.transition('a', ('queued',), 'running')
+    assert store.create('c', queue_limit=2)
+    assert store.count('queued') == 2
+    assert store.count('running') == 1
+
+
+def test_progress_and_versions(store):
+    store.create('a')
+    assert not store.set_progress('a', {'runs': 1})
+    version = store.snapshot('a')['version']
+    store.transition('a', ('queued',), 'running')
+    assert store.set_progress('a', {'runs': 2})
+    job = store.snapshot('a')
+    assert job['status'] == 'running'
+    assert job['progress'] == {'runs': 2}
+    assert job['version'] == version + 2
+    assert store.snapshot('missing') is None
+
+
+def test_wait_returns_on_change(store):
+    store.create('a')
+    version = store.snapshot('a')['version']
+    timer = threading.Timer(0.05, store.transition, ('a', ('queued',), 'running'))
+    timer.start()
+    started = time.monotonic()
+    job = store.wait('a', version, timeout=5)
+    timer.join()
+    assert job['status'] == 'running'
+    assert time.monotonic() - started < 2
+    # Sem mudança, volta com o mesmo snapshot ao fim do prazo
+    assert store.wait('a', job['version'], timeout=0.05)['version'] == job['version']
+
+
+def test_take_result_removes_unless_shared(store):
+    store.create('a')
+    assert store.take_result('a') == ('queued', None)
+    _finish(store, 'a', {'options': [1]})
+    assert store.take_result('a', remove=False) == ('done', {'options': [1]})
+    assert store.take_result('a') == ('done', {'options': [1]})
+    assert store.take_result('a') == (None, None)
+
+    store.create('b')
+    assert store.share('b')
+    _finish(store, 'b', {'options': [2]})
+    assert store.take_result('b') == ('done', {'options': [2]})
+    assert store.take_result('b') == ('done', {'options': [2]})
+    assert not store.share('missing')
+
+
+def test_expire_only_finished_jobs(store):
+    for job_id in ('done', 'error', 'queued', 'running'):
+        store.create(job_id)
+    _finish(store, 'done', {'x': 1})
+    store.transition('error', ('queued',), 'error', error='x')
+    store.transition('running', ('queued',), 'running')
+    assert store.expire(60) == 0
+    assert store.expire(60, now=time.time() + 120) == 2
+    assert store.status('done') is None and store.status('error') is None
+    assert store.status('queued') == ('queued', None)
+    assert store.status('running') == ('running', None)
+
+
+def test_abandon_stale_frees_queue_and_wakes_waiters(store):
+    for job_id in ('queued', 'running', 'done'):
+        store.create(job_id)
+    store.transition('running', ('queued',), 'running')
+    _finish(store, 'done', {'x': 1})
+    assert not store.create('extra', queue_limit=1)
+    assert store.abandon_stale(60) == 0
+
+    version = store.snapshot('queued')['version']
+    later = time.time() + 120
+    assert store.abandon_stale(60, now=later) == 2
+    assert store.status('queued') == ('error', ABANDONED_ERROR)
+    assert store.status('running') == ('error', ABANDONED_ERROR)
+    assert store.status('done') == ('done', None)
+    # Quem espera pelo job recebe o erro em vez de keepalives
+    assert store.wait('queued', version, timeout=0.05)['status'] == 'error'
+    assert store.create('extra', queue_limit=1)
+    # Depois expiram como qualquer job com erro
+    assert store.expire(60, now=later + 120) == 3
+
+
+def test_progress_keeps_running_job_alive(store):
+    store.create('idle')
+    store.create('busy')
+    store.transition('busy', ('queued',), 'running')
+    time.sleep(0.3)
+    store.set_progress('busy', {'runs': 1})
+    assert store.abandon_stale(0.5, now=time.time() + 0.3) == 1
+    assert store.status('idle')[0] == 'error'
+    assert store.status('busy') == ('running', None)
+
+
+def test_evict_keeps_newest_contexts(store):
+    for i in range(4):
+        store.create(f'j{i}')
+        _finish(store, f'j{i}', {'i': i})
+        time.sleep(0.01)
+    store.create('pending')
+    assert store.evict_contexts(2) == 2
+    assert store.status('j0') is None and store.status('j1') is None
+    assert store.take_result('j3') == ('done', {'i': 3})
+    assert store.status('pending') == ('queued', None)
+    stats = store.stats()
+    assert stats['stored_jobs'] == 2
+    assert stats['stored_contexts'] == 1
+
+
+def test_sqlite_shares_jobs_between_instances(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    first, second = SQLiteJobStore(path), SQLiteJobStore(path)
+    first.create('a')
+    first.share('a')
+    _finish(first, 'a', {'ok': True})
+    # Outro worker lê o resultado compartilhado sem removê-lo
+    assert second.take_result('a') == ('done', {'ok': True})
+    assert first.take_result('a') == ('done', {'ok': True})
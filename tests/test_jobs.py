@@ -0,0 +1,64 @@
+"""Fila limitada de /balance: workers fixos, 503 com fila cheia e jobs que expiram."""
+import time
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_cache(main_module, monkeypatch):
+    # Cada pedido vira um job novo, sem reaproveitar resultados de outros testes
+    monkeypatch.setattr(main_module.balance_cache, 'max_entries', 0)
+
+
+def test_job_runs_and_result_is_taken_once(client, submit_balance, wait_job):
+    response, job_id = submit_balance()
+    assert response.status_code == 200 and job_id
+    assert wait_job(job_id)['status'] == 'done'
+    assert client.get(f'/balance_result/{job_id}').status_code == 200
+    assert client.get(f'/balance_result/{job_id}').status_code == 404
+
+
+def test_full_queue_is_rejected_with_retry_after(main_module, client, submit_balance, monkeypatch):
+    monkeypatch.setattr(main_module, 'JOB_QUEUE_LIMIT', 0)
+    rejected = main_module.job_counters['rejected']
+    response, job_id = submit_balance()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(main_module.JOB_RETRY_AFTER)
+    assert job_id is None
+    assert main_module.job_counters['rejected'] == rejected + 1
+
+
+def test_workers_and_queue_are_bounded(main_module, client):
+    stats = client.get('/balance_stats').get_json()
+    assert stats['workers'] == main_module.JOB_WORKERS == main_module.job_executor._max_workers
+    assert stats['queue_limit'] == main_module.JOB_QUEUE_LIMIT
+
+
+def test_sweep_expires_finished_jobs(main_module, client, submit_balance, wait_job):
+    _, job_id = submit_balance()
+    wait_job(job_id)
+    main_module.sweep_jobs(now=time.time())
+    assert client.get(f'/balance_status/{job_id}').status_code == 200
+    assert main_module.sweep_jobs(now=time.time() + main_module.JOB_TTL_SECONDS + 1) >= 1
+    assert client.get(f'/balance_status/{job_id}').status_code == 404
+
+
+def test_sweep_abandons_jobs_of_dead_workers(main_module, client, submit_balance, monkeypatch):
+    # Job criado por um worker que morreu antes de executá-lo
+    assert main_module.job_store.create('orphan', queue_limit=1)
+    monkeypatch.setattr(main_module, 'JOB_QUEUE_LIMIT', 1)
+    assert submit_balance()[0].status_code == 503
+    main_module.sweep_jobs(now=time.time() + main_module.JOB_STALE_SECONDS + 1)
+    assert client.get('/balance_status/orphan').get_json()['status'] == 'error'
+    assert main_module.job_counters['abandoned'] >= 1
+    assert submit_balance()[0].status_code == 200
+
+
+def test_only_the_newest_results_are_kept(main_module, client, submit_balance, wait_job, monkeypatch):
+    monkeypatch.setattr(main_module, 'JOB_MAX_CONTEXTS', 1)
+    _, first = submit_balance()
+    wait_job(first)
+    _, second = submit_balance()
+    wait_job(second)
+    assert client.get(f'/balance_result/{first}').status_code == 404
+    assert client.get(f'/balance_result/{second}').status_code == 200
@@ -0,0 +1,60 @@
+"""Teste de carga (benchmarks.load): mistura de ações, registro das chamadas e uma rodada curta no app."""
+import random
+
+import pytest
+
+from benchmarks.load import InProcessClient, LoadTest, ProcessStats, Recorder, parse_mix
+
+
+def test_parse_mix():
+    assert parse_mix('balance=2,read=3,edit=1') == {'balance': 2.0, 'read': 3.0, 'edit': 1.0}
+    assert parse_mix('read') == {'read': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix('balance=1,delete=2')
+    with pytest.raises(ValueError):
+        parse_mix('balance=0')
+
+
+def test_recorder_counts_exceptions_as_status_zero():
+    class Broken:
+        def request(self, method, path, **kwargs):
+            raise ConnectionError('caiu')
+
+    rec = Recorder()
+    assert rec.call(Broken(), 'GET /', 'GET', '/') == (0, '')
+    assert rec.statuses['GET /'] == {'0': 1}
+    assert rec.errors == {'GET /: ConnectionError': 1}
+    assert len(rec.latencies['GET /']) == 1
+
+
+def test_edit_sends_a_valid_update():
+    calls = []
+
+    class Fake:
+        def request(self, method, path, form=None, payload=None):
+            calls.append((method, path, payload))
+            return 200, '{}'
+
+    LoadTest(Fake(), [7, 9], {'edit': 1}, users=1, duration=0)._edit(random.Random(0))
+    (method, path, payload), = calls
+    assert (method, path) == ('POST', '/update_player')
+    assert payload['id'] in (7, 9) and 1 <= payload['rating'] <= 7
+
+
+def test_short_run_against_the_app(main_module, roster_ids, monkeypatch):
+    monkeypatch.setattr(main_module.balance_cache, 'max_entries', 0)
+    ids = roster_ids()[:20]
+    # Sem edições: a carga não mexe nas notas do elenco usado pelos outros testes
+    test = LoadTest(InProcessClient(main_module.app), ids, {'balance': 1, 'read': 1}, users=2, duration=0.3,
+                    poll_interval=0.01, selected=(10, 14), deadline_ms=500)
+    stats = ProcessStats()
+    stats.start()
+    report = test.run()
+    process = stats.stop()
+    assert report['actions']['balance'] >= 1 and not report['errors']
+    endpoints = report['endpoints']
+    assert set(endpoints['GET /']['statuses']) == {'200'}
+    assert set(endpoints['fluxo balance']['statuses']) <= {'done', '503'}
+    assert endpoints['POST /balance']['count'] == endpoints['fluxo balance']['count']
+    assert report['requests'] == sum(e['count'] for name, e in endpoints.items() if not name.startswith('fluxo'))
+    assert process['threads_peak'] >= 1
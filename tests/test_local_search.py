@@ -0,0 +1,45 @@
+"""Busca local por trocas: restrições preservadas a cada troca e melhora em relação ao ponto de partida."""
+import random
+
+import pytest
+
+from team_balancer import Intensity, Player, TeamBalancer
+
+
+def _roster(size, seed):
+    rng = random.Random(seed)
+    return [Player(f'J{i}', rng.randint(1, 7), rng.choice(list(Intensity)), id=i + 1) for i in range(size)]
+
+
+@pytest.mark.parametrize('size,num_teams,seed', [(16, 2, 0), (20, 4, 1), (23, 3, 2), (30, 5, 3)])
+def test_local_search_never_worsens_a_valid_start(size, num_teams, seed):
+    random.seed(seed)
+    balancer = TeamBalancer(_roster(size, seed), num_teams)
+    start = balancer._valid_starting_point()
+    teams = balancer.local_search(start, target=0.0)
+    assert balancer._meets_hard_constraints(teams)
+    assert balancer.strength_spread(teams) <= balancer.strength_spread(start) + 1e-9
+    assert sorted(p.id for team in teams for p in team) == list(range(1, size + 1))
+
+
+def test_local_search_stops_at_target():
+    random.seed(4)
+    balancer = TeamBalancer(_roster(20, 4), 4)
+    teams = balancer.local_search(target=max(balancer.tolerances))
+    assert balancer.strength_spread(teams) <= max(balancer.tolerances)
+    assert balancer.attempts < balancer.local_iterations
+
+
+def test_local_search_rejects_invalid_start():
+    players = _roster(8, 5)
+    balancer = TeamBalancer(players, 2)
+    with pytest.raises(ValueError):
+        balancer.local_search([players[:2], players[2:]])
+
+
+def test_local_engine_returns_valid_distribution():
+    random.seed(6)
+    balancer = TeamBalancer(_roster(18, 6), 3)
+    teams = balancer.distribute_players('local')
+    assert balancer._meets_hard_constraints(teams)
+    assert balancer.strength_spread(teams) <= max(balancer.tolerances) + 1e-9
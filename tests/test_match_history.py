@@ -0,0 +1,109 @@
+"""Histórico de partidas: pesos por dupla, decaimento, vários processos e penalidade no sampler."""
+import json
+import random
+
+import pytest
+
+from match_history import MIN_WEIGHT, MatchHistory
+from team_balancer import Intensity, Player, TeamBalancer
+
+DAY = 86400.0
+
+
+def test_record_weights_teammates_only(tmp_path):
+    history = MatchHistory(str(tmp_path / 'history.json'))
+    assert history.penalty_matrix([1, 2, 3]) is None
+    assert history.record([[1, 2, 3], [4, 5]], played_at=1000.0) == 4
+    matrix = history.penalty_matrix([3, 1, 4, 2], now=1000.0)
+    assert matrix[0][1] == matrix[1][0] == 1.0  # 3 e 1 jogaram juntos
+    assert matrix[0][2] == 0.0 and matrix[1][2] == 0.0  # time adversário não conta
+    assert all(matrix[i][i] == 0.0 for i in range(4))
+    # Só jogadores sem dupla registrada entre si: nenhuma penalidade
+    assert history.penalty_matrix([1, 4, 99], now=1000.0) is None
+    assert history.stats() == {'matches': 1, 'pairs': 4}
+
+
+def test_weights_halve_every_half_life(tmp_path):
+    history = MatchHistory(str(tmp_path / 'history.json'), half_life_days=10)
+    history.record([[1, 2], [3, 4]], played_at=0.0)
+    assert history.penalty_matrix([1, 2], now=10 * DAY)[0][1] == pytest.approx(0.5)
+    history.record([[1, 2], [3, 4]], played_at=20 * DAY)
+    assert history.penalty_matrix([1, 2], now=20 * DAY)[0][1] == pytest.approx(1.25)
+    # Partida antiga registrada depois entra já decaída
+    history.record([[1, 3], [2, 4]], played_at=10 * DAY)
+    assert history.penalty_matrix([1, 3], now=20 * DAY)[0][1] == pytest.approx(0.5)
+
+
+def test_forgotten_pairs_leave_the_file(tmp_path):
+    path = tmp_path / 'history.json'
+    history = MatchHistory(str(path), half_life_days=1)
+    history.record([[1, 2], [3, 4]], played_at=0.0)
+    # Depois de muitas meias-vidas o peso fica abaixo de MIN_WEIGHT e sai do arquivo
+    history.record([[5, 6], [7, 8]], played_at=20 * DAY)
+    assert 0.5 ** 20 < MIN_WEIGHT
+    pairs = json.loads(path.read_text())['pairs']
+    assert sorted(pairs) == ['5,6', '7,8']
+
+
+def test_instances_sharing_a_file_merge_matches(tmp_path):
+    path = str(tmp_path / 'history.json')
+    first, second = MatchHistory(path), MatchHistory(path)
+    assert first.penalty_matrix([1, 2]) is None
+    second.record([[1, 2], [3, 4]], played_at=100.0)
+    # A outra instância percebe o arquivo novo e soma sobre ele ao gravar
+    assert first.penalty_matrix([1, 2], now=100.0)[0][1] == 1.0
+    first.record([[1, 2], [3, 4]], played_at=100.0)
+    assert second.penalty_matrix([1, 2], now=100.0)[0][1] == 2.0
+    assert first.stats()['matches'] == second.stats()['matches'] == 2
+
+
+def _history_matrix(size, group):
+    matrix = [[0.0] * size for _ in range(size)]
+    for a in group:
+        for b in group:
+            if a != b:
+                matrix[a][b] = 5.0
+    return matrix
+
+
+def test_sampler_avoids_repeated_teammates():
+    players = [Player(f'J{i}', 4, Intensity.LOW, id=i + 1) for i in range(12)]
+    matrix = _history_matrix(12, range(6))
+    penalties = {}
+    for weight in (0.0, 10.0):
+        random.seed(3)
+        balancer = TeamBalancer(players, 2)
+        balancer.history_matrix = matrix
+        balancer.history_weight = weight
+        penalties[weight] = [balancer.history_penalty(balancer.distribute_players()) for _ in range(10)]
+    assert sum(penalties[10.0]) < sum(penalties[0.0])
+    # Os seis que jogaram juntos acabam divididos entre os dois times
+    # (3 duplas repetidas por time em 30 duplas: penalidade 5 * 6 / 30)
+    assert max(penalties[10.0]) == pytest.approx(1.0)
+
+
+@pytest.fixture
+def fresh_history(main_module, monkeypatch, tmp_path):
+    history = MatchHistory(str(tmp_path / 'history.json'))
+    monkeypatch.setattr(main_module, 'match_history', history)
+    return history
+
+
+def test_record_match_route(client, roster_ids, fresh_history):
+    ids = roster_ids()[:6]
+    response = client.post('/record_match', json={'teams': [ids[:3], ids[3:]], 'played_at': 1000})
+    assert response.status_code == 200
+    assert response.get_json()['pairs'] == 6
+    assert fresh_history.penalty_matrix(ids[:2], now=1000.0)[0][1] == 1.0
+
+
+@pytest.mark.parametrize('payload, status', [
+    ({}, 400),
+    ({'teams': [[1, 2]]}, 400),
+    ({'teams': [[1, 'x'], [2]]}, 400),
+    ({'teams': [[1], [2]], 'played_at': 'ontem'}, 400),
+    ({'teams': [[1], [10 ** 9]]}, 404),
+])
+def test_record_match_rejects_bad_payloads(client, fresh_history, payload, status):
+    assert client.post('/record_match', json=payload).status_code == status
+    assert fresh_history.stats()['matches'] == 0
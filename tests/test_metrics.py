@@ -0,0 +1,106 @@
+"""Métricas no formato texto do Prometheus, /metrics e trace por job."""
+import re
+import time
+
+import pytest
+
+import metrics
+
+
+def _value(text, sample):
+    """Valor da amostra `sample` (nome com rótulos, exatamente como no texto) ou None."""
+    match = re.search(r'^' + re.escape(sample) + r' (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_counter_and_histogram_exposition():
+    metrics.describe('test_events_total', 'counter', 'Eventos de teste')
+    metrics.describe('test_sizes', 'histogram', 'Tamanhos de teste', (1, 10))
+    metrics.inc('test_events_total', kind='a')
+    metrics.inc('test_events_total', 2, kind='a')
+    metrics.inc('test_events_total', kind='quote"d')
+    for value in (0.5, 5, 50):
+        metrics.observe('test_sizes', value, engine='x')
+    text = metrics.render()
+    assert '# HELP test_events_total Eventos de teste\n# TYPE test_events_total counter\n' in text
+    assert _value(text, 'test_events_total{kind="a"}') == 3
+    assert _value(text, 'test_events_total{kind="quote\\"d"}') == 1
+    assert '# TYPE test_sizes histogram' in text
+    # Baldes acumulados, +Inf igual à contagem
+    assert _value(text, 'test_sizes_bucket{engine="x",le="1"}') == 1
+    assert _value(text, 'test_sizes_bucket{engine="x",le="10"}') == 2
+    assert _value(text, 'test_sizes_bucket{engine="x",le="+Inf"}') == 3
+    assert _value(text, 'test_sizes_sum{engine="x"}') == 55.5
+    assert _value(text, 'test_sizes_count{engine="x"}') == 3
+
+
+def test_collectors_are_read_at_render_time():
+    depth = [1]
+    metrics.describe('test_depth', 'gauge', 'Profundidade de teste')
+    collect = metrics.collector(lambda: [('test_depth', {'queue': 'q'}, depth[0])])
+    try:
+        assert _value(metrics.render(), 'test_depth{queue="q"}') == 1
+        depth[0] = 7
+        assert _value(metrics.render(), 'test_depth{queue="q"}') == 7
+    finally:
+        metrics._collectors.remove(collect)
+
+
+def test_disabled_metrics_are_no_ops(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    metrics.inc('test_disabled_total')
+    assert metrics.render() == ''
+    assert metrics.timer('test_disabled_seconds') is metrics._NULL_TIMER
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    assert 'test_disabled_total' not in metrics.render()
+
+
+def test_trace_records_phases_of_the_thread():
+    trace = metrics.start_trace()
+    with metrics.timer('test_phase_seconds', phase='primeira'):
+        pass
+    trace.add('evento', trace.origin, 0.001, runs=2)
+    assert metrics.stop_trace() is trace
+    assert [span['name'] for span in trace.as_dict()['spans']] == ['primeira', 'evento']
+    assert trace.spans[1]['runs'] == 2
+    # Sem trace ligado, a etapa só vai para o histograma
+    with metrics.timer('test_phase_seconds', phase='segunda'):
+        pass
+    assert len(trace.spans) == 2
+
+
+@pytest.fixture
+def no_cache(main_module, monkeypatch):
+    monkeypatch.setattr(main_module.balance_cache, 'max_entries', 0)
+
+
+def test_metrics_endpoint_counts_a_finished_job(client, submit_balance, wait_job, no_cache):
+    before = client.get('/metrics').get_data(as_text=True)
+    _, job_id = submit_balance()
+    assert wait_job(job_id)['status'] == 'done'
+    samples = ('job_run_seconds_count{status="done"}',
+               'balance_context_phase_seconds_count{phase="generation"}',
+               'balance_jobs_total{event="submitted"}',
+               'balance_jobs_total{event="done"}')
+    expected = {sample: (_value(before, sample) or 0) + 1 for sample in samples}
+    # A duração e o contador do job são registrados logo depois de ele sair de 'running'
+    deadline = time.monotonic() + 5
+    while True:
+        response = client.get('/metrics')
+        text = response.get_data(as_text=True)
+        if all(_value(text, s) == n for s, n in expected.items()) or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert response.mimetype == 'text/plain'
+    assert {s: _value(text, s) for s in samples} == expected
+    assert _value(text, 'balance_jobs{status="running"}') == 0
+    assert '# TYPE balance_jobs gauge' in text
+
+
+def test_trace_is_attached_to_the_job_progress(submit_balance, wait_job, no_cache):
+    _, job_id = submit_balance(trace='1')
+    trace = wait_job(job_id)['progress']['trace']
+    names = [span['name'] for span in trace['spans']]
+    assert {'feasibility', 'generation', 'selection'} <= set(names)
+    assert 'distribute' in names
+    assert trace['total_ms'] >= max(span['start_ms'] for span in trace['spans'])
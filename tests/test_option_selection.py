@@ -0,0 +1,96 @@
+"""Opções diversas: máscaras de bits contra pares explícitos e escolha gulosa das mais diferentes."""
+import itertools
+import random
+import re
+
+import pytest
+
+from option_selection import DistributionEncoder, select_diverse, shared_pairs
+from team_balancer import Intensity, Player
+
+
+def _roster(size):
+    return [Player(f'J{i}', 1 + i % 7, Intensity.LOW, id=i + 1) for i in range(size)]
+
+
+def _random_teams(players, num_teams, rng):
+    shuffled = players[:]
+    rng.shuffle(shuffled)
+    return [shuffled[t::num_teams] for t in range(num_teams)]
+
+
+def _pairs(teams):
+    return {frozenset((a.id, b.id)) for team in teams for a, b in itertools.combinations(team, 2)}
+
+
+def test_key_ignores_team_and_player_order():
+    players = _roster(9)
+    teams = [players[:3], players[3:6], players[6:]]
+    encoder = DistributionEncoder(players)
+    shuffled = [list(reversed(teams[2])), teams[0], list(reversed(teams[1]))]
+    assert encoder.key(teams) == encoder.key(shuffled)
+    assert encoder.key(teams) != encoder.key([players[1:4], [players[0]] + players[4:6], players[6:]])
+
+
+def test_shared_pairs_match_explicit_pairs():
+    players = _roster(14)
+    encoder = DistributionEncoder(players)
+    rng = random.Random(0)
+    for _ in range(50):
+        a, b = _random_teams(players, 3, rng), _random_teams(players, 3, rng)
+        assert shared_pairs(encoder.teammates(a), encoder.teammates(b)) == len(_pairs(a) & _pairs(b))
+
+
+def test_select_diverse_is_greedy_maximin():
+    players = _roster(12)
+    encoder = DistributionEncoder(players)
+    rng = random.Random(1)
+    candidates = [_random_teams(players, 2, rng) for _ in range(20)]
+    spreads = [rng.random() for _ in candidates]
+    chosen = select_diverse(candidates, spreads, encoder, 5)
+    assert len(chosen) == len(set(chosen)) == 5
+    assert chosen[0] == min(range(len(candidates)), key=spreads.__getitem__)
+    # Cada escolha minimiza a maior sobreposição com as anteriores (empate: menor diferença)
+    for step in range(1, len(chosen)):
+        def worst(i):
+            return max(len(_pairs(candidates[i]) & _pairs(candidates[j])) for j in chosen[:step])
+        rest = [i for i in range(len(candidates)) if i not in chosen[:step]]
+        best = min(rest, key=lambda i: (worst(i), spreads[i]))
+        assert (worst(chosen[step]), spreads[chosen[step]]) == (worst(best), spreads[best])
+
+
+def test_select_diverse_respects_spread_limit_and_size():
+    players = _roster(8)
+    encoder = DistributionEncoder(players)
+    rng = random.Random(2)
+    candidates = [_random_teams(players, 2, rng) for _ in range(6)]
+    spreads = [0.1, 0.2, 0.9, 1.5, 0.3, 2.0]
+    chosen = select_diverse(candidates, spreads, encoder, 10, spread_limit=0.6)
+    assert sorted(chosen) == [0, 1, 4]
+    # Nenhum candidato dentro do limite: fica só o melhor
+    assert select_diverse(candidates, spreads, encoder, 3, spread_limit=0.0) == [0]
+    assert select_diverse([], [], encoder, 3) == []
+
+
+@pytest.mark.parametrize('num_options', [1, 4, 10])
+def test_balance_context_returns_requested_options(main_module, roster_ids, num_options):
+    main_module.ensure_players_loaded()
+    players = main_module.roster.select(roster_ids()[:20])
+    ctx = main_module._build_balance_context(players, 4, num_options=num_options)
+    encoder = DistributionEncoder(players)
+    keys = {encoder.key([team['players'] for team in option]) for option in ctx['options']}
+    assert len(ctx['options']) == len(keys) == num_options
+    assert len(ctx['whatsapp_texts']) == num_options
+
+
+@pytest.mark.parametrize('value', ['0', '11', 'x'])
+def test_balance_rejects_options_out_of_range(submit_balance, value):
+    response, job_id = submit_balance(num_options=value)
+    assert response.status_code == 400 and job_id is None
+
+
+def test_form_offers_the_accepted_range(main_module, client):
+    page = client.get('/').get_data(as_text=True)
+    select = page[page.index('name="num_options"'):page.index('</select>', page.index('name="num_options"'))]
+    values = [int(v) for v in re.findall(r'<option value="(\d+)"', select)]
+    assert values == list(range(main_module.MIN_NUM_OPTIONS, main_module.MAX_NUM_OPTIONS + 1))
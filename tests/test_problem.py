@@ -0,0 +1,60 @@
+"""Elenco compilado (BalancingProblem): arrays paralelos e grupos do sampler por índice."""
+import random
+
+import pytest
+
+from team_balancer import BalancingProblem, Intensity, Player, TeamBalancer
+
+
+def _roster(size, seed):
+    rng = random.Random(seed)
+    return [Player(f'J{i}', rng.randint(1, 7), rng.choice(list(Intensity)), id=i + 1) for i in range(size)]
+
+
+def test_player_and_problem_use_slots():
+    player = _roster(1, 0)[0]
+    assert not hasattr(player, '__dict__')
+    problem = TeamBalancer(_roster(8, 0), 2).problem
+    assert not hasattr(problem, '__dict__')
+    with pytest.raises(AttributeError):
+        problem.extra = 1
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_arrays_and_groups_follow_the_roster(seed):
+    players = _roster(20, seed)
+    balancer = TeamBalancer(players, 4)
+    problem = balancer.problem
+    assert problem.ratings == [p.overall_rating for p in players]
+    assert problem.high == [p.intensity == Intensity.HIGH for p in players]
+    assert [players[i] for i in problem.top_indices] == balancer._top_players()
+    assert problem.total_rating == sum(p.overall_rating for p in players)
+
+    groups = [problem.high_indices, problem.elite_indices, problem.medium_indices, problem.weak_indices]
+    rest = sorted(i for group in groups for i in group)
+    # Cada jogador que não é top fica em exatamente um grupo, em ordem de elenco
+    assert rest == [i for i in range(len(players)) if not problem.top[i]]
+    assert all(group == sorted(group) for group in groups)
+    assert all(problem.high[i] for i in problem.high_indices)
+    assert all(problem.ratings[i] >= 6 for i in problem.elite_indices)
+    assert all(3 <= problem.ratings[i] < 6 for i in problem.medium_indices)
+    assert all(problem.ratings[i] < 3 for i in problem.weak_indices)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_index_checks_match_player_checks(seed):
+    players = _roster(13, seed)
+    balancer = TeamBalancer(players, 3)
+    rng = random.Random(seed)
+    for _ in range(200):
+        assign = [rng.randrange(3) for _ in players]
+        teams = [[i for i, t in enumerate(assign) if t == team] for team in range(3)]
+        materialized = balancer.problem.materialize(teams)
+        assert materialized == [[players[i] for i in team] for team in teams]
+        assert balancer._index_valid(teams) == balancer._meets_hard_constraints(materialized)
+
+
+def test_problem_materializes_sampler_indices():
+    players = _roster(16, 3)
+    problem = BalancingProblem(players, TeamBalancer(players, 2)._top_players())
+    assert problem.materialize([[0, 2], [1]]) == [[players[0], players[2]], [players[1]]]
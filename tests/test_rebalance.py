@@ -0,0 +1,73 @@
+"""Reajuste de uma distribuição a quem chegou e saiu."""
+import random
+
+import pytest
+
+from team_balancer import Intensity, Player, TeamBalancer
+
+
+def _roster(size, seed):
+    rng = random.Random(seed)
+    return [
+        Player(f'J{i:02d}', rng.choice([3, 4, 4.5, 5, 6]), rng.choice(list(Intensity)), id=i + 1)
+        for i in range(size)
+    ]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_rebalance_swaps_players_with_few_moves(seed):
+    players = _roster(17, seed)
+    random.seed(seed)
+    original = TeamBalancer(players[:16], 4).distribute_players()
+    leaving, arriving = original[0][0], players[16]
+    selected = [p for p in players if p is not leaving]
+
+    balancer = TeamBalancer(selected, 4)
+    result, moves = balancer.rebalance(original, max_moves=3, time_budget=1.0)
+
+    assert sorted(p.id for team in result for p in team) == sorted(p.id for p in selected)
+    assert balancer._meets_hard_constraints(result)
+    before = {p.id: t for t, team in enumerate(original) for p in team}
+    after = {p.id: t for t, team in enumerate(result) for p in team}
+    changed = [pid for pid, t in after.items() if pid in before and before[pid] != t]
+    assert sorted(changed) == sorted(p.id for p, _, _ in moves)
+    if len(moves) <= 3:
+        assert arriving.id in after
+        assert balancer.strength_spread(result) <= max(balancer.tolerances) + 1e-9
+
+
+def test_rebalance_keeps_valid_distribution_unchanged():
+    players = _roster(16, 1)
+    random.seed(1)
+    teams = TeamBalancer(players, 4).distribute_players()
+    result, moves = TeamBalancer(players, 4).rebalance(teams, max_moves=3)
+    assert moves == []
+    assert [[p.id for p in team] for team in result] == [[p.id for p in team] for team in teams]
+
+
+def test_rebalance_route_moves_arrivals_and_drops_departures(client, roster_ids):
+    ids = roster_ids()[:13]
+    teams, arrival = [ids[:6], ids[6:12]], ids[12]
+    departed = 10 ** 9  # já apagado do elenco: só sai da distribuição
+    response = client.post('/rebalance', json={
+        'teams': [teams[0] + [departed], teams[1]], 'add': [arrival], 'remove': [departed, ids[0]],
+    })
+    assert response.status_code == 200
+    body = response.get_json()
+    placed = sorted(pid for team in body['teams'] for pid in team)
+    assert placed == sorted(ids[1:])
+    assert len(body['teams']) == 2 and len(body['strengths']) == 2
+    # Quem chega entra sem contar como mudança; os demais só mudam de time em `moves`
+    assert arrival not in {move['id'] for move in body['moves']}
+    for move in body['moves']:
+        assert move['id'] in teams[move['from']] and move['id'] in body['teams'][move['to']]
+
+
+@pytest.mark.parametrize('payload, status', [
+    ({'teams': [[1, 2]]}, 400),
+    ({'teams': [[1], ['x']]}, 400),
+    ({'teams': [[1], [2]], 'max_moves': -1}, 400),
+    ({'teams': [[1], [2]], 'add': [10 ** 9]}, 404),
+])
+def test_rebalance_route_rejects_bad_payloads(client, payload, status):
+    assert client.post('/rebalance', json=payload).status_code == status
@@ -0,0 +1,67 @@
+"""IDs estáveis e índices do elenco, e o uso de IDs pelas rotas."""
+from flask import request
+
+from team_balancer import Intensity, Player, Roster
+
+
+def _player(name, rating=4, pid=0):
+    return Player(name, rating, Intensity.LOW, id=pid)
+
+
+def test_reindex_keeps_ids_and_fills_missing_or_repeated():
+    players = [_player('A', pid=5), _player('B'), _player('C', pid=5), _player('D', pid=2)]
+    roster = Roster(players)
+    assert [p.id for p in players] == [5, 6, 7, 2]
+    assert roster.get(7) is players[2]
+    assert roster.add(_player('E')).id == 8
+    assert roster.insert(_player('F', pid=20)).id == 20
+    assert roster.add(_player('G')).id == 21
+
+
+def test_lookup_by_id_and_name():
+    roster = Roster([_player('Ana'), _player('Bia'), _player('Caio')])
+    bia = roster.find('Bia')
+    assert roster.get(bia.id) is bia
+    assert roster.select([3, 1, 99, 1]) == [roster.get(1), roster.get(3)]
+    roster.rename(bia, 'Beatriz')
+    assert roster.find('Bia') is None and roster.find('Beatriz') is bia
+    assert roster.remove(bia.id) is bia
+    assert roster.get(bia.id) is None and roster.find('Beatriz') is None
+    assert len(roster) == 2
+
+
+def test_repeated_names_hand_over_the_name_index():
+    first, second = _player('Zé'), _player('Zé')
+    roster = Roster([first, second])
+    assert first.id != second.id
+    assert roster.find('Zé') is first
+    roster.remove(first.id)
+    assert roster.find('Zé') is second
+
+
+def test_routes_address_players_by_id(main_module, client):
+    response = client.post('/add_players', json={'players': [
+        {'name': 'Teste Id', 'rating': 5, 'intensity': 'high'},
+        {'name': 'Teste Id', 'rating': 3, 'intensity': 'low'},
+    ]})
+    first, second = response.get_json()['ids']
+    assert first != second
+    # Mesmo nome, IDs diferentes: a edição por ID só mexe no jogador certo
+    assert client.post('/update_player', json={'id': second, 'name': 'Teste Id 2', 'rating': 4}).status_code == 200
+    assert main_module.roster.get(first).name == 'Teste Id'
+    assert (main_module.roster.get(second).name, main_module.roster.get(second).overall_rating) == ('Teste Id 2', 4)
+    assert client.post('/delete_player', json={'id': first}).status_code == 200
+    assert main_module.roster.get(first) is None
+    assert client.post('/delete_player', json={'id': first}).status_code == 404
+    assert client.post('/delete_player', json={'id': second}).status_code == 200
+
+
+def test_balance_accepts_ids_and_legacy_name_fields(main_module, roster_ids):
+    ids = roster_ids()[:8]
+    names = [main_module.roster.get(pid).name for pid in ids]
+    with main_module.app.test_request_context('/balance', method='POST', data={'player_ids': [str(i) for i in ids]}):
+        by_id = main_module._selected_players(request.form)
+    legacy = {f'player_{name}': 'on' for name in names}
+    with main_module.app.test_request_context('/balance', method='POST', data=legacy):
+        by_name = main_module._selected_players(request.form)
+    assert [p.id for p in by_id] == [p.id for p in by_name] == sorted(ids)
@@ -0,0 +1,59 @@
+"""Página inicial condicional (ETag/304) e deltas do elenco em /api/roster."""
+import re
+
+
+def _add(client, name, rating=4, intensity='low'):
+    response = client.post('/add_players', json={'players': [{'name': name, 'rating': rating, 'intensity': intensity}]})
+    return response.get_json()['ids'][0]
+
+
+def test_index_answers_304_until_the_roster_changes(client):
+    first = client.get('/')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and 'no-cache' in first.headers['Cache-Control']
+    again = client.get('/', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and not again.get_data()
+    pid = _add(client, 'Muda A Página')
+    changed = client.get('/', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert f'data-id="{pid}"' in changed.get_data(as_text=True)
+    client.post('/delete_player', json={'id': pid})
+
+
+def test_delta_brings_changed_and_removed_players(main_module, client):
+    full = client.get('/api/roster').get_json()
+    assert full['full'] and len(full['players']) == len(main_module.real_players)
+    version, epoch = full['version'], full['epoch']
+
+    added = _add(client, 'Chega Depois', rating=6, intensity='high')
+    gone = _add(client, 'Sai Depois')
+    client.post('/delete_player', json={'id': gone})
+    delta = client.get(f'/api/roster?since={version}&epoch={epoch}').get_json()
+    assert not delta['full'] and delta['version'] > version
+    assert delta['removed'] == [gone]
+    player, = delta['players']
+    assert player == {'id': added, 'name': 'Chega Depois', 'rating': 6, 'intensity': 'HIGH', 'mensalista': False,
+                      'category': 'elite', 'intensity_label': 'alta'}
+
+    # Já em dia: delta vazio
+    current = client.get(f"/api/roster?since={delta['version']}&epoch={epoch}").get_json()
+    assert (current['full'], current['players'], current['removed']) == (False, [], [])
+    client.post('/delete_player', json={'id': added})
+
+
+def test_other_epoch_or_unknown_version_gets_the_whole_roster(client):
+    full = client.get('/api/roster').get_json()
+    assert client.get(f"/api/roster?since={full['version']}&epoch=outra").get_json()['full']
+    assert client.get(f"/api/roster?since={full['version'] + 100}&epoch={full['epoch']}").get_json()['full']
+
+
+def test_page_patches_cards_in_place(client):
+    page = client.get('/').get_data(as_text=True)
+    # Card vazio para jogadores novos, com os mesmos ganchos dos cards renderizados
+    template = page[page.index('<template id="playerCardTemplate">'):page.index('</template>')]
+    for hook in ('player-name', 'player-star', 'player-rating', 'badge-category', 'badge-intensity'):
+        assert hook in template
+    handler = page[page.index("addEventListener('visibilitychange'"):page.index('function newPlayerCard')]
+    # Só o delta completo recarrega; inclusões e edições passam por fillPlayerCard
+    assert re.findall(r'if \((.*?)\) \{ location\.reload\(\)', handler) == ['delta.full']
+    assert 'fillPlayerCard(card, p)' in handler
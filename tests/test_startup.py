@@ -0,0 +1,81 @@
+"""Cold start: importar não lê nem grava o elenco, o aquecimento roda em segundo plano e numpy fica para depois."""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(script, tmp_path, **env):
+    """Roda `script` num interpretador novo com os dados em `tmp_path`; devolve o JSON impresso por ele."""
+    env = {
+        **os.environ,
+        'PYTHONPATH': ROOT,
+        'PLAYERS_FILE': str(tmp_path / 'players.json'),
+        'MATCH_HISTORY_FILE': str(tmp_path / 'match_history.json'),
+        'JOB_STORE': 'memory',
+        'BALANCE_WORKERS': '0',
+        'WARMUP': '0',
+        **env,
+    }
+    out = subprocess.run([sys.executable, '-c', textwrap.dedent(script)], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=60, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_roster_loads_on_first_use_and_is_written_on_first_edit(tmp_path):
+    result = _run('''
+        import json, os, sys
+        import team_balancer as tb
+        data_dir = os.path.dirname(tb.DATA_FILE)
+        imported = (tb._players_loaded, sorted(os.listdir(data_dir)))
+        tb.ensure_players_loaded()
+        loaded = (len(tb.real_players), sorted(os.listdir(data_dir)))
+        with tb.roster_transaction():
+            seq = tb.save_player(tb.roster.add(tb.Player('Novo', 4, tb.Intensity.LOW)))
+        tb.wait_players_saved(seq)
+        print(json.dumps({'imported': imported, 'loaded': loaded, 'numpy': 'numpy' in sys.modules,
+                          'saved': len(tb._load_players_from_file())}))
+    ''', tmp_path)
+    assert result['imported'] == [False, []]
+    # Lista padrão só em memória até a primeira escrita
+    defaults = result['loaded'][0]
+    assert defaults > 0 and result['loaded'][1] == []
+    assert result['saved'] == defaults + 1
+    assert not result['numpy']
+
+
+def test_app_import_writes_nothing_and_reports_startup(tmp_path):
+    result = _run('''
+        import json, os
+        import main
+        files = sorted(os.listdir(os.path.dirname(main.DATA_FILE)))
+        client = main.app.test_client()
+        page = client.get('/')
+        stats = client.get('/balance_stats').get_json()
+        print(json.dumps({'files': files, 'status': page.status_code, 'startup': stats['startup'],
+                          'players': len(main.real_players)}))
+    ''', tmp_path)
+    assert result['files'] == []
+    assert result['status'] == 200 and result['players'] > 0
+    startup = result['startup']
+    assert startup['import_ms'] > 0 and startup['warmup_ms'] is None
+    assert startup['first_response_ms'] >= startup['import_ms']
+
+
+def test_warmup_loads_roster_without_touching_random(tmp_path):
+    result = _run('''
+        import json, random, time
+        import main
+        import team_balancer
+        state = random.getstate()
+        deadline = time.monotonic() + 30
+        while main._startup['warmup_ms'] is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        print(json.dumps({'warmup_ms': main._startup['warmup_ms'], 'loaded': team_balancer._players_loaded,
+                          'random_untouched': random.getstate() == state}))
+    ''', tmp_path, WARMUP='1')
+    assert result['warmup_ms'] is not None
+    assert result['loaded'] and result['random_untouched']
@@ -0,0 +1,97 @@
+"""Elenco consistente entre workers: outro processo grava no mesmo players.json e o app acompanha."""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WORKER = textwrap.dedent('''
+    import json, sys
+    import team_balancer as tb
+
+    op, arg = sys.argv[1], json.loads(sys.argv[2])
+    with tb.roster_transaction():
+        if op == 'add':
+            player = tb.roster.add(tb.Player(arg['name'], arg['rating'], tb.Intensity.HIGH))
+            seq = tb.save_player(player)
+            result = player.id
+        elif op == 'rate':
+            player = tb.roster.get(arg['id'])
+            player.overall_rating = arg['rating']
+            seq = tb.save_player(player)
+            result = player.id
+        else:  # compacta o elenco sem o jogador, como uma reescrita completa
+            tb.roster.remove(arg['id'])
+            tb.save_players(tb.real_players)
+            seq, result = 0, None
+    tb.wait_players_saved(seq)
+    print(json.dumps(result))
+''')
+
+
+@pytest.fixture
+def other_worker(main_module):
+    """Roda uma escrita do elenco em outro processo, no mesmo arquivo do app."""
+    def run(op, **arg):
+        env = {**os.environ, 'PLAYERS_FILE': main_module.DATA_FILE, 'PYTHONPATH': ROOT}
+        out = subprocess.run(
+            [sys.executable, '-c', _WORKER, op, json.dumps(arg)],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=60, check=True,
+        )
+        return json.loads(out.stdout.strip().splitlines()[-1])
+    return run
+
+
+@pytest.fixture
+def written_roster(client):
+    """Garante o arquivo do elenco no disco (a primeira escrita grava a lista padrão)."""
+    ids = client.post('/add_players', json={'players': [{'name': 'Sync Base', 'rating': 3, 'intensity': 'low'}]})
+    yield
+    client.post('/delete_player', json={'id': ids.get_json()['ids'][0]})
+
+
+def test_next_request_sees_players_added_elsewhere(main_module, client, other_worker, written_roster):
+    pid = other_worker('add', name='Outro Worker', rating=5)
+    assert main_module.roster_changed()
+    client.get('/balance_status/nenhum')  # qualquer pedido confere o disco antes
+    player = main_module.roster.get(pid)
+    assert player is not None and player.name == 'Outro Worker'
+    assert not main_module.roster_changed()
+    # IDs novos deste processo continuam depois dos do outro worker
+    own = client.post('/add_players', json={'players': [{'name': 'Deste Worker', 'rating': 4, 'intensity': 'low'}]})
+    own_id = own.get_json()['ids'][0]
+    assert own_id > pid
+    for removed in (pid, own_id):
+        assert client.post('/delete_player', json={'id': removed}).status_code == 200
+
+
+def test_changes_elsewhere_invalidate_cached_results(main_module, client, other_worker, written_roster,
+                                                     submit_balance, wait_job):
+    if not main_module.balance_cache.enabled:
+        pytest.skip('cache desativado')
+    _, job_id = submit_balance(size=10, shuffle_count='3')
+    wait_job(job_id)
+    assert submit_balance(size=10, shuffle_count='3')[1] is None  # veio do cache
+    pid = main_module.real_players[0].id
+    rating = main_module.roster.get(pid).overall_rating
+    other_worker('rate', id=pid, rating=rating % 7 + 1)
+    _, rerun = submit_balance(size=10, shuffle_count='3')
+    assert main_module.roster.get(pid).overall_rating == rating % 7 + 1
+    assert rerun is not None
+    wait_job(rerun)
+    other_worker('rate', id=pid, rating=rating)
+
+
+def test_compaction_elsewhere_reloads_the_whole_roster(main_module, client, other_worker, written_roster):
+    pid = client.post('/add_players', json={'players': [
+        {'name': 'Sai Na Compactação', 'rating': 2, 'intensity': 'low'},
+    ]}).get_json()['ids'][0]
+    epoch = main_module.roster.epoch
+    other_worker('compact', id=pid)
+    client.get('/balance_status/nenhum')
+    assert main_module.roster.get(pid) is None
+    assert main_module.roster.epoch != epoch